@@ -0,0 +1,387 @@
+#Fontes de altitude usadas no cálculo das pistas de pouso (Projeto 2).
+#Todas expõem interpolar(x, y) sobre arrays NumPy e devolvem NaN fora da área coberta.
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+from ..geometria import partes_wkb
+
+
+def densificar(coords, espacamento):
+    """Insere vértices em cada segmento mais longo que o espaçamento informado."""
+    if len(coords) < 2 or espacamento <= 0:
+        return coords
+    deltas = np.diff(coords, axis=0)
+    comprimentos = np.hypot(deltas[:, 0], deltas[:, 1])
+    divisoes = np.maximum(np.ceil(comprimentos / espacamento).astype(np.int64), 1)
+    if (divisoes == 1).all():
+        return coords
+    segmento = np.repeat(np.arange(len(deltas)), divisoes)
+    inicio = np.cumsum(divisoes) - divisoes
+    fracao = (np.arange(divisoes.sum()) - inicio[segmento]) / divisoes[segmento]
+    pontos = coords[segmento] + deltas[segmento] * fracao[:, None]
+    return np.vstack((pontos, coords[-1:]))
+
+
+#pares ponto x triângulo testados de cada vez na localização exaustiva
+PARES_POR_BLOCO_LOCALIZACAO = 4000000
+
+
+class TIN(object):
+    """Triangulação de Delaunay (Bowyer-Watson) dos vértices das curvas de nível, consultada em lote."""
+
+    def __init__(self, x, y, z):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        z = np.asarray(z, dtype=np.float64)
+        validos = np.isfinite(x) & np.isfinite(y) & np.isfinite(z)
+        xy, primeiro = np.unique(np.column_stack((x[validos], y[validos])), axis=0, return_index=True)
+        self.z = z[validos][primeiro]
+        if len(xy) < 3:
+            raise ValueError('São necessários ao menos três pontos distintos para gerar o TIN.')
+
+        #coordenadas normalizadas para o quadrado unitário, mais estável nos predicados
+        self.origem = xy.min(axis=0)
+        self.escala = max(float((xy.max(axis=0) - self.origem).max()), 1e-12)
+        self.xy = (xy - self.origem) / self.escala
+        self.triangulos, self.vizinhos = self._triangular(self.xy)
+        self._montar_sementes()
+
+    @classmethod
+    def de_curvas(cls, curvas, campo_cota='cota', espacamento=None):
+        """Monta o TIN a partir de um iterável de feições de curva de nível."""
+        blocos, cotas = [], []
+        for feature in curvas:
+            geom = feature.geometry()
+            try:
+                cota = float(feature[campo_cota])
+            except (TypeError, ValueError):
+                continue
+            if geom.isEmpty():
+                continue
+            for coords in partes_wkb(geom.asWkb()):
+                blocos.append(coords)
+                cotas.append(np.full(len(coords), cota))
+        if not blocos:
+            raise ValueError('Nenhuma curva de nível com cota válida para gerar o TIN.')
+        if espacamento is None:
+            #por padrão só quebra os segmentos bem mais longos que o típico,
+            #evitando triângulos compridos atravessando a curva
+            comprimentos = np.concatenate([np.hypot(*np.diff(c, axis=0).T) for c in blocos if len(c) > 1] or [np.zeros(1)])
+            espacamento = 4 * float(np.median(comprimentos)) if len(comprimentos) else 0
+        if espacamento:
+            densos = [densificar(c, espacamento) for c in blocos]
+            cotas = [np.full(len(d), c[0]) for d, c in zip(densos, cotas)]
+            blocos = densos
+        xy = np.vstack(blocos)
+        return cls(xy[:, 0], xy[:, 1], np.concatenate(cotas))
+
+    def _triangular(self, xy):
+        n = len(xy)
+        #ordem de inserção em serpentina sobre uma grade, para manter a caminhada curta
+        lado = max(int(np.sqrt(n / 4)), 1)
+        cx = np.minimum((xy[:, 0] * lado).astype(np.int64), lado - 1)
+        cy = np.minimum((xy[:, 1] * lado).astype(np.int64), lado - 1)
+        cx = np.where(cy % 2 == 0, cx, lado - 1 - cx)
+        ordem = np.lexsort((xy[:, 0], cx, cy))
+
+        px = xy[:, 0].tolist() + [-100.0, 100.0, 0.5]
+        py = xy[:, 1].tolist() + [-100.0, -100.0, 100.0]
+        #triângulos em sentido anti-horário; vizinho k é o oposto ao vértice k
+        V = [[n, n + 1, n + 2]]
+        N = [[-1, -1, -1]]
+        livres = []
+        ultimo = 0
+
+        def orient(a, b, cx_, cy_):
+            return (px[b] - px[a]) * (cy_ - py[a]) - (py[b] - py[a]) * (cx_ - px[a])
+
+        def no_circulo(t, x, y):
+            a, b, c = V[t]
+            adx, ady = px[a] - x, py[a] - y
+            bdx, bdy = px[b] - x, py[b] - y
+            cdx, cdy = px[c] - x, py[c] - y
+            return ((adx * adx + ady * ady) * (bdx * cdy - cdx * bdy)
+                    - (bdx * bdx + bdy * bdy) * (adx * cdy - cdx * ady)
+                    + (cdx * cdx + cdy * cdy) * (adx * bdy - bdx * ady)) > 0
+
+        for p in ordem.tolist():
+            x, y = px[p], py[p]
+            t = ultimo
+            #caminhada de visibilidade até o triângulo que contém p
+            while True:
+                a, b, c = V[t]
+                if orient(b, c, x, y) < 0:
+                    t = N[t][0]
+                elif orient(c, a, x, y) < 0:
+                    t = N[t][1]
+                elif orient(a, b, x, y) < 0:
+                    t = N[t][2]
+                else:
+                    break
+
+            #cavidade: triângulos cujo círculo circunscrito contém p
+            ruins = {t}
+            pilha = [t]
+            while pilha:
+                s = pilha.pop()
+                for v in N[s]:
+                    if v != -1 and v not in ruins and no_circulo(v, x, y):
+                        ruins.add(v)
+                        pilha.append(v)
+
+            #arestas da borda da cavidade, ligadas a p em leque
+            novos_por_inicio = {}
+            novos = []
+            for s in ruins:
+                vs = V[s]
+                for k in range(3):
+                    externo = N[s][k]
+                    if externo in ruins:
+                        continue
+                    a, b = vs[(k + 1) % 3], vs[(k + 2) % 3]
+                    if livres:
+                        novo = livres.pop()
+                        V[novo] = [p, a, b]
+                        N[novo] = [externo, -1, -1]
+                    else:
+                        novo = len(V)
+                        V.append([p, a, b])
+                        N.append([externo, -1, -1])
+                    if externo != -1:
+                        nv = N[externo]
+                        nv[nv.index(s)] = novo
+                    novos_por_inicio[a] = novo
+                    novos.append(novo)
+            for s in ruins:
+                livres.append(s)
+                V[s] = None
+            for novo in novos:
+                b = V[novo][2]
+                seguinte = novos_por_inicio[b]
+                N[novo][1] = seguinte
+                N[seguinte][2] = novo
+            ultimo = novos[-1]
+
+        #descarta os triângulos ligados ao triângulo envolvente inicial
+        manter = [t for t in range(len(V)) if V[t] is not None and max(V[t]) < n]
+        novo_indice = np.full(len(V), -1, dtype=np.int64)
+        novo_indice[manter] = np.arange(len(manter))
+        vertices = np.array([V[t] for t in manter], dtype=np.int64).reshape(-1, 3)
+        vizinhos = np.array([N[t] for t in manter], dtype=np.int64).reshape(-1, 3)
+        vizinhos = np.where(vizinhos >= 0, novo_indice[np.maximum(vizinhos, 0)], -1)
+        return vertices, vizinhos
+
+    def _montar_sementes(self):
+        #grade grossa que associa cada célula a um triângulo próximo, ponto de
+        #partida das caminhadas de localização
+        self.lado_sementes = max(int(np.sqrt(len(self.triangulos) / 2)), 1)
+        lado = self.lado_sementes
+        centroides = self.xy[self.triangulos].mean(axis=1)
+        celula = (np.minimum((centroides[:, 1] * lado).astype(np.int64), lado - 1) * lado
+                  + np.minimum((centroides[:, 0] * lado).astype(np.int64), lado - 1))
+        sementes = np.full(lado * lado, -1, dtype=np.int64)
+        sementes[celula[::-1]] = np.arange(len(celula))[::-1]
+        #células vazias herdam o triângulo da última célula preenchida
+        preenchidas = np.where(sementes >= 0, np.arange(len(sementes)), 0)
+        preenchidas = np.maximum.accumulate(preenchidas)
+        self.sementes = np.where(sementes >= 0, sementes, sementes[preenchidas])
+        self.sementes[self.sementes < 0] = 0
+
+    def localizar(self, x, y):
+        """Índice do triângulo que contém cada ponto (já normalizado), ou -1."""
+        lado = self.lado_sementes
+        celula = (np.clip((y * lado).astype(np.int64), 0, lado - 1) * lado
+                  + np.clip((x * lado).astype(np.int64), 0, lado - 1))
+        triangulos = self.sementes[celula]
+        resultado = np.full(len(x), -1, dtype=np.int64)
+        ativos = np.arange(len(x))
+        px, py = self.xy[:, 0], self.xy[:, 1]
+        limite = 4 * lado + 100
+        for _ in range(limite):
+            if not len(ativos):
+                break
+            t = triangulos[ativos]
+            a, b, c = self.triangulos[t, 0], self.triangulos[t, 1], self.triangulos[t, 2]
+            qx, qy = x[ativos], y[ativos]
+            o0 = (px[c] - px[b]) * (qy - py[b]) - (py[c] - py[b]) * (qx - px[b])
+            o1 = (px[a] - px[c]) * (qy - py[c]) - (py[a] - py[c]) * (qx - px[c])
+            o2 = (px[b] - px[a]) * (qy - py[a]) - (py[b] - py[a]) * (qx - px[a])
+            dentro = (o0 >= 0) & (o1 >= 0) & (o2 >= 0)
+            resultado[ativos[dentro]] = t[dentro]
+            aresta = np.where(o0 < 0, 0, np.where(o1 < 0, 1, 2))
+            proximo = self.vizinhos[t, aresta]
+            #quem sai pelo fecho convexo fica com -1
+            continua = ~dentro & (proximo >= 0)
+            triangulos[ativos[continua]] = proximo[continua]
+            ativos = ativos[continua]
+        #caminhadas que esgotaram o limite (ciclos em triângulos degenerados) são resolvidas
+        #testando todos os triângulos
+        if len(ativos):
+            resultado[ativos] = self._localizar_exaustivo(x[ativos], y[ativos])
+        return resultado
+
+    def _localizar_exaustivo(self, x, y):
+        px, py = self.xy[:, 0], self.xy[:, 1]
+        a, b, c = self.triangulos[:, 0], self.triangulos[:, 1], self.triangulos[:, 2]
+        resultado = np.full(len(x), -1, dtype=np.int64)
+        #pontos por bloco, para limitar a matriz pontos x triângulos
+        bloco = max(PARES_POR_BLOCO_LOCALIZACAO // max(len(self.triangulos), 1), 1)
+        for inicio in range(0, len(x), bloco):
+            qx, qy = x[inicio:inicio + bloco, None], y[inicio:inicio + bloco, None]
+            dentro = (((px[c] - px[b]) * (qy - py[b]) - (py[c] - py[b]) * (qx - px[b]) >= 0)
+                      & ((px[a] - px[c]) * (qy - py[c]) - (py[a] - py[c]) * (qx - px[c]) >= 0)
+                      & ((px[b] - px[a]) * (qy - py[a]) - (py[b] - py[a]) * (qx - px[a]) >= 0))
+            achado = dentro.any(axis=1)
+            resultado[inicio:inicio + bloco] = np.where(achado, dentro.argmax(axis=1), -1)
+        return resultado
+
+    def interpolar(self, x, y):
+        """Altitudes interpoladas nos pontos (x, y); NaN fora do fecho convexo."""
+        x = (np.atleast_1d(np.asarray(x, dtype=np.float64)) - self.origem[0]) / self.escala
+        y = (np.atleast_1d(np.asarray(y, dtype=np.float64)) - self.origem[1]) / self.escala
+        resultado = np.full(len(x), np.nan)
+        if len(x) == 0 or len(self.triangulos) == 0:
+            return resultado
+        triangulos = self.localizar(x, y)
+
+        achados = triangulos >= 0
+        tri = self.triangulos[triangulos[achados]]
+        xa, ya = self.xy[tri[:, 0], 0], self.xy[tri[:, 0], 1]
+        xb, yb = self.xy[tri[:, 1], 0], self.xy[tri[:, 1], 1]
+        xc, yc = self.xy[tri[:, 2], 0], self.xy[tri[:, 2], 1]
+        qx, qy = x[achados], y[achados]
+        area = (xb - xa) * (yc - ya) - (yb - ya) * (xc - xa)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wa = ((xb - qx) * (yc - qy) - (yb - qy) * (xc - qx)) / area
+            wb = ((xc - qx) * (ya - qy) - (yc - qy) * (xa - qx)) / area
+        wc = 1.0 - wa - wb
+        resultado[achados] = wa * self.z[tri[:, 0]] + wb * self.z[tri[:, 1]] + wc * self.z[tri[:, 2]]
+        return resultado
+
+
+#lado (pixels) dos blocos em que o MDT é lido; cada bloco leva um pixel a mais à
+#direita e embaixo para que a interpolação bilinear nunca precise do bloco vizinho
+LADO_BLOCO_MDT = 1024
+#blocos guardados entre chamadas a interpolar, para que consultas seguidas na mesma
+#área (as três camadas de pista, por exemplo) não releiam o MDT
+BLOCOS_EM_CACHE = 16
+
+
+class GradeMDT(object):
+    """MDT lido em blocos de LADO_BLOCO_MDT pixels, só onde há pontos, com amostragem bilinear. Com janela,
+    só os pixels que cobrem a extensão, mais um de folga. Pode ser consultado por várias threads."""
+
+    def __init__(self, mdt_layer, banda=1, janela=None):
+        provider = mdt_layer.dataProvider()
+        extent = provider.extent()
+        largura, altura = provider.xSize(), provider.ySize()
+        self.dx = extent.width() / largura
+        self.dy = extent.height() / altura
+        self.xmin, self.ymax = extent.xMinimum(), extent.yMaximum()
+        c0, l0, c1, l1 = 0, 0, largura, altura
+        if janela is not None and np.all(np.isfinite(janela)):
+            c0 = max(int(np.floor((janela[0] - self.xmin) / self.dx)) - 1, 0)
+            c1 = min(int(np.ceil((janela[2] - self.xmin) / self.dx)) + 1, largura)
+            l0 = max(int(np.floor((self.ymax - janela[3]) / self.dy)) - 1, 0)
+            l1 = min(int(np.ceil((self.ymax - janela[1]) / self.dy)) + 1, altura)
+        #a grade passa a começar no canto da janela
+        self.xmin += c0 * self.dx
+        self.ymax -= l0 * self.dy
+        self.largura, self.altura = max(c1 - c0, 0), max(l1 - l0, 0)
+        self.provider = provider
+        self.banda = banda
+        self.nodata = provider.sourceNoDataValue(banda) if provider.sourceHasNoDataValue(banda) else None
+        self.cache = OrderedDict()
+        #o cache e o provedor são compartilhados entre as threads
+        self.trava = threading.Lock()
+
+    def bloco(self, bc0, bl0):
+        """Bloco cujo canto de cima à esquerda é o pixel (bl0, bc0), do cache ou do provedor."""
+        chave = (bc0, bl0)
+        with self.trava:
+            valores = self.cache.get(chave)
+            if valores is not None:
+                self.cache.move_to_end(chave)
+                return valores
+            valores = self.ler_bloco(bc0, bl0, min(bc0 + LADO_BLOCO_MDT + 1, self.largura), min(bl0 + LADO_BLOCO_MDT + 1, self.altura))
+            self.cache[chave] = valores
+            while len(self.cache) > BLOCOS_EM_CACHE:
+                self.cache.popitem(last=False)
+            return valores
+
+    def ler_bloco(self, c0, l0, c1, l1):
+        """Pixels [l0:l1, c0:c1] da grade como float64, com NaN no lugar do nodata."""
+        from qgis.core import QgsRectangle
+        extent = QgsRectangle(self.xmin + c0 * self.dx, self.ymax - l1 * self.dy,
+                              self.xmin + c1 * self.dx, self.ymax - l0 * self.dy)
+        bloco = self.provider.block(self.banda, extent, c1 - c0, l1 - l0)
+        valores = self._converter_bloco(bloco, c1 - c0, l1 - l0)
+        if self.nodata is not None:
+            valores[valores == self.nodata] = np.nan
+        return valores
+
+    @staticmethod
+    def _converter_bloco(bloco, largura, altura):
+        from qgis.core import Qgis
+        tipos = {
+            Qgis.Byte: np.uint8, Qgis.UInt16: np.uint16, Qgis.Int16: np.int16,
+            Qgis.UInt32: np.uint32, Qgis.Int32: np.int32,
+            Qgis.Float32: np.float32, Qgis.Float64: np.float64,
+        }
+        dtype = tipos.get(bloco.dataType())
+        if dtype is None:
+            raise ValueError('Tipo de dado do MDT não suportado.')
+        return np.frombuffer(bytes(bloco.data()), dtype=dtype).reshape(altura, largura).astype(np.float64)
+
+    def interpolar(self, x, y):
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        altura, largura = self.altura, self.largura
+        #posição em coordenadas de pixel, com centro do pixel em .5
+        col = (x - self.xmin) / self.dx - 0.5
+        lin = (self.ymax - y) / self.dy - 0.5
+        resultado = np.full(len(x), np.nan)
+        if altura == 0 or largura == 0:
+            return resultado
+        dentro = np.flatnonzero((col >= -0.5) & (col <= largura - 0.5) & (lin >= -0.5) & (lin <= altura - 0.5))
+        col = np.clip(col[dentro], 0, largura - 1)
+        lin = np.clip(lin[dentro], 0, altura - 1)
+        c0 = np.minimum(np.floor(col).astype(np.int64), max(largura - 2, 0))
+        l0 = np.minimum(np.floor(lin).astype(np.int64), max(altura - 2, 0))
+        fc = col - c0
+        fl = lin - l0
+        #os pontos são agrupados pelo bloco do seu pixel de cima à esquerda
+        colunas_blocos = -(-largura // LADO_BLOCO_MDT)
+        bloco = (l0 // LADO_BLOCO_MDT) * colunas_blocos + c0 // LADO_BLOCO_MDT
+        ordem = np.argsort(bloco, kind='stable')
+        blocos, inicios = np.unique(bloco[ordem], return_index=True)
+        for numero, inicio, fim in zip(blocos.tolist(), inicios.tolist(), np.r_[inicios[1:], len(ordem)].tolist()):
+            k = ordem[inicio:fim]
+            bl0 = (numero // colunas_blocos) * LADO_BLOCO_MDT
+            bc0 = (numero % colunas_blocos) * LADO_BLOCO_MDT
+            v = self.bloco(bc0, bl0)
+            a0, b0 = l0[k] - bl0, c0[k] - bc0
+            a1 = np.minimum(a0 + 1, v.shape[0] - 1)
+            b1 = np.minimum(b0 + 1, v.shape[1] - 1)
+            resultado[dentro[k]] = ((v[a0, b0] * (1 - fc[k]) + v[a0, b1] * fc[k]) * (1 - fl[k])
+                                    + (v[a1, b0] * (1 - fc[k]) + v[a1, b1] * fc[k]) * fl[k])
+        return resultado
+
+
+def altitude_media(fonte, amostras):
+    """Altitude média de cada feição (um array (n, 2) de amostras por feição); NaN sem amostras válidas."""
+    if not amostras:
+        return np.empty(0)
+    tamanhos = np.array([len(a) for a in amostras], dtype=np.int64)
+    if tamanhos.sum() == 0:
+        return np.full(len(amostras), np.nan)
+    pontos = np.vstack([a for a in amostras if len(a)])
+    feicao = np.repeat(np.arange(len(amostras)), tamanhos)
+    z = fonte.interpolar(pontos[:, 0], pontos[:, 1])
+    validos = np.isfinite(z)
+    soma = np.bincount(feicao[validos], weights=z[validos], minlength=len(amostras))
+    quantidade = np.bincount(feicao[validos], minlength=len(amostras))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(quantidade > 0, soma / quantidade, np.nan)
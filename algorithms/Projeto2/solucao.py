@@ -5,9 +5,16 @@ from qgis.core import (QgsProcessingParameterEnum, QgsProcessingParameterRasterL
                        QgsProcessingOutputVectorLayer, QgsProcessingFeedback, QgsProcessingContext,
                        QgsVectorLayer, QgsFields, QgsFeature, QgsField, QgsProject, QgsVectorFileWriter, QgsGeometry,
                        QgsProcessingParameterFeatureSink,QgsProcessingException,QgsLineSymbol,QgsSingleSymbolRenderer,QgsFeatureRequest,
-                       QgsSymbol, QgsRuleBasedRenderer, QgsFeatureRenderer,QgsWkbTypes,QgsRendererCategory,QgsCategorizedSymbolRenderer,QgsSpatialIndex)
+                       QgsSymbol, QgsRuleBasedRenderer, QgsFeatureRenderer,QgsWkbTypes,QgsRendererCategory,QgsCategorizedSymbolRenderer,QgsSpatialIndex,
+                       QgsVectorLayerFeatureSource, QgsProcessingUtils, QgsRectangle,
+                       QgsCoordinateTransform)
 import uuid
 import processing
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from ..geometria import partes_wkb
+from .altitude import TIN, GradeMDT, altitude_media, densificar
 
 
 
@@ -39,7 +46,8 @@ class CriarCamadasCurvasNivelMod(QgsProcessingAlgorithm):
         self.addParameter(
             QgsProcessingParameterRasterLayer(
                 self.MDT_PARAMETER,
-                self.tr('Modelo Digital de Terreno')
+                self.tr('Modelo Digital de Terreno'),
+                optional=True
             )
         )
         self.addParameter(
@@ -282,28 +290,34 @@ class CriarCamadasCurvasNivelMod(QgsProcessingAlgorithm):
         pista_linhas_layer = self.parameterAsVectorLayer(parameters, self.PISTA_L_PARAMETER, context)
         pista_poligonos_layer = self.parameterAsVectorLayer(parameters, self.PISTA_A_PARAMETER, context)
 
-        # Calcula a altitude para a camada de pontos de pista de pouso
-        feedback.pushInfo('Calculando a nova camada de pista de pouso (pontos) com as altitudes.')
-
-        nova_camada_pontos = self.calcular_altitude_pontos(pista_pontos_layer, pontos_layer, context, feedback)
-
-        feedback.pushInfo('Nova camada de pista de pouso (pontos) calculada com sucesso.')
-
-
-        # Calcula a altitude para a camada de linhas de pista de pouso
-        feedback.pushInfo('Calculando a nova camada de pista de pouso (linhas) com as altitudes.')
-
-        nova_camada_linhas = self.calcular_altitude_linhas(pista_linhas_layer, pontos_layer, context, feedback)
-
-        feedback.pushInfo('Nova camada de pista de pouso (linhas) calculada com sucesso.')
-
-
-        # Calcula a altitude para a camada de polígonos de pista de pouso
-        feedback.pushInfo('Calculando a nova camada de pista de pouso (poligonos) com as altitudes.')
-
-        nova_camada_poligonos = self.calcular_altitude_poligonos(pista_poligonos_layer, pontos_layer, context, feedback)
-
-        feedback.pushInfo('Nova camada de pista de pouso (poligonos) calculada com sucesso.')        
+        #Fonte de altitude construída uma única vez e usada pelas três camadas de pista:
+        #o MDT, quando informado, ou um TIN interpolado a partir das curvas de nível
+        pistas_layers = (pista_pontos_layer, pista_linhas_layer, pista_poligonos_layer)
+        usar_mdt = mdt_layer is not None and mdt_layer.isValid()
+        crs_altitude = mdt_layer.crs() if usar_mdt else curvas_nivel_layer.crs()
+        janela = self.janela_pistas(pistas_layers, crs_altitude, context) if usar_mdt else None
+        fonte_altitude = self.obter_fonte_altitude(mdt_layer, curvas_nivel_layer, feedback, janela)
+
+        #As três camadas de pista são processadas em paralelo, cada uma gravando no seu arquivo;
+        #a fonte de altitude é só lida e o NumPy e o GDAL liberam o GIL no trabalho pesado
+        feedback.pushInfo('Calculando as novas camadas de pista de pouso com as altitudes.')
+        pistas = {
+            self.OUTPUT_PISTA_P: (self.calcular_altitude_pontos, self.preparar_pista(pista_pontos_layer, 'pista_pontos', crs_altitude, context)),
+            self.OUTPUT_PISTA_L: (self.calcular_altitude_linhas, self.preparar_pista(pista_linhas_layer, 'pista_linhas', crs_altitude, context)),
+            self.OUTPUT_PISTA_A: (self.calcular_altitude_poligonos, self.preparar_pista(pista_poligonos_layer, 'pista_poligonos', crs_altitude, context)),
+        }
+        with ThreadPoolExecutor(max_workers=len(pistas)) as executor:
+            futuros = {saida: executor.submit(calcular, pista, fonte_altitude, context.transformContext(), feedback)
+                       for saida, (calcular, pista) in pistas.items()}
+            quantidades = {saida: futuro.result() for saida, futuro in futuros.items()}
+
+        nova_camada_pontos = self.carregar_pista(pistas[self.OUTPUT_PISTA_P][1], quantidades[self.OUTPUT_PISTA_P],
+                                                 'Camada de Pista Pontos Modificada', 'pista pontos', feedback)
+        nova_camada_linhas = self.carregar_pista(pistas[self.OUTPUT_PISTA_L][1], quantidades[self.OUTPUT_PISTA_L],
+                                                 'Camada de Pista Linhas Modificada', 'pista linhas', feedback)
+        nova_camada_poligonos = self.carregar_pista(pistas[self.OUTPUT_PISTA_A][1], quantidades[self.OUTPUT_PISTA_A],
+                                                    'Camada de Pista Poligonos Modificada', 'pista poligonos', feedback)
+        feedback.pushInfo('Novas camadas de pista de pouso calculadas com sucesso.')
 
         return {
             self.OUTPUT_CURVAS_NIVEL: layer,
@@ -317,163 +331,120 @@ class CriarCamadasCurvasNivelMod(QgsProcessingAlgorithm):
 
        #return {self.OUTPUT_CURVAS_NIVEL: layer, self.OUTPUT_PISTA_P: nova_camada_pontos, self.OUTPUT_PISTA_L: nova_camada_linhas, self.OUTPUT_PISTA_A: nova_camada_poligonos}
 
-    def calcular_altitude_pontos(self, pista_pontos_layer, pontos_layer,context,feedback):
-        nova_camada_pontos = QgsVectorLayer("Point?crs=EPSG:4326", "Pistas de Pouso (Pontos) Modificada", "memory")
-        provider = nova_camada_pontos.dataProvider()
-        fields = pista_pontos_layer.fields()
+    def janela_pistas(self, pistas_layers, crs, context):
+        #Do MDT só interessa a área das pistas, com a extensão levada para o SRC do MDT;
+        #sem nenhuma feição nas pistas o MDT é lido inteiro
+        extensao = QgsRectangle()
+        for pista_layer in pistas_layers:
+            if pista_layer.featureCount() == 0 or pista_layer.extent().isNull():
+                continue
+            transformacao = QgsCoordinateTransform(pista_layer.crs(), crs, context.transformContext())
+            extensao.combineExtentWith(transformacao.transformBoundingBox(pista_layer.extent()))
+        if extensao.isNull() or extensao.isEmpty():
+            return None
+        return (extensao.xMinimum(), extensao.yMinimum(), extensao.xMaximum(), extensao.yMaximum())
+
+    def obter_fonte_altitude(self, mdt_layer, curvas_nivel_layer, feedback, janela=None):
+        if mdt_layer is not None and mdt_layer.isValid():
+            feedback.pushInfo('Amostrando as altitudes do MDT em blocos, só sob as pistas.')
+            return GradeMDT(mdt_layer, janela=janela)
+        feedback.pushInfo('MDT não informado: gerando o TIN a partir das curvas de nível.')
+        try:
+            tin = TIN.de_curvas(curvas_nivel_layer.getFeatures())
+        except ValueError as erro:
+            raise QgsProcessingException(f"Erro ao gerar o TIN das curvas de nível: {erro}")
+        feedback.pushInfo(f'TIN gerado com {len(tin.xy)} vértices e {len(tin.triangulos)} triângulos.')
+        return tin
+
+    def amostras_feicao(self, geom, densificar_partes=False):
+        #Pontos onde a altitude da feição é amostrada: os vértices, e para linhas e
+        #polígonos também pontos intermediários ao longo das bordas
+        partes = partes_wkb(geom.asWkb())
+        if not partes:
+            return np.empty((0, 2))
+        if densificar_partes:
+            comprimento = geom.length()
+            if comprimento > 0:
+                partes = [densificar(coords, comprimento / 100) for coords in partes]
+        return np.vstack(partes)
+
+    def amostras_poligono(self, geom):
+        #A altitude do polígono é a média sobre a borda densificada e o centroide
+        centroide = geom.centroid().asPoint()
+        return np.vstack((self.amostras_feicao(geom, True), [[centroide.x(), centroide.y()]]))
+
+    def preparar_pista(self, pista_layer, nome, crs_altitude, context):
+        #Tudo o que o cálculo da pista precisa, com a fonte de feições já separada da camada
+        #e as amostras levadas para o SRC da fonte de altitude
+        fields = pista_layer.fields()
         fields.append(QgsField('altitude', QVariant.Double, 'double', 10, 1))
-        provider.addAttributes(fields)
-        nova_camada_pontos.updateFields()
-
-        # Construir um índice espacial para os pontos gerados pelo MDT
-        index = QgsSpatialIndex(pontos_layer.getFeatures())
-
-        for feature in pista_pontos_layer.getFeatures():
-            ponto_pista = feature.geometry().asPoint()
-            nearest_ids = index.nearestNeighbor(ponto_pista, 1)
-            if nearest_ids:
-                nearest_feature = pontos_layer.getFeature(nearest_ids[0])
-                altitude = nearest_feature['cota']
-                # Arredonda a altitude para 1 casa decimal
-                altitude_formatada = round(altitude, 1)
-                feature['altitude'] = altitude_formatada
-                provider.addFeature(feature)
-        
-        # Verificar se a camada de memória está vazia
-        if nova_camada_pontos.featureCount() == 0:
-            feedback.pushWarning("A camada pista pontos está vazia.")
-        else:
-            feedback.pushInfo(f"A camada pista pontos contém {nova_camada_pontos.featureCount()} feições.")
-
-        # Salvar a camada de memória
-        save_options = QgsVectorFileWriter.SaveVectorOptions()
-        temp_file_name = f'output_memory_{uuid.uuid4()}'
-        writer_error, error_message, new_filename, output_format = QgsVectorFileWriter.writeAsVectorFormatV3(
-            nova_camada_pontos,
-            temp_file_name,
-            context.transformContext(),
-            save_options
-        )
-
-        # Verificar se houve erro ao salvar
-        if writer_error != QgsVectorFileWriter.WriterError.NoError:
-            raise QgsProcessingException(f"Erro ao salvar a camada de pista pontos modificada: {error_message}")
-
-        # Carregar a camada resultante
-        layer_nova_camada_pontos = QgsVectorLayer(new_filename, "Camada de Pista Pontos Modificada", "ogr")
-        if not layer_nova_camada_pontos.isValid():
-            raise QgsProcessingException(f"Erro ao carregar a camada resultante: {layer_nova_camada_pontos.error()}")
-
-        QgsProject.instance().addMapLayer(layer_nova_camada_pontos)
-        return nova_camada_pontos
+        return {
+            'fonte': QgsVectorLayerFeatureSource(pista_layer),
+            'transformacao': QgsCoordinateTransform(pista_layer.crs(), crs_altitude, context.transformContext()),
+            'fields': fields,
+            'wkb_type': pista_layer.wkbType(),
+            'crs': pista_layer.crs(),
+            'arquivo': QgsProcessingUtils.generateTempFilename(f'{nome}.gpkg'),
+        }
 
-    def calcular_altitude_linhas(self, pista_linhas_layer, pontos_layer,context,feedback):
-        # Implementar o cálculo da altitude para a camada de linhas de pista de pouso
-        nova_camada_linhas = QgsVectorLayer("LineString?crs=EPSG:4326", "Pistas de Pouso (Linhas) Modificada", "memory")
-        provider = nova_camada_linhas.dataProvider()
-        fields = pista_linhas_layer.fields()
-        fields.append(QgsField('altitude', QVariant.Double, 'double', 10, 1))
-        provider.addAttributes(fields)
-        nova_camada_linhas.updateFields()
-
-        for feature in pista_linhas_layer.getFeatures():
-            linha_geom = feature.geometry()
-            buffer_geom = linha_geom.buffer(1, 5)  # Buffer de 1 metro
-            altitude_total = 0
-            count = 0
-            for ponto_feature in pontos_layer.getFeatures():
-                ponto_geom = ponto_feature.geometry()
-                if buffer_geom.contains(ponto_geom):
-                    altitude_total += ponto_feature['cota']
-                    count += 1
-            if count > 0:
-                altitude_media = altitude_total / count
-                altitude_formatada = round(altitude_media, 1)
-                feature['altitude'] = altitude_formatada
-                provider.addFeature(feature)
-        #Se houver pontos dentro do buffer, a média das altitudes é calculada
-        # Verificar se a camada de memória está vazia
-        if nova_camada_linhas.featureCount() == 0:
-            feedback.pushWarning("A camada pista linhas está vazia.")
-        else:
-            feedback.pushInfo(f"A camada pista linhas contém {nova_camada_linhas.featureCount()} feições.")
+    def calcular_altitude_pontos(self, pista, fonte_altitude, transform_context, feedback):
+        return self.calcular_altitude(pista, fonte_altitude, transform_context, feedback, self.amostras_feicao)
+
+    def calcular_altitude_linhas(self, pista, fonte_altitude, transform_context, feedback):
+        #A altitude da linha é a média da fonte de altitude ao longo da linha densificada
+        return self.calcular_altitude(pista, fonte_altitude, transform_context, feedback,
+                                      lambda geom: self.amostras_feicao(geom, True))
+
+    def calcular_altitude_poligonos(self, pista, fonte_altitude, transform_context, feedback):
+        return self.calcular_altitude(pista, fonte_altitude, transform_context, feedback, self.amostras_poligono)
+
+    def calcular_altitude(self, pista, fonte_altitude, transform_context, feedback, amostrador):
+        #Lê a pista, consulta a fonte de altitude em um único lote e grava as feições
+        #com altitude no arquivo exclusivo desta pista
+        features = []
+        for feature in pista['fonte'].getFeatures():
+            if feedback.isCanceled():
+                return 0
+            if not feature.geometry().isEmpty():
+                features.append(feature)
+        amostras = []
+        for feature in features:
+            geom = QgsGeometry(feature.geometry())
+            geom.transform(pista['transformacao'])
+            amostras.append(amostrador(geom))
+        altitudes = altitude_media(fonte_altitude, amostras)
 
-        # Salvar a camada de memória
         save_options = QgsVectorFileWriter.SaveVectorOptions()
-        temp_file_name = f'output_memory_{uuid.uuid4()}'
-        writer_error, error_message, new_filename, output_format = QgsVectorFileWriter.writeAsVectorFormatV3(
-            nova_camada_linhas,
-            temp_file_name,
-            context.transformContext(),
-            save_options
-        )
-
-        # Verificar se houve erro ao salvar
-        if writer_error != QgsVectorFileWriter.WriterError.NoError:
-            raise QgsProcessingException(f"Erro ao salvar a camada de pista linhas modificada: {error_message}")
-
-        # Carregar a camada resultante
-        layer_nova_camada_linhas = QgsVectorLayer(new_filename, "Camada de Pista Linhas Modificada", "ogr")
-        if not layer_nova_camada_linhas.isValid():
-            raise QgsProcessingException(f"Erro ao carregar a camada resultante: {layer_nova_camada_linhas.error()}")
-        
-        QgsProject.instance().addMapLayer(layer_nova_camada_linhas)
-
-        return nova_camada_linhas
-
-    def calcular_altitude_poligonos(self, pista_poligonos_layer, pontos_layer,context,feedback):
-        # Implementar o cálculo da altitude para a camada de polígonos de pista de pouso
-        nova_camada_poligonos = QgsVectorLayer("Polygon?crs=EPSG:4326", "Pistas de Pouso (Polígonos) Modificada", "memory")
-        provider = nova_camada_poligonos.dataProvider()
-        fields = pista_poligonos_layer.fields()
-        fields.append(QgsField('altitude', QVariant.Double, 'double', 10, 1))
-        provider.addAttributes(fields)
-        nova_camada_poligonos.updateFields()
-
-        for feature in pista_poligonos_layer.getFeatures():
-            poligono_geom = feature.geometry()
-            altitude_total = 0
-            count = 0
-            for ponto_feature in pontos_layer.getFeatures():
-                ponto_geom = ponto_feature.geometry()
-                if poligono_geom.contains(ponto_geom):
-                    altitude_total += ponto_feature['cota']
-                    count += 1
-            if count > 0:
-                altitude_media = altitude_total / count
-                altitude_formatada = round(altitude_media, 1)
-                feature['altitude'] = altitude_formatada
-                provider.addFeature(feature)
-        
-        # Verificar se a camada de memória está vazia
-        if nova_camada_poligonos.featureCount() == 0:
-            feedback.pushWarning("A camada pista poligonos está vazia.")
+        save_options.driverName = 'GPKG'
+        writer = QgsVectorFileWriter.create(pista['arquivo'], pista['fields'], pista['wkb_type'],
+                                            pista['crs'], transform_context, save_options)
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            raise QgsProcessingException(f"Erro ao criar o arquivo {pista['arquivo']}: {writer.errorMessage()}")
+
+        quantidade = 0
+        for feature, altitude in zip(features, altitudes):
+            if np.isfinite(altitude):
+                # Arredonda a altitude para 1 casa decimal
+                altitude_formatada = round(float(altitude), 1)
+                feature.setAttributes(feature.attributes() + [altitude_formatada])
+                writer.addFeature(feature)
+                quantidade += 1
+        del writer
+        return quantidade
+
+    def carregar_pista(self, pista, quantidade, nome_camada, descricao, feedback):
+        #Carrega o arquivo gravado e o adiciona ao projeto
+        if quantidade == 0:
+            feedback.pushWarning(f"A camada {descricao} está vazia.")
         else:
-            feedback.pushInfo(f"A camada pista poligonos contém {nova_camada_poligonos.featureCount()} feições.")
-
-        # Salvar a camada de memória
-        save_options = QgsVectorFileWriter.SaveVectorOptions()
-        temp_file_name = f'output_memory_{uuid.uuid4()}'
-        writer_error, error_message, new_filename, output_format = QgsVectorFileWriter.writeAsVectorFormatV3(
-            nova_camada_poligonos,
-            temp_file_name,
-            context.transformContext(),
-            save_options
-        )
-
-        # Verificar se houve erro ao salvar
-        if writer_error != QgsVectorFileWriter.WriterError.NoError:
-            raise QgsProcessingException(f"Erro ao salvar a camada de pista poligonos modificada: {error_message}")
-
-        # Carregar a camada resultante
-        layer_nova_camada_poligonos = QgsVectorLayer(new_filename, "Camada de Pista Poligonos Modificada", "ogr")
-        if not layer_nova_camada_poligonos.isValid():
-            raise QgsProcessingException(f"Erro ao carregar a camada resultante: {layer_nova_camada_poligonos.error()}")
-
-        QgsProject.instance().addMapLayer(layer_nova_camada_poligonos)
+            feedback.pushInfo(f"A camada {descricao} contém {quantidade} feições.")
 
-        return nova_camada_poligonos
+        layer_nova_camada = QgsVectorLayer(pista['arquivo'], nome_camada, "ogr")
+        if not layer_nova_camada.isValid():
+            raise QgsProcessingException(f"Erro ao carregar a camada resultante: {layer_nova_camada.error()}")
 
+        QgsProject.instance().addMapLayer(layer_nova_camada)
+        return layer_nova_camada
 
     def obter_equidistancia(self, escala):
         if escala == '1:25.000':
@@ -0,0 +1,185 @@
+from qgis.PyQt.QtCore import QCoreApplication, QVariant
+from qgis.core import (QgsProcessing, QgsProcessingAlgorithm, QgsProcessingParameterEnum,
+                       QgsProcessingParameterFeatureSource, QgsProcessingParameterFeatureSink,
+                       QgsFeature, QgsFeatureRequest, QgsFeatureSink, QgsField, QgsFields, QgsGeometry,
+                       QgsPointXY, QgsRectangle, QgsSpatialIndex, QgsWkbTypes, QgsProcessingException)
+import math
+
+import numpy as np
+
+from ..geometria import (partes_wkb, empilhar_segmentos, pares_candidatos, intersecao_segmentos,
+                         anel_fechado, area_anel, ponto_no_anel, agrupar_pontos)
+from .solucao import CriarCamadasCurvasNivelMod
+
+
+#tolerância relativa na comparação da diferença de cotas com a equidistância
+TOLERANCIA_COTA = 1e-6
+#distância relativa às coordenadas abaixo da qual dois pontos de interseção são o mesmo
+TOLERANCIA_PONTO = 1e-9
+
+
+class ValidarTopologiaCurvasNivel(QgsProcessingAlgorithm):
+    ESCALAS = CriarCamadasCurvasNivelMod.ESCALAS
+    ESCALA_PARAMETER = 'ESCALA'
+    CURVAS_NIVEL_PARAMETER = 'CURVAS_NIVEL'
+    OUTPUT_ERROS = 'OUTPUT_ERROS'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.ESCALA_PARAMETER,
+                self.tr('Escala'),
+                options=self.ESCALAS
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.CURVAS_NIVEL_PARAMETER,
+                self.tr('Camada de Curvas de Nível'),
+                [QgsProcessing.TypeVectorLine]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_ERROS,
+                self.tr('Erros de topologia das curvas de nível'),
+                QgsProcessing.TypeVectorPoint
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        escala = self.ESCALAS[self.parameterAsEnum(parameters, self.ESCALA_PARAMETER, context)]
+        equidistancia = CriarCamadasCurvasNivelMod().obter_equidistancia(escala)
+        curvas = self.parameterAsSource(parameters, self.CURVAS_NIVEL_PARAMETER, context)
+        if curvas is None:
+            raise QgsProcessingException("Não foi possível carregar a camada de curvas de nível.")
+        if curvas.fields().indexOf('cota') == -1:
+            raise QgsProcessingException("O campo 'cota' não foi encontrado na camada de curvas de nível.")
+
+        fields = QgsFields()
+        fields.append(QgsField('erro', QVariant.String))
+        fields.append(QgsField('feicao_1', QVariant.LongLong))
+        fields.append(QgsField('feicao_2', QVariant.LongLong))
+        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT_ERROS, context,
+                                               fields, QgsWkbTypes.Point, curvas.sourceCrs())
+
+        #Leitura única da camada: só a cota e as coordenadas (via WKB) de cada curva
+        feedback.pushInfo('Lendo as curvas de nível')
+        request = QgsFeatureRequest().setSubsetOfAttributes(['cota'], curvas.fields())
+        fids, cotas, linhas = [], [], []
+        for feature in curvas.getFeatures(request):
+            if feedback.isCanceled():
+                return {self.OUTPUT_ERROS: dest_id}
+            geom = feature.geometry()
+            if geom.isEmpty():
+                continue
+            if QgsWkbTypes.isCurvedType(geom.wkbType()):
+                geom.convertToStraightSegment()
+            rotulo = len(fids)
+            fids.append(feature.id())
+            try:
+                cotas.append(float(feature['cota']))
+            except (TypeError, ValueError):
+                cotas.append(np.nan)
+            for coords in partes_wkb(geom.asWkb()):
+                linhas.append((rotulo, coords))
+        fids = np.asarray(fids, dtype=np.int64)
+        feedback.setProgress(20)
+
+        #Etapa 1: cruzamentos e toques entre segmentos, candidatos por grade uniforme
+        segmentos = empilhar_segmentos(linhas)
+        feedback.pushInfo(f'Procurando interseções entre {len(segmentos)} segmentos')
+        i, j = pares_candidatos(segmentos.caixas())
+        vizinhos = segmentos.adjacentes(i, j)
+        i, j = i[~vizinhos], j[~vizinhos]
+        intersecta, x, y, _ = intersecao_segmentos(segmentos.xy[i], segmentos.xy[j])
+        i, j, x, y = i[intersecta], j[intersecta], x[intersecta], y[intersecta]
+        rotulo_i = segmentos.rotulo[i]
+        rotulo_j = segmentos.rotulo[j]
+        #um cruzamento num vértice partilhado aparece para cada par de segmentos que o tocam:
+        #fica um erro por local e par de curvas
+        if len(i):
+            escala = max(float(np.abs(np.concatenate((x, y))).max()), 1.0)
+            local = agrupar_pontos(x, y, TOLERANCIA_PONTO * escala)
+            par = np.column_stack((local, np.minimum(rotulo_i, rotulo_j), np.maximum(rotulo_i, rotulo_j)))
+            _, unico = np.unique(par, axis=0, return_index=True)
+            unico.sort()
+            x, y, rotulo_i, rotulo_j = x[unico], y[unico], rotulo_i[unico], rotulo_j[unico]
+        feedback.setProgress(60)
+
+        for k in range(len(x)):
+            if feedback.isCanceled():
+                return {self.OUTPUT_ERROS: dest_id}
+            if rotulo_i[k] == rotulo_j[k]:
+                erro = 'Autointerseção de curva'
+            else:
+                erro = 'Interseção entre curvas'
+            self.adicionar_erro(sink, fields, x[k], y[k], erro, fids[rotulo_i[k]], fids[rotulo_j[k]])
+        feedback.pushInfo(f'{len(x)} interseções encontradas.')
+
+        #Etapa 2: aninhamento das curvas fechadas, cada anel deve diferir da curva
+        #que o envolve imediatamente em exatamente uma equidistância
+        feedback.pushInfo('Verificando a consistência das cotas entre curvas vizinhas')
+        aneis = [(rotulo, coords) for rotulo, coords in linhas if anel_fechado(coords)]
+        areas = np.array([area_anel(coords) for _, coords in aneis])
+        index = QgsSpatialIndex()
+        for k, (_, coords) in enumerate(aneis):
+            xmin, ymin = coords.min(axis=0)
+            xmax, ymax = coords.max(axis=0)
+            index.addFeature(k, QgsRectangle(xmin, ymin, xmax, ymax))
+
+        inconsistentes = 0
+        for k, (rotulo, coords) in enumerate(aneis):
+            if feedback.isCanceled():
+                break
+            px, py = coords[0]
+            envolvente = None
+            for candidato in index.intersects(QgsRectangle(px, py, px, py)):
+                if candidato == k or areas[candidato] <= areas[k]:
+                    continue
+                if envolvente is not None and areas[candidato] >= areas[envolvente]:
+                    continue
+                if ponto_no_anel(px, py, aneis[candidato][1]):
+                    envolvente = candidato
+            if envolvente is None:
+                continue
+            rotulo_pai = aneis[envolvente][0]
+            if np.isnan(cotas[rotulo]) or np.isnan(cotas[rotulo_pai]):
+                continue
+            if not math.isclose(abs(cotas[rotulo] - cotas[rotulo_pai]), equidistancia, rel_tol=TOLERANCIA_COTA):
+                inconsistentes += 1
+                self.adicionar_erro(sink, fields, px, py, 'Cota inconsistente com a curva envolvente',
+                                    fids[rotulo], fids[rotulo_pai])
+            if k % 1000 == 0 and aneis:
+                feedback.setProgress(60 + int(40 * k / len(aneis)))
+        feedback.pushInfo(f'{inconsistentes} curvas com cota inconsistente.')
+
+        return {self.OUTPUT_ERROS: dest_id}
+
+    def adicionar_erro(self, sink, fields, x, y, erro, fid_1, fid_2):
+        error_feature = QgsFeature(fields)
+        error_feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(float(x), float(y))))
+        error_feature.setAttributes([erro, int(fid_1), int(fid_2)])
+        sink.addFeature(error_feature, QgsFeatureSink.FastInsert)
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def createInstance(self):
+        return ValidarTopologiaCurvasNivel()
+
+    def name(self):
+        return 'validar_topologia_curvas_nivel'
+
+    def displayName(self):
+        return self.tr('Validar Topologia das Curvas de Nível')
+
+    def group(self):
+        return self.tr('Projeto 2')
+
+    def groupId(self):
+        return 'Projeto2'
+
+    def shortHelpString(self):
+        return self.tr('Este algoritmo aponta cruzamentos e toques entre curvas de nível e curvas '
+                       'fechadas cuja cota não difere de uma equidistância da curva que as envolve.')
@@ -0,0 +1,82 @@
+#Assinaturas (fingerprints) das feições, usadas para descartar rapidamente as
+#feições que não mudaram entre dois dias sem comparar atributo por atributo.
+import hashlib
+import struct
+
+from qgis.PyQt.QtCore import Qt, QDate, QDateTime, QTime, QVariant, QByteArray
+from qgis.core import QgsGeometry
+
+#128 bits tornam colisões irrelevantes mesmo para milhões de feições por dia
+TAMANHO_ASSINATURA = 16
+
+
+def normalizar_valor(valor):
+    """Converte um valor de atributo do QGIS em um valor Python simples (e
+    serializável), com None no lugar de NULL."""
+    if valor is None or (isinstance(valor, QVariant) and valor.isNull()):
+        return None
+    if isinstance(valor, QDateTime):
+        return valor.toString(Qt.ISODateWithMs) if valor.isValid() else None
+    if isinstance(valor, QDate):
+        return valor.toString(Qt.ISODate) if valor.isValid() else None
+    if isinstance(valor, QTime):
+        return valor.toString(Qt.ISODateWithMs) if valor.isValid() else None
+    if isinstance(valor, QByteArray):
+        return bytes(valor)
+    if isinstance(valor, (list, tuple)):
+        return tuple(normalizar_valor(v) for v in valor)
+    return valor
+
+
+def codificar_valor(valor):
+    #cada valor recebe um marcador de tipo e um prefixo de tamanho, para que
+    #sequências diferentes de valores nunca gerem os mesmos bytes
+    if valor is None:
+        dados = b'n'
+    elif isinstance(valor, bool):
+        dados = b'b1' if valor else b'b0'
+    elif isinstance(valor, int):
+        dados = b'i' + str(valor).encode()
+    elif isinstance(valor, float):
+        #1.0 e 1 são iguais na comparação de atributos, então geram a mesma assinatura
+        dados = b'i' + str(int(valor)).encode() if valor.is_integer() else b'f' + repr(valor).encode()
+    elif isinstance(valor, bytes):
+        dados = b'y' + valor
+    elif isinstance(valor, tuple):
+        dados = b't' + b''.join(codificar_valor(v) for v in valor)
+    else:
+        dados = b's' + str(valor).encode('utf-8')
+    return struct.pack('<I', len(dados)) + dados
+
+
+def wkb_normalizado(geom):
+    """WKB da geometria em forma normalizada (ordem canônica de anéis, partes e
+    vértices iniciais), para que geometrias iguais produzam os mesmos bytes."""
+    if geom is None or geom.isNull():
+        return b''
+    normalizada = QgsGeometry(geom)
+    normalizada.normalize()
+    return bytes(normalizada.asWkb())
+
+
+def assinatura(wkb, valores):
+    h = hashlib.blake2b(digest_size=TAMANHO_ASSINATURA)
+    h.update(struct.pack('<I', len(wkb)))
+    h.update(wkb)
+    for valor in valores:
+        h.update(codificar_valor(valor))
+    return h.digest()
+
+
+def assinatura_exata(feature):
+    """Assinatura do WKB original mais todos os atributos, usada quando o delta
+    precisa de toda mudança, sem atributos ignorados nem tolerância."""
+    valores = [normalizar_valor(valor) for valor in feature.attributes()]
+    geom = feature.geometry()
+    return assinatura(b'' if geom.isNull() else bytes(geom.asWkb()), valores)
+
+
+def assinatura_feicao(feature, atributos_comparar):
+    """Assinatura de 128 bits do WKB normalizado mais os atributos comparados."""
+    valores = [normalizar_valor(feature[nome_campo]) for nome_campo in atributos_comparar]
+    return assinatura(wkb_normalizado(feature.geometry()), valores)
@@ -0,0 +1,54 @@
+#Comparação colunar de atributos: os valores dos pares de feições viram colunas NumPy e saem em uma máscara
+#pares x atributos.
+import numpy as np
+
+
+def coluna(valores):
+    """Coluna tipada de valores com None no lugar de NULL. Textos ficam como objetos, porque o texto fixo
+    do NumPy descarta os NULs do final."""
+    tipos = {type(valor) for valor in valores if valor is not None}
+    if tipos <= {int}:
+        try:
+            return np.array([0 if valor is None else valor for valor in valores], dtype=np.int64)
+        except OverflowError:
+            pass
+    elif tipos <= {int, float}:
+        return np.array([np.nan if valor is None else valor for valor in valores], dtype=np.float64)
+    resultado = np.empty(len(valores), dtype=object)
+    for i, valor in enumerate(valores):
+        resultado[i] = valor
+    return resultado
+
+
+def mascara_mudancas(linhas_1, linhas_2, quantidade_campos):
+    """Máscara (pares, atributos) com True onde o valor mudou; NULL igual a NULL não é mudança."""
+    n = len(linhas_1)
+    mascara = np.zeros((n, quantidade_campos), dtype=bool)
+    if n == 0 or quantidade_campos == 0:
+        return mascara
+    colunas_1 = list(zip(*linhas_1))
+    colunas_2 = list(zip(*linhas_2))
+    for j in range(quantidade_campos):
+        valores = list(colunas_1[j]) + list(colunas_2[j])
+        nulos = np.fromiter((valor is None for valor in valores), dtype=bool, count=2 * n)
+        valores = coluna(valores)
+        nulo_1, nulo_2 = nulos[:n], nulos[n:]
+        diferente = np.asarray(valores[:n] != valores[n:], dtype=bool)
+        mascara[:, j] = (nulo_1 != nulo_2) | (~nulo_1 & ~nulo_2 & diferente)
+    return mascara
+
+
+def nomes_modificados(mascara, nomes_atributos):
+    """Lista de atributos modificados de cada par; só as linhas com alguma
+    mudança montam a lista de nomes."""
+    nomes = np.asarray(nomes_atributos, dtype=object)
+    resultado = [[] for _ in range(len(mascara))]
+    if len(nomes) == 0:
+        return resultado
+    for i in np.flatnonzero(mascara.any(axis=1)):
+        resultado[i] = list(nomes[mascara[i]])
+    return resultado
+
+
+def atributos_modificados(linhas_1, linhas_2, nomes_atributos):
+    return nomes_modificados(mascara_mudancas(linhas_1, linhas_2, len(nomes_atributos)), nomes_atributos)
@@ -0,0 +1,87 @@
+#Comparação de geometrias com tolerância, feita com NumPy sobre o WKB para rodar também nos processos auxiliares.
+import numpy as np
+
+from ..geometria import partes_wkb, tipo_wkb
+
+#quantidade máxima de distâncias vértice x segmento calculadas de uma vez
+DISTANCIAS_POR_BLOCO = 1000000
+
+
+def geometria_mudou(wkb_1, wkb_2, tolerancia):
+    """Indica se duas geometrias diferem em mais que a tolerância (unidades do SRC), dos testes mais
+    baratos até uma distância de Hausdorff que para no primeiro vértice além da tolerância."""
+    if wkb_1 == wkb_2:
+        return False
+    if not wkb_1 or not wkb_2:
+        return True
+    if tipo_wkb(wkb_1) != tipo_wkb(wkb_2):
+        return True
+    partes_1 = partes_wkb(wkb_1)
+    partes_2 = partes_wkb(wkb_2)
+    if not partes_1 or not partes_2:
+        return bool(partes_1) != bool(partes_2)
+    tolerancia = max(float(tolerancia), 0.0)
+
+    coords_1 = np.vstack(partes_1)
+    coords_2 = np.vstack(partes_2)
+    caixa_1 = np.r_[coords_1.min(axis=0), coords_1.max(axis=0)]
+    caixa_2 = np.r_[coords_2.min(axis=0), coords_2.max(axis=0)]
+    if np.any(np.abs(caixa_1 - caixa_2) > tolerancia):
+        return True
+
+    #mesma estrutura: basta que cada vértice tenha se deslocado no máximo a tolerância
+    if [len(p) for p in partes_1] == [len(p) for p in partes_2]:
+        deslocamento = np.hypot(coords_1[:, 0] - coords_2[:, 0], coords_1[:, 1] - coords_2[:, 1])
+        if np.all(deslocamento <= tolerancia):
+            return False
+
+    return (_alem_da_tolerancia(coords_1, partes_2, tolerancia)
+            or _alem_da_tolerancia(coords_2, partes_1, tolerancia))
+
+
+def _segmentos(partes):
+    blocos = []
+    for coords in partes:
+        if len(coords) == 1:
+            #ponto isolado vira um segmento degenerado
+            blocos.append(np.hstack((coords, coords)))
+        else:
+            blocos.append(np.hstack((coords[:-1], coords[1:])))
+    return np.vstack(blocos)
+
+
+def hausdorff_limitada(partes_1, partes_2, limite):
+    """Distância de Hausdorff entre os vértices de cada geometria e os segmentos da outra,
+    infinita assim que passa do limite."""
+    if not partes_1 or not partes_2:
+        return 0.0 if bool(partes_1) == bool(partes_2) else np.inf
+    limite = max(float(limite), 0.0)
+    return max(_hausdorff_dirigida(np.vstack(partes_1), partes_2, limite),
+               _hausdorff_dirigida(np.vstack(partes_2), partes_1, limite))
+
+
+def _alem_da_tolerancia(vertices, partes, tolerancia):
+    """True assim que algum vértice está a mais que a tolerância de todos os segmentos das partes."""
+    return np.isinf(_hausdorff_dirigida(vertices, partes, tolerancia))
+
+
+def _hausdorff_dirigida(vertices, partes, limite):
+    """Hausdorff dirigida limitada: maior distância de um vértice aos segmentos das partes,
+    ou infinito no primeiro bloco com algum vértice além do limite."""
+    segmentos = _segmentos(partes)
+    ax, ay = segmentos[:, 0], segmentos[:, 1]
+    dx, dy = segmentos[:, 2] - ax, segmentos[:, 3] - ay
+    comprimento = dx * dx + dy * dy
+    comprimento = np.where(comprimento == 0, 1.0, comprimento)
+    passo = max(DISTANCIAS_POR_BLOCO // len(segmentos), 1)
+    limite = limite * limite
+    maior = 0.0
+    for inicio in range(0, len(vertices), passo):
+        px = vertices[inicio:inicio + passo, 0:1]
+        py = vertices[inicio:inicio + passo, 1:2]
+        t = np.clip(((px - ax) * dx + (py - ay) * dy) / comprimento, 0.0, 1.0)
+        distancia = ((ax + t * dx - px) ** 2 + (ay + t * dy - py) ** 2).min(axis=1).max()
+        if distancia > limite:
+            return np.inf
+        maior = max(maior, float(distancia))
+    return float(np.sqrt(maior))
@@ -0,0 +1,69 @@
+#Corredor percorrido pelas equipes de campo, montado a partir dos pontos do tracker.
+#A trajetória fica guardada como segmentos (e não como um polígono de buffer), e
+#cada trecho de segmentos consecutivos é usado para consultar as camadas por retângulo.
+import numpy as np
+
+#segmentos consecutivos da trajetória agrupados em cada consulta às camadas
+SEGMENTOS_POR_TRECHO = 64
+
+
+def segmentos_trajetoria(pontos):
+    """Segmentos (x1, y1, x2, y2) ligando os pontos na ordem recebida; um único
+    ponto vira um segmento degenerado."""
+    pontos = np.asarray(pontos, dtype=float).reshape(-1, 2)
+    if len(pontos) == 1:
+        return np.hstack((pontos, pontos))
+    return np.hstack((pontos[:-1], pontos[1:]))
+
+
+def segmentos_tocam_caixas(segmentos, caixas, tolerancia):
+    """Indica se algum segmento passa a até a tolerância de cada caixa (recorte de Liang-Barsky)."""
+    caixas = np.asarray(caixas, dtype=float).reshape(-1, 4)
+    if len(caixas) == 0 or len(segmentos) == 0:
+        return np.zeros(len(caixas), dtype=bool)
+    xmin = caixas[:, 0:1] - tolerancia
+    ymin = caixas[:, 1:2] - tolerancia
+    xmax = caixas[:, 2:3] + tolerancia
+    ymax = caixas[:, 3:4] + tolerancia
+    x0, y0 = segmentos[:, 0], segmentos[:, 1]
+    dx, dy = segmentos[:, 2] - x0, segmentos[:, 3] - y0
+
+    t0 = np.zeros((len(caixas), len(segmentos)))
+    t1 = np.ones((len(caixas), len(segmentos)))
+    fora = np.zeros((len(caixas), len(segmentos)), dtype=bool)
+    for p, q in ((-dx, x0 - xmin), (dx, xmax - x0), (-dy, y0 - ymin), (dy, ymax - y0)):
+        p = np.broadcast_to(p, q.shape)
+        paralelo = p == 0
+        fora |= paralelo & (q < 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = q / p
+        t0 = np.where(p < 0, np.maximum(t0, r), t0)
+        t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    return np.any(~fora & (t0 <= t1), axis=1)
+
+
+class Corredor(object):
+    """Trajetória do tracker com a tolerância (nas unidades do SRC) em volta de cada segmento.
+    Recebe os pontos de cada viagem; viagens diferentes não são ligadas entre si."""
+
+    def __init__(self, viagens, tolerancia, segmentos_por_trecho=SEGMENTOS_POR_TRECHO):
+        viagens = [pontos for pontos in viagens if len(pontos)]
+        self.segmentos = np.vstack([segmentos_trajetoria(pontos) for pontos in viagens]) if viagens else np.empty((0, 4))
+        self.tolerancia = max(float(tolerancia), 0.0)
+        self.segmentos_por_trecho = max(int(segmentos_por_trecho), 1)
+
+    def __len__(self):
+        return len(self.segmentos)
+
+    def trechos(self):
+        """Gera (caixa expandida pela tolerância, segmentos) de cada trecho."""
+        for inicio in range(0, len(self.segmentos), self.segmentos_por_trecho):
+            segmentos = self.segmentos[inicio:inicio + self.segmentos_por_trecho]
+            xs = segmentos[:, [0, 2]]
+            ys = segmentos[:, [1, 3]]
+            caixa = (xs.min() - self.tolerancia, ys.min() - self.tolerancia,
+                     xs.max() + self.tolerancia, ys.max() + self.tolerancia)
+            yield caixa, segmentos
+
+    def toca(self, segmentos, caixas):
+        return segmentos_tocam_caixas(segmentos, caixas, self.tolerancia)
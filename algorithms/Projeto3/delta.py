@@ -0,0 +1,315 @@
+#Delta binário compacto entre dois dias, para sincronizar cópias remotas da camada: chave, operação, atributos
+#alterados e coordenadas quantizadas por diferença (zigzag + varint), tudo em gzip.
+import gzip
+import json
+import math
+import struct
+import zlib
+
+MAGICO = b'PGDELTA\x01'
+
+#operações
+ADICIONADA = b'A'
+REMOVIDA = b'R'
+MODIFICADA = b'M'
+
+#codificação da geometria de cada registro
+GEOMETRIA_NULA = 0
+GEOMETRIA_QUANTIZADA = 1
+GEOMETRIA_WKB = 2
+GEOMETRIA_INALTERADA = 3
+
+#marcador devolvido pela leitura quando a geometria de uma modificação não mudou
+INALTERADA = object()
+
+#tipos de valor
+VALOR_NULO, VALOR_FALSO, VALOR_VERDADEIRO, VALOR_INTEIRO, VALOR_REAL, VALOR_TEXTO, VALOR_BYTES, VALOR_TUPLA = range(8)
+
+#tipos WKB (ISO) de geometrias lineares; curvas e afins vão como WKB compactado
+PONTO, LINHA, POLIGONO, MULTIPONTO, MULTILINHA, MULTIPOLIGONO, COLECAO = range(1, 8)
+
+
+def codificar_varint(n):
+    saida = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            saida.append(byte | 0x80)
+        else:
+            saida.append(byte)
+            return bytes(saida)
+
+
+def zigzag(n):
+    return n << 1 if n >= 0 else ((-n) << 1) - 1
+
+
+def desfazer_zigzag(n):
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+def ler_varint(arquivo):
+    n = 0
+    deslocamento = 0
+    while True:
+        byte = arquivo.read(1)
+        if not byte:
+            raise EOFError
+        n |= (byte[0] & 0x7F) << deslocamento
+        if not byte[0] & 0x80:
+            return n
+        deslocamento += 7
+
+
+def _ler_exato(arquivo, tamanho):
+    dados = arquivo.read(tamanho)
+    if len(dados) != tamanho:
+        raise ValueError('Delta truncado.')
+    return dados
+
+
+def codificar_valor(valor):
+    if valor is None:
+        return bytes([VALOR_NULO])
+    if isinstance(valor, bool):
+        return bytes([VALOR_VERDADEIRO if valor else VALOR_FALSO])
+    if isinstance(valor, int):
+        return bytes([VALOR_INTEIRO]) + codificar_varint(zigzag(valor))
+    if isinstance(valor, float):
+        return bytes([VALOR_REAL]) + struct.pack('<d', valor)
+    if isinstance(valor, bytes):
+        return bytes([VALOR_BYTES]) + codificar_varint(len(valor)) + valor
+    if isinstance(valor, tuple):
+        return bytes([VALOR_TUPLA]) + codificar_varint(len(valor)) + b''.join(codificar_valor(v) for v in valor)
+    texto = str(valor).encode('utf-8')
+    return bytes([VALOR_TEXTO]) + codificar_varint(len(texto)) + texto
+
+
+def ler_valor(arquivo):
+    tipo = _ler_exato(arquivo, 1)[0]
+    if tipo == VALOR_NULO:
+        return None
+    if tipo in (VALOR_FALSO, VALOR_VERDADEIRO):
+        return tipo == VALOR_VERDADEIRO
+    if tipo == VALOR_INTEIRO:
+        return desfazer_zigzag(ler_varint(arquivo))
+    if tipo == VALOR_REAL:
+        return struct.unpack('<d', _ler_exato(arquivo, 8))[0]
+    if tipo == VALOR_TUPLA:
+        return tuple(ler_valor(arquivo) for _ in range(ler_varint(arquivo)))
+    dados = _ler_exato(arquivo, ler_varint(arquivo))
+    return dados if tipo == VALOR_BYTES else dados.decode('utf-8')
+
+
+class _LeitorWkb(object):
+    """Percorre um WKB (ISO ou EWKB, qualquer ordem de bytes) convertendo as
+    coordenadas em inteiros quantizados, com diferença em relação à anterior."""
+
+    def __init__(self, wkb, precisao):
+        self.buf = wkb
+        self.pos = 0
+        self.precisao = precisao
+        self.anterior = [0, 0, 0, 0]
+        self.saida = bytearray()
+
+    def _uint(self, ordem):
+        valor = struct.unpack_from(ordem + 'I', self.buf, self.pos)[0]
+        self.pos += 4
+        return valor
+
+    def geometria(self):
+        ordem = '<' if self.buf[self.pos] == 1 else '>'
+        self.pos += 1
+        tipo = self._uint(ordem)
+        if tipo & 0xE0000000:
+            #EWKB: dimensões e SRID em flags
+            tem_z, tem_m = bool(tipo & 0x80000000), bool(tipo & 0x40000000)
+            if tipo & 0x20000000:
+                self.pos += 4
+            base = tipo & 0x0FFFFFFF
+        else:
+            base, dimensao = tipo % 1000, tipo // 1000
+            tem_z, tem_m = dimensao in (1, 3), dimensao in (2, 3)
+        if base < PONTO or base > COLECAO:
+            raise ValueError('Tipo de geometria sem codificação quantizada.')
+        dims = 2 + tem_z + tem_m
+        self.saida += codificar_varint(base + 1000 * tem_z + 2000 * tem_m)
+        if base == PONTO:
+            self._coordenadas(ordem, 1, dims)
+        elif base == LINHA:
+            self._sequencia(ordem, dims)
+        elif base == POLIGONO:
+            aneis = self._uint(ordem)
+            self.saida += codificar_varint(aneis)
+            for _ in range(aneis):
+                self._sequencia(ordem, dims)
+        else:
+            partes = self._uint(ordem)
+            self.saida += codificar_varint(partes)
+            for _ in range(partes):
+                self.geometria()
+
+    def _sequencia(self, ordem, dims):
+        quantidade = self._uint(ordem)
+        self.saida += codificar_varint(quantidade)
+        self._coordenadas(ordem, quantidade, dims)
+
+    def _coordenadas(self, ordem, quantidade, dims):
+        valores = struct.unpack_from(f'{ordem}{quantidade * dims}d', self.buf, self.pos)
+        self.pos += 8 * quantidade * dims
+        for k, valor in enumerate(valores):
+            if not math.isfinite(valor):
+                raise ValueError('Coordenada não finita.')
+            d = k % dims
+            inteiro = round(valor / self.precisao)
+            self.saida += codificar_varint(zigzag(inteiro - self.anterior[d]))
+            self.anterior[d] = inteiro
+
+
+def codificar_geometria(wkb, precisao):
+    """Geometria do registro: coordenadas quantizadas quando possível e, para
+    curvas, pontos vazios e afins, o WKB original compactado."""
+    if not wkb:
+        return bytes([GEOMETRIA_NULA])
+    try:
+        leitor = _LeitorWkb(wkb, precisao)
+        leitor.geometria()
+        return bytes([GEOMETRIA_QUANTIZADA]) + bytes(leitor.saida)
+    except (ValueError, struct.error):
+        compactado = zlib.compress(wkb)
+        return bytes([GEOMETRIA_WKB]) + codificar_varint(len(compactado)) + compactado
+
+
+class _EscritorWkb(object):
+    """Reconstrói o WKB ISO (little endian) a partir das coordenadas quantizadas."""
+
+    def __init__(self, arquivo, precisao):
+        self.arquivo = arquivo
+        self.precisao = precisao
+        self.anterior = [0, 0, 0, 0]
+        self.saida = bytearray()
+
+    def geometria(self):
+        tipo = ler_varint(self.arquivo)
+        base, dimensao = tipo % 1000, tipo // 1000
+        dims = 2 + (dimensao in (1, 3)) + (dimensao in (2, 3))
+        self.saida += struct.pack('<BI', 1, tipo)
+        if base == PONTO:
+            self._coordenadas(1, dims)
+        elif base == LINHA:
+            self._sequencia(dims)
+        elif base == POLIGONO:
+            aneis = ler_varint(self.arquivo)
+            self.saida += struct.pack('<I', aneis)
+            for _ in range(aneis):
+                self._sequencia(dims)
+        else:
+            partes = ler_varint(self.arquivo)
+            self.saida += struct.pack('<I', partes)
+            for _ in range(partes):
+                self.geometria()
+
+    def _sequencia(self, dims):
+        quantidade = ler_varint(self.arquivo)
+        self.saida += struct.pack('<I', quantidade)
+        self._coordenadas(quantidade, dims)
+
+    def _coordenadas(self, quantidade, dims):
+        valores = []
+        for k in range(quantidade * dims):
+            d = k % dims
+            self.anterior[d] += desfazer_zigzag(ler_varint(self.arquivo))
+            valores.append(self.anterior[d] * self.precisao)
+        self.saida += struct.pack(f'<{len(valores)}d', *valores)
+
+
+def ler_geometria(arquivo, precisao):
+    """WKB da geometria do registro, None para geometria nula ou INALTERADA."""
+    tag = _ler_exato(arquivo, 1)[0]
+    if tag == GEOMETRIA_NULA:
+        return None
+    if tag == GEOMETRIA_INALTERADA:
+        return INALTERADA
+    if tag == GEOMETRIA_WKB:
+        return zlib.decompress(_ler_exato(arquivo, ler_varint(arquivo)))
+    escritor = _EscritorWkb(arquivo, precisao)
+    escritor.geometria()
+    return bytes(escritor.saida)
+
+
+class EscritorDelta(object):
+    """Grava, em fluxo, as operações que transformam o dia 1 no dia 2."""
+
+    def __init__(self, caminho, campos, chave_primaria, precisao):
+        self.campos = list(campos)
+        self.indices = {nome: indice for indice, nome in enumerate(self.campos)}
+        self.precisao = float(precisao)
+        self.arquivo = gzip.open(caminho, 'wb')
+        cabecalho = json.dumps({'campos': self.campos, 'chave_primaria': chave_primaria,
+                                'precisao': self.precisao}).encode('utf-8')
+        self.arquivo.write(MAGICO + codificar_varint(len(cabecalho)) + cabecalho)
+        self.quantidade = 0
+
+    def adicionada(self, chave, valores, wkb):
+        self.arquivo.write(ADICIONADA + codificar_valor(chave) + codificar_varint(len(valores))
+                           + b''.join(codificar_valor(valor) for valor in valores)
+                           + codificar_geometria(wkb, self.precisao))
+        self.quantidade += 1
+
+    def removida(self, chave):
+        self.arquivo.write(REMOVIDA + codificar_valor(chave))
+        self.quantidade += 1
+
+    def modificada(self, chave, alterados, wkb=INALTERADA):
+        """alterados: pares (nome do campo, novo valor); wkb só quando a geometria mudou."""
+        registro = bytearray(MODIFICADA + codificar_valor(chave) + codificar_varint(len(alterados)))
+        for nome, valor in alterados:
+            registro += codificar_varint(self.indices[nome]) + codificar_valor(valor)
+        if wkb is INALTERADA:
+            registro.append(GEOMETRIA_INALTERADA)
+        else:
+            registro += codificar_geometria(wkb, self.precisao)
+        self.arquivo.write(bytes(registro))
+        self.quantidade += 1
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+class LeitorDelta(object):
+    """Lê um delta em fluxo; operacoes() gera (operação, chave, dados, wkb)."""
+
+    def __init__(self, caminho):
+        self.arquivo = gzip.open(caminho, 'rb')
+        try:
+            if self.arquivo.read(len(MAGICO)) != MAGICO:
+                raise ValueError(f'{caminho} não é um delta de camada.')
+            cabecalho = json.loads(_ler_exato(self.arquivo, ler_varint(self.arquivo)).decode('utf-8'))
+        except (OSError, EOFError):
+            self.arquivo.close()
+            raise ValueError(f'{caminho} não é um delta de camada.')
+        self.campos = cabecalho['campos']
+        self.chave_primaria = cabecalho['chave_primaria']
+        self.precisao = cabecalho['precisao']
+
+    def operacoes(self):
+        while True:
+            operacao = self.arquivo.read(1)
+            if not operacao:
+                return
+            chave = ler_valor(self.arquivo)
+            if operacao == REMOVIDA:
+                yield operacao, chave, None, None
+            elif operacao == ADICIONADA:
+                valores = tuple(ler_valor(self.arquivo) for _ in range(ler_varint(self.arquivo)))
+                yield operacao, chave, valores, ler_geometria(self.arquivo, self.precisao)
+            elif operacao == MODIFICADA:
+                alterados = [(self.campos[ler_varint(self.arquivo)], ler_valor(self.arquivo))
+                             for _ in range(ler_varint(self.arquivo))]
+                yield operacao, chave, alterados, ler_geometria(self.arquivo, self.precisao)
+            else:
+                raise ValueError('Operação desconhecida no delta.')
+
+    def fechar(self):
+        self.arquivo.close()
@@ -0,0 +1,136 @@
+#importando os módulos
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (QgsProcessing, QgsProcessingAlgorithm, QgsProcessingParameterMultipleLayers,
+                       QgsProcessingParameterString, QgsProcessingParameterFeatureSink, QgsProcessingException,
+                       QgsFeatureSink, QgsFeature, QgsField, QgsFields, QgsWkbTypes)
+
+from .assinatura import assinatura_feicao, normalizar_valor
+from .ordenacao_externa import chave_ordenacao
+
+#posições do estado guardado para cada chave
+ASSINATURA, PRIMEIRO_DIA, ULTIMO_DIA, MODIFICACOES = range(4)
+
+#histórico das mudanças de cada feição ao longo de vários dias de levantamento
+class HistoricoMudancas(QgsProcessingAlgorithm):
+    CAMADAS = 'CAMADAS'
+    CHAVE_PRIMARIA = 'CHAVE_PRIMARIA'
+    OUTPUT_LAYER = 'OUTPUT_LAYER'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterMultipleLayers(
+                self.CAMADAS,
+                'Camadas dos dias, em ordem cronológica',
+                QgsProcessing.TypeVectorAnyGeometry
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.CHAVE_PRIMARIA,
+                'Atributo correspondente à chave primária'
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_LAYER,
+                'Histórico de mudanças',
+                QgsProcessing.TypeVector
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        camadas = self.parameterAsLayerList(parameters, self.CAMADAS, context)
+        chave_primaria = self.parameterAsString(parameters, self.CHAVE_PRIMARIA, context)
+        if len(camadas) < 2:
+            raise QgsProcessingException('Informe pelo menos duas camadas.')
+        for camada in camadas:
+            if camada.fields().indexOf(chave_primaria) == -1:
+                raise QgsProcessingException(f'A camada {camada.name()} não tem o atributo {chave_primaria}.')
+
+        #cada camada é lida uma única vez; entre um dia e outro só fica o estado de cada chave
+        estado = {}
+        for dia, camada in enumerate(camadas, start=1):
+            feedback.pushInfo(f'Lendo o dia {dia}: {camada.name()}')
+            self.acumular_dia(estado, camada, dia, chave_primaria, feedback)
+            if feedback.isCanceled():
+                return {}
+            feedback.setProgress(int(90 * dia / len(camadas)))
+
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT_LAYER,
+            context,
+            campos_historico(),
+            QgsWkbTypes.NoGeometry
+        )
+        ultimo_dia = len(camadas)
+        for chave, ocorrencia in sorted(estado, key=lambda item: (chave_ordenacao(item[0]), item[1])):
+            _, primeiro, ultimo, modificacoes = estado[(chave, ocorrencia)]
+            situacao = 'Ativa' if ultimo == ultimo_dia else 'Removida'
+            nova_feature = QgsFeature()
+            nova_feature.setAttributes(["" if chave is None else str(chave), ocorrencia + 1, primeiro, ultimo,
+                                        modificacoes, situacao])
+            sink.addFeature(nova_feature, QgsFeatureSink.FastInsert)
+        feedback.pushInfo(f'{len(estado)} feições no histórico de {ultimo_dia} dias.')
+
+        return {self.OUTPUT_LAYER: dest_id}
+
+    #atualiza o estado com as feições de um dia: novas chaves entram, e cada assinatura
+    #diferente da guardada conta uma modificação. Chaves repetidas no mesmo dia são
+    #pareadas com as do dia anterior na ordem em que aparecem, como na comparação de dois dias
+    def acumular_dia(self, estado, camada, dia, chave_primaria, feedback):
+        atributos = camada.fields().names()
+        ocorrencias = {}
+        for feature in camada.getFeatures():
+            if feedback.isCanceled():
+                return
+            chave = normalizar_valor(feature.attribute(chave_primaria))
+            ocorrencia = ocorrencias.get(chave, 0)
+            ocorrencias[chave] = ocorrencia + 1
+            atual = assinatura_feicao(feature, atributos)
+            registro = estado.get((chave, ocorrencia))
+            if registro is None:
+                estado[(chave, ocorrencia)] = [atual, dia, dia, 0]
+                continue
+            if registro[ASSINATURA] != atual:
+                registro[ASSINATURA] = atual
+                registro[MODIFICACOES] += 1
+            registro[ULTIMO_DIA] = dia
+        repetidas = [chave for chave, quantidade in ocorrencias.items() if quantidade > 1]
+        if repetidas:
+            exemplos = ', '.join(str(chave) for chave in sorted(repetidas, key=chave_ordenacao)[:10])
+            feedback.reportError(f'{camada.name()}: {len(repetidas)} chaves repetidas no mesmo dia ({exemplos}); '
+                                 'cada repetição tem sua própria linha no histórico.')
+
+    def name(self):
+        return 'historico_mudancas'
+
+    def displayName(self):
+        return 'Histórico de Mudanças'
+
+    def group(self):
+        return 'Projeto 3'
+
+    def groupId(self):
+        return 'Projeto3'
+
+    def shortHelpString(self):
+        return ('Lê uma única vez cada camada de uma sequência de dias e gera, para cada chave, o primeiro e o '
+                'último dia em que aparece (pela posição na lista), quantas vezes mudou e se ainda existe no último dia. '
+                'Chaves repetidas em um mesmo dia são informadas e acompanhadas separadamente, pela ordem de ocorrência.')
+
+    def createInstance(self):
+        return HistoricoMudancas()
+
+#campos da tabela de histórico
+def campos_historico():
+    fields = QgsFields()
+    fields.append(QgsField("id", QVariant.String))
+    fields.append(QgsField("ocorrencia", QVariant.Int))
+    fields.append(QgsField("primeiro_dia", QVariant.Int))
+    fields.append(QgsField("ultimo_dia", QVariant.Int))
+    fields.append(QgsField("modificacoes", QVariant.Int))
+    fields.append(QgsField("situacao", QVariant.String))
+    return fields
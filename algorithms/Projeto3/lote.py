@@ -0,0 +1,253 @@
+#importando os módulos
+import glob
+import os
+
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (QgsProcessing, QgsProcessingAlgorithm, QgsProcessingParameterMultipleLayers,
+                       QgsProcessingParameterFile, QgsProcessingParameterString, QgsProcessingParameterNumber,
+                       QgsProcessingParameterFeatureSink, QgsProcessingException, QgsProcessingUtils,
+                       QgsFeatureSink, QgsFeature, QgsField, QgsFields, QgsGeometry, QgsVectorLayer, QgsWkbTypes)
+
+import numpy as np
+
+from .particionamento import PARTICOES_POR_PROCESSO, comparar_grupos
+from .solucao import particionar_camada
+from .trajetoria import RAIO_TERRA
+
+#comparação de vários pares de dias de uma vez, sem interação com o usuário
+class IdentificarMudancasLote(QgsProcessingAlgorithm):
+    CAMADAS = 'CAMADAS'
+    PASTA = 'PASTA'
+    PARES = 'PARES'
+    CHAVE_PRIMARIA = 'CHAVE_PRIMARIA'
+    ATRIBUTOS_IGNORADOS = 'ATRIBUTOS_IGNORADOS'
+    TOLERANCIA = 'TOLERANCIA'
+    PROCESSOS = 'PROCESSOS'
+    OUTPUT_LAYER = 'OUTPUT_LAYER'
+    OUTPUT_RESUMO = 'OUTPUT_RESUMO'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterMultipleLayers(
+                self.CAMADAS,
+                'Camadas dos dias, em ordem cronológica',
+                QgsProcessing.TypeVectorAnyGeometry,
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.PASTA,
+                'Pasta com um GeoPackage por dia (em ordem de nome)',
+                behavior=QgsProcessingParameterFile.Folder,
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.PARES,
+                'Pares de dias a comparar, pela posição das camadas (ex.: 1-2, 1-3); vazio compara cada dia com o seguinte',
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.CHAVE_PRIMARIA,
+                'Atributo correspondente à chave primária'
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.ATRIBUTOS_IGNORADOS,
+                'Atributos a ignorar na comparação (separados por vírgula)',
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCIA,
+                'Distância de tolerância (metros)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=2.0
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.PROCESSOS,
+                'Processos para a comparação',
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=max((os.cpu_count() or 2) - 1, 1),
+                minValue=1
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_LAYER,
+                'Camada de mudanças consolidada'
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_RESUMO,
+                'Resumo das mudanças por par de dias',
+                QgsProcessing.TypeVector
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        camadas = self.obter_camadas(parameters, context)
+        chave_primaria = self.parameterAsString(parameters, self.CHAVE_PRIMARIA, context)
+        ignorados = self.parameterAsString(parameters, self.ATRIBUTOS_IGNORADOS, context)
+        tolerancia = self.parameterAsDouble(parameters, self.TOLERANCIA, context)
+        processos = self.parameterAsInt(parameters, self.PROCESSOS, context)
+        pares = self.obter_pares(self.parameterAsString(parameters, self.PARES, context), len(camadas))
+        #só são lidas as camadas de algum par
+        usadas = sorted({indice for par in pares for indice in par})
+        camadas_usadas = [camadas[indice] for indice in usadas]
+
+        for camada in camadas_usadas:
+            if camada.fields().indexOf(chave_primaria) == -1:
+                raise QgsProcessingException(f'A camada {camada.name()} não tem o atributo {chave_primaria}.')
+        #só entram os atributos presentes em todos os dias
+        atributos_ignorados = {nome.strip() for nome in ignorados.split(',') if nome.strip()}
+        comuns = set.intersection(*[set(camada.fields().names()) for camada in camadas_usadas])
+        atributos_comparar = [nome for nome in camadas_usadas[0].fields().names() if nome in comuns and nome not in atributos_ignorados]
+
+        #todas as camadas são comparadas no SRC da primeira; a tolerância em metros vira graus em SRC geográfico
+        crs = camadas_usadas[0].crs()
+        if crs.isGeographic():
+            tolerancia = float(np.degrees(tolerancia / RAIO_TERRA))
+
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT_LAYER,
+            context,
+            campos_mudancas_lote(),
+            camadas_usadas[0].wkbType(),
+            crs
+        )
+        (sink_resumo, resumo_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT_RESUMO,
+            context,
+            campos_resumo(),
+            QgsWkbTypes.NoGeometry
+        )
+
+        #cada dia é lido e particionado uma única vez, mesmo participando de dois pares
+        particoes = processos * PARTICOES_POR_PROCESSO
+        diretorio = QgsProcessingUtils.tempFolder()
+        particionados = []
+        try:
+            for camada in camadas_usadas:
+                feedback.pushInfo(f'Lendo {camada.name()}')
+                particionados.append(particionar_camada(camada, chave_primaria, atributos_comparar, particoes, diretorio, feedback,
+                                                        crs=crs, transform_context=context.transformContext()))
+                if feedback.isCanceled():
+                    return {}
+            arquivos = dict(zip(usadas, [particionado.fechar() for particionado in particionados]))
+            grupos = [list(zip(arquivos[i], arquivos[j])) for i, j in pares]
+
+            feedback.pushInfo(f'Comparando {len(grupos)} pares de dias em {processos} processos.')
+            for indice, mudancas in comparar_grupos(grupos, atributos_comparar, tolerancia, processos, feedback.isCanceled):
+                camada_1, camada_2 = camadas[pares[indice][0]].name(), camadas[pares[indice][1]].name()
+                contagem = {'Adicionada': 0, 'Removida': 0, 'Modificada': 0}
+                for _, _, tipo, chave, wkb, modificados in mudancas:
+                    geometria = QgsGeometry()
+                    if wkb:
+                        geometria.fromWkb(wkb)
+                    nova_feature = QgsFeature()
+                    nova_feature.setGeometry(geometria)
+                    nova_feature.setAttributes([indice + 1, camada_1, camada_2, "" if chave is None else str(chave),
+                                                tipo, ", ".join(modificados)])
+                    sink.addFeature(nova_feature, QgsFeatureSink.FastInsert)
+                    contagem[tipo] += 1
+                resumo = QgsFeature()
+                resumo.setAttributes([indice + 1, camada_1, camada_2, contagem['Adicionada'],
+                                      contagem['Removida'], contagem['Modificada']])
+                sink_resumo.addFeature(resumo, QgsFeatureSink.FastInsert)
+                feedback.setProgress(int(100 * (indice + 1) / len(grupos)))
+        finally:
+            for particionado in particionados:
+                particionado.limpar()
+
+        return {self.OUTPUT_LAYER: dest_id, self.OUTPUT_RESUMO: resumo_id}
+
+    #pares (índices a partir de 0) lidos de "1-2, 1-3"; sem pares, cada dia com o seguinte
+    def obter_pares(self, texto, quantidade):
+        if not texto.strip():
+            return [(i, i + 1) for i in range(quantidade - 1)]
+        pares = []
+        for item in texto.split(','):
+            try:
+                dia_1, dia_2 = (int(valor) for valor in item.split('-'))
+            except ValueError:
+                raise QgsProcessingException(f'Par de dias inválido: "{item.strip()}". Use o formato 1-2.')
+            if not (1 <= dia_1 <= quantidade and 1 <= dia_2 <= quantidade) or dia_1 == dia_2:
+                raise QgsProcessingException(f'O par {dia_1}-{dia_2} não corresponde a duas das {quantidade} camadas.')
+            pares.append((dia_1 - 1, dia_2 - 1))
+        return pares
+
+    #camadas informadas diretamente ou os GeoPackages da pasta, em ordem de nome
+    def obter_camadas(self, parameters, context):
+        camadas = self.parameterAsLayerList(parameters, self.CAMADAS, context)
+        pasta = self.parameterAsFile(parameters, self.PASTA, context)
+        if not camadas and pasta:
+            for caminho in sorted(glob.glob(os.path.join(pasta, '*.gpkg'))):
+                camada = QgsVectorLayer(caminho, os.path.splitext(os.path.basename(caminho))[0], 'ogr')
+                if not camada.isValid():
+                    raise QgsProcessingException(f'Falha ao carregar a camada {caminho}!')
+                camadas.append(camada)
+        if len(camadas) < 2:
+            raise QgsProcessingException('Informe pelo menos duas camadas ou uma pasta com pelo menos dois GeoPackages.')
+        return camadas
+
+    def name(self):
+        return 'identificar_mudancas_lote'
+
+    def displayName(self):
+        return 'Identificar Mudanças em Lote'
+
+    def group(self):
+        return 'Projeto 3'
+
+    def groupId(self):
+        return 'Projeto3'
+
+    def shortHelpString(self):
+        return ('Compara os pares de dias informados, ou cada dia com o seguinte (1 com 2, 2 com 3, ...), sem janelas de '
+                'diálogo, lendo cada camada uma única vez, no SRC da primeira, e comparando os pares em paralelo. Gera uma '
+                'camada de mudanças consolidada e um resumo por par.')
+
+    def createInstance(self):
+        return IdentificarMudancasLote()
+
+#campos da camada de mudanças consolidada
+def campos_mudancas_lote():
+    fields = QgsFields()
+    fields.append(QgsField("par", QVariant.Int))
+    fields.append(QgsField("camada_1", QVariant.String))
+    fields.append(QgsField("camada_2", QVariant.String))
+    fields.append(QgsField("id", QVariant.String))
+    fields.append(QgsField("tipo_mudanca", QVariant.String))
+    fields.append(QgsField("atributos_modificados", QVariant.String))
+    return fields
+
+#campos da tabela de resumo
+def campos_resumo():
+    fields = QgsFields()
+    fields.append(QgsField("par", QVariant.Int))
+    fields.append(QgsField("camada_1", QVariant.String))
+    fields.append(QgsField("camada_2", QVariant.String))
+    fields.append(QgsField("adicionadas", QVariant.Int))
+    fields.append(QgsField("removidas", QVariant.Int))
+    fields.append(QgsField("modificadas", QVariant.Int))
+    return fields
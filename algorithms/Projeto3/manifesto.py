@@ -0,0 +1,142 @@
+#Manifesto de um dia de levantamento em SQLite (assinaturas, hashes, caixa e WKB por chave), que substitui a
+#releitura da camada do dia anterior na comparação seguinte.
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import zlib
+
+from .assinatura import TAMANHO_ASSINATURA, codificar_valor, normalizar_valor
+from .ordenacao_externa import chave_ordenacao
+
+VERSAO_MANIFESTO = 2
+#bytes do hash de cada atributo; os hashes de uma feição ficam concatenados em um BLOB
+TAMANHO_HASH_CAMPO = 8
+#feições gravadas por transação
+REGISTROS_POR_TRANSACAO = 10000
+
+
+def hash_geometria(wkb):
+    return hashlib.blake2b(wkb, digest_size=TAMANHO_ASSINATURA).digest()
+
+
+def hashes_campos(valores):
+    return b''.join(hashlib.blake2b(codificar_valor(valor), digest_size=TAMANHO_HASH_CAMPO).digest()
+                    for valor in valores)
+
+
+def hash_campo(hashes, posicao):
+    return hashes[posicao * TAMANHO_HASH_CAMPO:(posicao + 1) * TAMANHO_HASH_CAMPO]
+
+
+def assinatura_registro(hash_geom, hashes):
+    return hashlib.blake2b(hash_geom + hashes, digest_size=TAMANHO_ASSINATURA).digest()
+
+
+def resumir_feicao(feature):
+    """(wkb, hash da geometria, hashes dos atributos, caixa) de uma feição. O WKB é
+    o original, para que o hash acuse qualquer mudança nos bytes da geometria."""
+    geom = feature.geometry()
+    wkb = b'' if geom.isNull() else bytes(geom.asWkb())
+    caixa = None
+    if not geom.isNull():
+        bbox = geom.boundingBox()
+        caixa = (bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum())
+    hashes = hashes_campos([normalizar_valor(valor) for valor in feature.attributes()])
+    return wkb, hash_geometria(wkb), hashes, caixa
+
+
+class Manifesto(object):
+    """Tabela chave -> resumo da feição de um dia, devolvida na ordem de chave_ordenacao."""
+
+    def __init__(self, caminho, conexao):
+        self.caminho = caminho
+        self.conexao = conexao
+        metadados = dict(conexao.execute('SELECT nome, valor FROM metadados'))
+        self.chave_primaria = metadados.get('chave_primaria')
+        self.campos = json.loads(metadados.get('campos', '[]'))
+        self.crs = metadados.get('crs', '')
+        self.pendentes = []
+
+    @classmethod
+    def criar(cls, caminho, campos, chave_primaria, crs=''):
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        conexao = sqlite3.connect(caminho)
+        conexao.executescript('''
+            CREATE TABLE metadados (nome TEXT PRIMARY KEY, valor TEXT);
+            CREATE TABLE feicoes (
+                tipo_chave INTEGER, chave_num, chave_txt TEXT, chave BLOB, fid INTEGER,
+                assinatura BLOB, hash_geometria BLOB, hashes_campos BLOB,
+                xmin REAL, ymin REAL, xmax REAL, ymax REAL, geometria BLOB);
+        ''')
+        conexao.executemany('INSERT INTO metadados VALUES (?, ?)', [
+            ('versao', str(VERSAO_MANIFESTO)),
+            ('chave_primaria', chave_primaria),
+            ('campos', json.dumps(list(campos))),
+            ('crs', crs),
+        ])
+        conexao.commit()
+        return cls(caminho, conexao)
+
+    @classmethod
+    def abrir(cls, caminho):
+        if not os.path.exists(caminho):
+            raise ValueError(f'O manifesto {caminho} não existe.')
+        conexao = sqlite3.connect(caminho)
+        try:
+            versao = conexao.execute("SELECT valor FROM metadados WHERE nome = 'versao'").fetchone()
+        except sqlite3.DatabaseError:
+            versao = None
+        if versao is None or int(versao[0]) != VERSAO_MANIFESTO:
+            conexao.close()
+            raise ValueError(f'{caminho} não é um manifesto de camada compatível.')
+        return cls(caminho, conexao)
+
+    def adicionar(self, chave, fid, wkb, hash_geom, hashes, caixa):
+        tipo, numero, texto = chave_ordenacao(chave)
+        xmin, ymin, xmax, ymax = caixa if caixa is not None else (None, None, None, None)
+        self.pendentes.append((tipo, numero, texto, pickle.dumps(chave, pickle.HIGHEST_PROTOCOL), fid,
+                               assinatura_registro(hash_geom, hashes), hash_geom, hashes,
+                               xmin, ymin, xmax, ymax, zlib.compress(wkb)))
+        if len(self.pendentes) >= REGISTROS_POR_TRANSACAO:
+            self._gravar()
+
+    def _gravar(self):
+        self.conexao.executemany('INSERT INTO feicoes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', self.pendentes)
+        self.conexao.commit()
+        self.pendentes = []
+
+    def finalizar(self):
+        self._gravar()
+        self.conexao.execute('CREATE INDEX IF NOT EXISTS feicoes_chave ON feicoes (tipo_chave, chave_num, chave_txt, fid)')
+        self.conexao.commit()
+
+    def __len__(self):
+        return self.conexao.execute('SELECT count(*) FROM feicoes').fetchone()[0]
+
+    def registros(self):
+        """Gera (chave de ordenação, rowid, assinatura, chave, hash da geometria,
+        hashes dos atributos) em ordem de chave, sem carregar as geometrias."""
+        cursor = self.conexao.execute(
+            'SELECT rowid, chave, assinatura, hash_geometria, hashes_campos FROM feicoes '
+            'ORDER BY tipo_chave, chave_num, chave_txt, fid')
+        for rowid, chave, assinatura, hash_geom, hashes in cursor:
+            chave = pickle.loads(chave)
+            yield chave_ordenacao(chave), rowid, assinatura, chave, hash_geom, hashes
+
+    def geometrias(self, rowids):
+        """WKB das feições de uma lista de rowids."""
+        resultado = {}
+        rowids = list(rowids)
+        #o SQLite limita a quantidade de parâmetros por consulta
+        for inicio in range(0, len(rowids), 500):
+            lote = rowids[inicio:inicio + 500]
+            consulta = f'SELECT rowid, geometria FROM feicoes WHERE rowid IN ({", ".join("?" * len(lote))})'
+            for rowid, geometria in self.conexao.execute(consulta, lote):
+                resultado[rowid] = zlib.decompress(geometria)
+        return resultado
+
+    def fechar(self):
+        self.conexao.close()
@@ -0,0 +1,101 @@
+#Ordenação externa (sort-merge) de chaves, assinaturas e ids, para comparar camadas maiores que a memória.
+import heapq
+import os
+import pickle
+import tempfile
+
+#estimativa do espaço ocupado em memória por um registro (chave, assinatura, fid)
+BYTES_POR_REGISTRO = 200
+#registros gravados juntos em cada bloco dos arquivos temporários
+REGISTROS_POR_BLOCO = 1000
+
+
+def chave_ordenacao(chave):
+    """Chave comparável entre tipos diferentes: NULL primeiro, depois números e
+    por fim textos, de modo que camadas com chaves mistas possam ser ordenadas."""
+    if chave is None:
+        return (0, 0, '')
+    if isinstance(chave, (int, float)) and not isinstance(chave, bool):
+        return (1, chave, '')
+    return (2, 0, str(chave))
+
+
+class OrdenadorExterno(object):
+    """Ordena registros (chave de ordenação primeiro), gravando sequências em disco quando o buffer
+    passa de limite_registros e intercalando-as na leitura."""
+
+    def __init__(self, limite_registros, diretorio=None):
+        self.limite_registros = max(int(limite_registros), REGISTROS_POR_BLOCO)
+        self.diretorio = diretorio
+        self.buffer = []
+        self.arquivos = []
+        self.quantidade = 0
+
+    def adicionar(self, registro):
+        self.buffer.append(registro)
+        self.quantidade += 1
+        if len(self.buffer) >= self.limite_registros:
+            self._descarregar()
+
+    def _descarregar(self):
+        self.buffer.sort()
+        arquivo = tempfile.NamedTemporaryFile(prefix='mudancas_', suffix='.run', dir=self.diretorio, delete=False)
+        with arquivo:
+            for inicio in range(0, len(self.buffer), REGISTROS_POR_BLOCO):
+                pickle.dump(self.buffer[inicio:inicio + REGISTROS_POR_BLOCO], arquivo, pickle.HIGHEST_PROTOCOL)
+        self.arquivos.append(arquivo.name)
+        self.buffer = []
+
+    @property
+    def sequencias_em_disco(self):
+        return len(self.arquivos)
+
+    def registros(self):
+        """Gerador com todos os registros em ordem; remove os arquivos ao terminar."""
+        self.buffer.sort()
+        if not self.arquivos:
+            yield from self.buffer
+            return
+        try:
+            yield from heapq.merge(self.buffer, *[ler_sequencia(nome) for nome in self.arquivos])
+        finally:
+            self.limpar()
+
+    def limpar(self):
+        for nome in self.arquivos:
+            try:
+                os.remove(nome)
+            except OSError:
+                pass
+        self.arquivos = []
+        self.buffer = []
+
+
+def ler_sequencia(nome):
+    """Lê, bloco a bloco, os registros gravados em um arquivo temporário."""
+    with open(nome, 'rb') as arquivo:
+        while True:
+            try:
+                bloco = pickle.load(arquivo)
+            except EOFError:
+                return
+            yield from bloco
+
+
+def mesclar_ordenados(registros_1, registros_2):
+    """Gera ('Removida', r1, None), ('Adicionada', None, r2) ou ('Comum', r1, r2) para cada chave de duas
+    sequências ordenadas; chaves repetidas são pareadas na ordem em que aparecem."""
+    iter_1, iter_2 = iter(registros_1), iter(registros_2)
+    r1 = next(iter_1, None)
+    r2 = next(iter_2, None)
+    while r1 is not None or r2 is not None:
+        if r2 is None or (r1 is not None and r1[0] < r2[0]):
+            yield 'Removida', r1, None
+            r1 = next(iter_1, None)
+        elif r1 is None or r2[0] < r1[0]:
+            yield 'Adicionada', None, r2
+            r2 = next(iter_2, None)
+        else:
+            yield 'Comum', r1, r2
+            r1 = next(iter_1, None)
+            r2 = next(iter_2, None)
@@ -0,0 +1,104 @@
+#Pareamento espacial das feições de dois dias, para fontes sem chave primária estável.
+import numpy as np
+
+from ..geometria import componentes_conexos, pares_candidatos, partes_wkb
+from .comparacao import hausdorff_limitada
+
+#pesos da pontuação de cada par candidato
+PESO_SOBREPOSICAO = 0.25
+PESO_GEOMETRIA = 0.5
+PESO_ATRIBUTOS = 0.25
+
+
+def pares_proximos(caixas_1, caixas_2, tolerancia):
+    """Pares (i, j) de feições dos dias 1 e 2 cujas caixas diferem no máximo a tolerância em cada lado."""
+    n1 = len(caixas_1)
+    if n1 == 0 or len(caixas_2) == 0:
+        vazio = np.empty(0, dtype=np.int64)
+        return vazio, vazio
+    meia = max(float(tolerancia), 0.0) / 2.0
+    caixas = np.vstack((caixas_1, caixas_2)) + np.array([-meia, -meia, meia, meia])
+    grupo = np.r_[np.zeros(n1, dtype=np.int8), np.ones(len(caixas_2), dtype=np.int8)]
+    i, j = pares_candidatos(caixas, grupo=grupo)
+    #i < j e os índices do dia 1 vêm antes, então i é sempre do dia 1
+    j = j - n1
+    perto = deslocamento_caixas(caixas_1[i], caixas_2[j]) <= tolerancia
+    return i[perto], j[perto]
+
+
+def deslocamento_caixas(a, b):
+    """Maior diferença entre os lados correspondentes das caixas (a distância de
+    Hausdorff entre os retângulos)."""
+    return np.abs(a - b).max(axis=1)
+
+
+def sobreposicao_caixas(a, b):
+    """Interseção sobre união das caixas; caixas degeneradas (pontos, linhas
+    retas) que coincidem contam como sobreposição total."""
+    largura = np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0, None)
+    altura = np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0, None)
+    intersecao = largura * altura
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    uniao = area_a + area_b - intersecao
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = np.where(uniao > 0, intersecao / uniao, 0.0)
+    iguais = np.all(a == b, axis=1)
+    return np.where(iguais, 1.0, iou)
+
+
+def pontuar(caixas_1, caixas_2, wkbs_1, wkbs_2, hashes_1, hashes_2, i, j, tolerancia):
+    """Pontuação (0 a 1) de cada par: sobreposição das caixas, distância de Hausdorff
+    entre as geometrias (limitada à tolerância) e atributos iguais."""
+    partes_1, partes_2 = {}, {}
+    distancia = np.empty(len(i))
+    for k, (u, v) in enumerate(zip(i.tolist(), j.tolist())):
+        if u not in partes_1:
+            partes_1[u] = partes_wkb(wkbs_1[u])
+        if v not in partes_2:
+            partes_2[v] = partes_wkb(wkbs_2[v])
+        distancia[k] = hausdorff_limitada(partes_1[u], partes_2[v], tolerancia)
+    if tolerancia > 0:
+        proximidade = 1.0 - np.clip(distancia / tolerancia, 0.0, 1.0)
+    else:
+        proximidade = (distancia == 0).astype(float)
+    if hashes_1.shape[1]:
+        atributos = (hashes_1[i] == hashes_2[j]).mean(axis=1)
+    else:
+        atributos = np.ones(len(i))
+    return (PESO_SOBREPOSICAO * sobreposicao_caixas(caixas_1[i], caixas_2[j]) + PESO_GEOMETRIA * proximidade
+            + PESO_ATRIBUTOS * atributos)
+
+
+def componentes(i, j, n1, n2):
+    """Rótulo do componente conexo de cada aresta do grafo bipartido de candidatos,
+    com os vértices do dia 2 numerados depois dos do dia 1."""
+    return componentes_conexos(n1 + n2, i, j + n1)[i]
+
+
+def atribuir(i, j, pontuacao, n1, n2):
+    """Atribuição gulosa um para um, por pontuação decrescente dentro de cada componente conexo."""
+    if len(i) == 0:
+        vazio = np.empty(0, dtype=np.int64)
+        return vazio, vazio
+    componente = componentes(i, j, n1, n2)
+    #componente primeiro e pontuação decrescente depois; empates pelos índices, para ser determinístico
+    ordem = np.lexsort((j, i, -pontuacao, componente))
+    livre_1 = np.ones(n1, dtype=bool)
+    livre_2 = np.ones(n2, dtype=bool)
+    aceitos = []
+    for k in ordem.tolist():
+        u, v = i[k], j[k]
+        if livre_1[u] and livre_2[v]:
+            livre_1[u] = False
+            livre_2[v] = False
+            aceitos.append(k)
+    aceitos = np.asarray(aceitos, dtype=np.int64)
+    return i[aceitos], j[aceitos]
+
+
+def parear(caixas_1, caixas_2, wkbs_1, wkbs_2, hashes_1, hashes_2, tolerancia):
+    """Pareia as feições dos dois dias; retorna os índices (dia 1, dia 2) dos pares."""
+    i, j = pares_proximos(caixas_1, caixas_2, tolerancia)
+    pontuacao = pontuar(caixas_1, caixas_2, wkbs_1, wkbs_2, hashes_1, hashes_2, i, j, tolerancia)
+    return atribuir(i, j, pontuacao, len(caixas_1), len(caixas_2))
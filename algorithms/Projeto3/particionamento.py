@@ -0,0 +1,173 @@
+#Comparação particionada pela chave primária, com cada partição comparada em um processo auxiliar.
+import hashlib
+import heapq
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .colunas import atributos_modificados
+from .comparacao import geometria_mudou
+from .ordenacao_externa import REGISTROS_POR_BLOCO, ler_sequencia, mesclar_ordenados
+
+#partições criadas por processo, para equilibrar a carga quando as chaves se concentram
+PARTICOES_POR_PROCESSO = 4
+
+
+def particao(chave, particoes):
+    """Partição de uma chave de ordenação; estável entre execuções e processos
+    (não usa hash(), que muda a cada interpretador)."""
+    tipo, valor, texto = chave
+    if isinstance(valor, float) and valor.is_integer():
+        #5 e 5.0 são a mesma chave para mesclar_ordenados, então vão para a mesma partição
+        valor = int(valor)
+    h = hashlib.blake2b(repr((tipo, valor, texto)).encode('utf-8'), digest_size=8)
+    return int.from_bytes(h.digest(), 'little') % particoes
+
+
+class Particionador(object):
+    """Distribui registros (chave de ordenação, fid, chave, wkb normalizado, valores, wkb original ou
+    None) entre arquivos temporários, um por partição."""
+
+    def __init__(self, particoes, diretorio=None):
+        self.particoes = particoes
+        self.buffers = [[] for _ in range(particoes)]
+        self.arquivos = []
+        for _ in range(particoes):
+            arquivo = tempfile.NamedTemporaryFile(prefix='particao_', suffix='.part', dir=diretorio, delete=False)
+            self.arquivos.append(arquivo)
+        self.quantidade = 0
+
+    def adicionar(self, registro):
+        indice = particao(registro[0], self.particoes)
+        buffer = self.buffers[indice]
+        buffer.append(registro)
+        self.quantidade += 1
+        if len(buffer) >= REGISTROS_POR_BLOCO:
+            pickle.dump(buffer, self.arquivos[indice], pickle.HIGHEST_PROTOCOL)
+            self.buffers[indice] = []
+
+    def fechar(self):
+        """Grava o que restou nos buffers e devolve os nomes dos arquivos."""
+        for arquivo, buffer in zip(self.arquivos, self.buffers):
+            if not arquivo.closed:
+                if buffer:
+                    pickle.dump(buffer, arquivo, pickle.HIGHEST_PROTOCOL)
+                arquivo.close()
+        self.buffers = [[] for _ in range(self.particoes)]
+        return [arquivo.name for arquivo in self.arquivos]
+
+    def limpar(self):
+        for arquivo in self.arquivos:
+            arquivo.close()
+            try:
+                os.remove(arquivo.name)
+            except OSError:
+                pass
+
+
+def wkb_original(registro):
+    return registro[3] if registro[5] is None else registro[5]
+
+
+def comparar_particao(arquivo_1, arquivo_2, nomes_atributos, tolerancia):
+    """Compara uma partição dos dois dias no processo auxiliar e devolve o arquivo com as mudanças em
+    ordem de chave."""
+    registros_1 = sorted(ler_sequencia(arquivo_1))
+    registros_2 = sorted(ler_sequencia(arquivo_2))
+    pares = list(mesclar_ordenados(registros_1, registros_2))
+    #atributos de todos os pares comuns da partição comparados de uma vez, em colunas
+    comuns = [(registro_1, registro_2) for tipo, registro_1, registro_2 in pares if tipo == 'Comum']
+    modificados_comuns = iter(atributos_modificados([registro_1[4] for registro_1, _ in comuns],
+                                                    [registro_2[4] for _, registro_2 in comuns],
+                                                    nomes_atributos))
+    saida = tempfile.NamedTemporaryFile(prefix='mudancas_', suffix='.part', dir=os.path.dirname(arquivo_1), delete=False)
+    with saida:
+        bloco = []
+        sequencia = 0
+        for tipo, registro_1, registro_2 in pares:
+            if tipo == 'Removida':
+                mudanca = (registro_1[0], sequencia, tipo, registro_1[2], wkb_original(registro_1), [])
+            elif tipo == 'Adicionada':
+                mudanca = (registro_2[0], sequencia, tipo, registro_2[2], wkb_original(registro_2), [])
+            else:
+                modificados = next(modificados_comuns)
+                if geometria_mudou(registro_1[3], registro_2[3], tolerancia):
+                    modificados.append('geometria')
+                if not modificados:
+                    continue
+                mudanca = (registro_1[0], sequencia, 'Modificada', registro_1[2], wkb_original(registro_1), modificados)
+            bloco.append(mudanca)
+            sequencia += 1
+            if len(bloco) >= REGISTROS_POR_BLOCO:
+                pickle.dump(bloco, saida, pickle.HIGHEST_PROTOCOL)
+                bloco = []
+        if bloco:
+            pickle.dump(bloco, saida, pickle.HIGHEST_PROTOCOL)
+    return saida.name
+
+
+def remover_arquivos(nomes):
+    for nome in nomes:
+        try:
+            os.remove(nome)
+        except OSError:
+            pass
+
+
+def mesclar_resultados(nomes):
+    """Intercala, lendo bloco a bloco, as mudanças gravadas pelas partições de
+    um grupo e apaga os arquivos ao terminar."""
+    try:
+        yield from heapq.merge(*[ler_sequencia(nome) for nome in nomes], key=lambda mudanca: (mudanca[0], mudanca[1]))
+    finally:
+        remover_arquivos(nomes)
+
+
+def contexto_processos():
+    """Contexto 'spawn' (o único seguro dentro do QGIS). No QGIS o sys.executable
+    é o próprio executável do QGIS, então os processos usam o python ao lado dele."""
+    contexto = multiprocessing.get_context('spawn')
+    if not os.path.basename(sys.executable).lower().startswith('python'):
+        nome = 'python.exe' if sys.platform == 'win32' else 'python3'
+        for pasta in (sys.exec_prefix, os.path.join(sys.exec_prefix, 'bin')):
+            candidato = os.path.join(pasta, nome)
+            if os.path.exists(candidato):
+                contexto.set_executable(candidato)
+                break
+    return contexto
+
+
+def comparar_particoes(pares_arquivos, nomes_atributos, tolerancia, processos, cancelado=None):
+    """Compara os pares de partições em paralelo e gera as mudanças em ordem de chave."""
+    for _, mudancas in comparar_grupos([pares_arquivos], nomes_atributos, tolerancia, processos, cancelado):
+        yield from mudancas
+
+
+def comparar_grupos(grupos, nomes_atributos, tolerancia, processos, cancelado=None):
+    """Como comparar_particoes, para vários grupos de pares em um só conjunto de processos. Gera (índice
+    do grupo, mudanças lidas do disco em ordem de chave), na ordem dos grupos."""
+    executor = ProcessPoolExecutor(max_workers=processos, mp_context=contexto_processos())
+    futuros = []
+    entregues = 0
+    try:
+        futuros = [[executor.submit(comparar_particao, arquivo_1, arquivo_2, list(nomes_atributos), tolerancia)
+                    for arquivo_1, arquivo_2 in pares_arquivos]
+                   for pares_arquivos in grupos]
+        for indice, futuros_grupo in enumerate(futuros):
+            nomes = []
+            for futuro in futuros_grupo:
+                if cancelado is not None and cancelado():
+                    return
+                nomes.append(futuro.result())
+            entregues = indice + 1
+            yield indice, mesclar_resultados(nomes)
+    finally:
+        for futuro in (f for grupo in futuros for f in grupo):
+            futuro.cancel()
+        executor.shutdown(wait=True)
+        #resultados de grupos que não chegaram a ser entregues
+        remover_arquivos([futuro.result() for grupo in futuros[entregues:] for futuro in grupo
+                          if futuro.done() and not futuro.cancelled() and futuro.exception() is None])
@@ -0,0 +1,141 @@
+#importando os módulos
+from qgis.core import (QgsProcessing, QgsProcessingAlgorithm, QgsProcessingParameterFeatureSource,
+                       QgsProcessingParameterFile, QgsProcessingParameterFeatureSink, QgsProcessingException,
+                       QgsFeatureSink, QgsFeature, QgsGeometry)
+
+from .assinatura import normalizar_valor
+from .delta import LeitorDelta, ADICIONADA, REMOVIDA, INALTERADA
+
+#aplica o delta gerado pelo IdentificarMudancas sobre a camada do dia 1, reconstruindo o dia 2
+class AplicarDelta(QgsProcessingAlgorithm):
+    INPUT_LAYER = 'INPUT_LAYER'
+    DELTA = 'DELTA'
+    OUTPUT_LAYER = 'OUTPUT_LAYER'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT_LAYER,
+                'Camada do dia 1',
+                [QgsProcessing.TypeVectorAnyGeometry]
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.DELTA,
+                'Delta do dia 1 para o dia 2',
+                behavior=QgsProcessingParameterFile.File,
+                extension='delta'
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_LAYER,
+                'Camada do dia 2'
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        camada = self.parameterAsSource(parameters, self.INPUT_LAYER, context)
+        caminho = self.parameterAsFile(parameters, self.DELTA, context)
+        try:
+            leitor = LeitorDelta(caminho)
+        except ValueError as erro:
+            raise QgsProcessingException(str(erro))
+        try:
+            #o delta só tem as mudanças, então cabe em memória; a camada é lida em fluxo
+            operacoes = {}
+            for operacao, chave, dados, wkb in leitor.operacoes():
+                operacoes.setdefault(chave, []).append((operacao, dados, wkb))
+        finally:
+            leitor.fechar()
+
+        campos = camada.fields()
+        if campos.indexOf(leitor.chave_primaria) == -1:
+            raise QgsProcessingException(f'A camada do dia 1 não tem a chave primária {leitor.chave_primaria} do delta.')
+        ausentes = [nome for nome in leitor.campos if campos.indexOf(nome) == -1]
+        if ausentes:
+            feedback.pushInfo(f'Campos do delta que não existem na camada e serão ignorados: {", ".join(ausentes)}')
+
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT_LAYER,
+            context,
+            campos,
+            camada.wkbType(),
+            camada.sourceCrs()
+        )
+
+        aplicadas = 0
+        total = camada.featureCount() or 1
+        for atual, feature in enumerate(camada.getFeatures()):
+            if feedback.isCanceled():
+                return {self.OUTPUT_LAYER: dest_id}
+            chave = normalizar_valor(feature.attribute(leitor.chave_primaria))
+            pendentes = operacoes.get(chave)
+            if pendentes:
+                operacao, dados, wkb = pendentes.pop(0)
+                if not pendentes:
+                    del operacoes[chave]
+                aplicadas += 1
+                if operacao == REMOVIDA:
+                    continue
+                if operacao == ADICIONADA:
+                    feature = self.nova_feicao(campos, leitor.campos, dados, wkb)
+                else:
+                    for nome, valor in dados:
+                        indice = campos.indexOf(nome)
+                        if indice != -1:
+                            feature.setAttribute(indice, valor)
+                    if wkb is not INALTERADA:
+                        feature.setGeometry(geometria_do_wkb(wkb))
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            feedback.setProgress(int(100 * atual / total))
+
+        #as adições são das chaves que não existiam no dia 1
+        for chave, pendentes in operacoes.items():
+            for operacao, dados, wkb in pendentes:
+                if operacao == ADICIONADA:
+                    sink.addFeature(self.nova_feicao(campos, leitor.campos, dados, wkb), QgsFeatureSink.FastInsert)
+                    aplicadas += 1
+                else:
+                    feedback.reportError(f'A chave {chave} não existe na camada do dia 1; operação ignorada.')
+        feedback.pushInfo(f'{aplicadas} operações aplicadas.')
+
+        return {self.OUTPUT_LAYER: dest_id}
+
+    def nova_feicao(self, campos, campos_delta, valores, wkb):
+        feature = QgsFeature(campos)
+        for nome, valor in zip(campos_delta, valores):
+            indice = campos.indexOf(nome)
+            if indice != -1:
+                feature.setAttribute(indice, valor)
+        feature.setGeometry(geometria_do_wkb(wkb))
+        return feature
+
+    def name(self):
+        return 'aplicar_delta'
+
+    def displayName(self):
+        return 'Aplicar Delta de Mudanças'
+
+    def group(self):
+        return 'Projeto 3'
+
+    def groupId(self):
+        return 'Projeto3'
+
+    def shortHelpString(self):
+        return ('Reconstrói a camada do dia 2 a partir da camada do dia 1 e do delta binário gerado pelo '
+                'Identificar Mudanças, lendo a camada do dia 1 uma única vez.')
+
+    def createInstance(self):
+        return AplicarDelta()
+
+def geometria_do_wkb(wkb):
+    geometria = QgsGeometry()
+    if wkb:
+        geometria.fromWkb(wkb)
+    return geometria
@@ -1,9 +1,31 @@
 #importando os módulos
-from qgis.PyQt.QtCore import QVariant
-from qgis.PyQt.QtWidgets import QDialog, QVBoxLayout, QCheckBox, QDialogButtonBox
-from qgis.core import (QgsProcessingAlgorithm, QgsProcessingParameterFeatureSource, 
+import os
+
+from qgis.PyQt.QtCore import QVariant, QDate, QDateTime, Qt
+from qgis.core import (QgsProcessing, QgsProcessingAlgorithm, QgsProcessingParameterFeatureSource, 
                        QgsProcessingParameterField, QgsProcessingParameterNumber, QgsProcessingParameterFeatureSink,
-                       QgsFeatureSink, QgsFeature, QgsGeometry, QgsVectorLayer, QgsField, QgsProject)
+                       QgsProcessingParameterBoolean, QgsProcessingParameterFile, QgsProcessingParameterFileDestination,
+                       QgsFeatureSink, QgsFeature, QgsGeometry, QgsVectorLayer, QgsField, QgsFields, QgsProject,
+                       QgsFeatureRequest, QgsProcessingUtils, QgsProcessingException, QgsRectangle, QgsExpression)
+import numpy as np
+
+from .assinatura import assinatura_exata, assinatura_feicao, codificar_valor, normalizar_valor, wkb_normalizado
+from .comparacao import geometria_mudou
+from .corredor import Corredor
+from .ordenacao_externa import OrdenadorExterno, BYTES_POR_REGISTRO, chave_ordenacao, mesclar_ordenados
+from .particionamento import Particionador, PARTICOES_POR_PROCESSO, comparar_particoes
+from .manifesto import Manifesto, resumir_feicao, assinatura_registro, hash_campo, hashes_campos
+from .colunas import atributos_modificados
+from .pareamento import parear
+from .delta import EscritorDelta, INALTERADA
+from .trajetoria import RAIO_TERRA, VELOCIDADE_MAXIMA_PADRAO, INTERVALO_MAXIMO_PADRAO, limpar, dividir_viagens
+
+#memória (MB) usada por padrão para ordenar as chaves das duas camadas
+LIMITE_MEMORIA_PADRAO = 512
+#quantidade de mudanças cujas feições são buscadas de uma vez no provedor
+TAMANHO_LOTE = 1000
+#campo com o horário de cada ponto do tracker, que define a ordem da trajetória
+CAMPO_TEMPO_TRACKER = 'creation_time'
 
 #definindo classe e inputs
 class IdentificarMudancas(QgsProcessingAlgorithm):
@@ -12,7 +34,15 @@ class IdentificarMudancas(QgsProcessingAlgorithm):
     PONTOS_TRACKER = 'PONTOS_TRACKER'
     CHAVE_PRIMARIA = 'CHAVE_PRIMARIA'
     TOLERANCIA = 'TOLERANCIA'
+    RESTRINGIR_CORREDOR = 'RESTRINGIR_CORREDOR'
+    PAREAMENTO_ESPACIAL = 'PAREAMENTO_ESPACIAL'
     ATRIBUTOS_IGNORADOS = 'ATRIBUTOS_IGNORADOS'
+    LIMITE_MEMORIA = 'LIMITE_MEMORIA'
+    PROCESSOS = 'PROCESSOS'
+    MANIFESTO_DIA_1 = 'MANIFESTO_DIA_1'
+    MANIFESTO_DIA_2 = 'MANIFESTO_DIA_2'
+    DELTA = 'DELTA'
+    PRECISAO_DELTA = 'PRECISAO_DELTA'
     OUTPUT_LAYER = 'OUTPUT_LAYER'
 
     #usando initAlgorithm para iniciailizar todos os parâmtros  
@@ -21,7 +51,18 @@ class IdentificarMudancas(QgsProcessingAlgorithm):
             QgsProcessingParameterFeatureSource(
                 self.INPUT_LAYER_1,
                 'Camada do dia 1',
-                [QgsProcessing.TypeVectorAnyGeometry]
+                [QgsProcessing.TypeVectorAnyGeometry],
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.MANIFESTO_DIA_1,
+                'Manifesto do dia 1 (substitui a camada do dia 1)',
+                behavior=QgsProcessingParameterFile.File,
+                extension='sqlite',
+                optional=True
             )
         )
 
@@ -37,7 +78,8 @@ class IdentificarMudancas(QgsProcessingAlgorithm):
             QgsProcessingParameterFeatureSource(
                 self.PONTOS_TRACKER,
                 'Camada de pontos (tracker)',
-                [QgsProcessing.TypeVectorPoint]
+                [QgsProcessing.TypeVectorPoint],
+                optional=True
             )
         )
 
@@ -45,8 +87,28 @@ class IdentificarMudancas(QgsProcessingAlgorithm):
             QgsProcessingParameterField(
                 self.CHAVE_PRIMARIA,
                 'Atributo correspondente à chave primária',
-                parentLayerParameterName=self.INPUT_LAYER_1,
-                type=QgsProcessingParameterField.Any
+                parentLayerParameterName=self.INPUT_LAYER_2,
+                type=QgsProcessingParameterField.Any,
+                optional=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.PAREAMENTO_ESPACIAL,
+                'Parear as feições pela geometria (sem chave primária)',
+                defaultValue=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.ATRIBUTOS_IGNORADOS,
+                'Atributos a ignorar na comparação',
+                parentLayerParameterName=self.INPUT_LAYER_2,
+                type=QgsProcessingParameterField.Any,
+                allowMultiple=True,
+                optional=True
             )
         )
 
@@ -59,12 +121,70 @@ class IdentificarMudancas(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.RESTRINGIR_CORREDOR,
+                'Comparar apenas as feições no corredor percorrido pelo tracker',
+                defaultValue=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.LIMITE_MEMORIA,
+                'Limite de memória para a comparação (MB)',
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=LIMITE_MEMORIA_PADRAO,
+                minValue=16
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.PROCESSOS,
+                'Processos para a comparação (1 = sem paralelismo)',
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=1,
+                minValue=1
+            )
+        )
+
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT_LAYER,
                 'Camada de mudanças'
             )
         )
+
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.MANIFESTO_DIA_2,
+                'Manifesto do dia 2 (para a comparação do dia seguinte)',
+                fileFilter='SQLite (*.sqlite)',
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.DELTA,
+                'Delta binário do dia 1 para o dia 2 (para sincronização)',
+                fileFilter='Delta (*.delta)',
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.PRECISAO_DELTA,
+                'Precisão das coordenadas no delta (metros)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.001,
+                minValue=0.000000001
+            )
+        )
     #início do processing principal
     def processAlgorithm(self, parameters, context, feedback):
         #camadas e parâmetros fornecidos pelo usuário
@@ -73,85 +193,442 @@ class IdentificarMudancas(QgsProcessingAlgorithm):
         camada_pontos = self.parameterAsSource(parameters, self.PONTOS_TRACKER, context)
         chave_primaria = self.parameterAsString(parameters, self.CHAVE_PRIMARIA, context)
         tolerancia = self.parameterAsDouble(parameters, self.TOLERANCIA, context)
+        limite_memoria = self.parameterAsInt(parameters, self.LIMITE_MEMORIA, context)
+        restringir_corredor = self.parameterAsBoolean(parameters, self.RESTRINGIR_CORREDOR, context)
+        pareamento_espacial = self.parameterAsBoolean(parameters, self.PAREAMENTO_ESPACIAL, context)
+        processos = self.parameterAsInt(parameters, self.PROCESSOS, context)
+        caminho_manifesto_dia_1 = self.parameterAsFile(parameters, self.MANIFESTO_DIA_1, context)
+        caminho_manifesto_dia_2 = self.parameterAsFileOutput(parameters, self.MANIFESTO_DIA_2, context)
+        caminho_delta = self.parameterAsFileOutput(parameters, self.DELTA, context)
+        precisao_delta = self.parameterAsDouble(parameters, self.PRECISAO_DELTA, context)
+
+        #sem chave primária, as feições só podem ser pareadas pela geometria
+        if pareamento_espacial:
+            if caminho_manifesto_dia_1 or caminho_manifesto_dia_2:
+                raise QgsProcessingException('Os manifestos dependem da chave primária e não podem ser usados no pareamento espacial.')
+            if caminho_delta:
+                raise QgsProcessingException('O delta é aplicado pela chave primária e não pode ser gerado no pareamento espacial.')
+        elif not chave_primaria:
+            raise QgsProcessingException('Informe a chave primária ou use o pareamento espacial.')
+
+        #o dia 1 vem da camada ou do manifesto gravado na execução anterior
+        manifesto_dia_1 = None
+        if caminho_manifesto_dia_1:
+            try:
+                manifesto_dia_1 = Manifesto.abrir(caminho_manifesto_dia_1)
+            except ValueError as erro:
+                raise QgsProcessingException(str(erro))
+            if manifesto_dia_1.chave_primaria != chave_primaria:
+                raise QgsProcessingException(f'O manifesto do dia 1 usa a chave primária {manifesto_dia_1.chave_primaria}.')
+            if restringir_corredor:
+                raise QgsProcessingException('O modo corredor precisa da camada do dia 1, não do manifesto.')
+        elif camada_dia_1 is None:
+            raise QgsProcessingException('Informe a camada ou o manifesto do dia 1.')
+
+        #o delta reconstrói o dia 2 inteiro e não pode deixar de fora o que está fora do corredor
+        if caminho_delta and restringir_corredor:
+            raise QgsProcessingException('O delta não pode ser gerado no modo corredor, que lê só parte das camadas.')
+
+        #o manifesto do dia 2 precisa da camada inteira
+        manifesto_dia_2 = None
+        if caminho_manifesto_dia_2:
+            if restringir_corredor:
+                raise QgsProcessingException('O manifesto do dia 2 não pode ser gravado no modo corredor, que lê só parte da camada.')
+            manifesto_dia_2 = Manifesto.criar(caminho_manifesto_dia_2, camada_dia_2.fields().names(), chave_primaria,
+                                              camada_dia_2.sourceCrs().toWkt())
 
-        #lista com os atributos a serem ignorados
-        atributos_ignorados = self.get_ignored_attributes(camada_dia_1)
+        #a tolerância e a precisão do delta são informadas em metros; em SRC geográfico as coordenadas
+        #estão em graus e elas viram graus de latitude, como na simplificação da trajetória
+        if camada_dia_2.sourceCrs().isGeographic():
+            tolerancia = float(np.degrees(tolerancia / RAIO_TERRA))
+            precisao_delta = float(np.degrees(precisao_delta / RAIO_TERRA))
+            feedback.pushInfo(f'SRC geográfico: tolerância convertida para {tolerancia:.8f} graus.')
+            if caminho_delta:
+                feedback.pushInfo(f'SRC geográfico: precisão do delta convertida para {precisao_delta:.3e} graus.')
+
+        #lista com os atributos a serem ignorados, informada como parâmetro para rodar também em lote e no qgis_process
+        atributos_ignorados = self.parameterAsFields(parameters, self.ATRIBUTOS_IGNORADOS, context)
 
         #lista com os atributos que devem ser comparados
-        atributos_comparar = [field.name() for field in camada_dia_1.fields() if field.name() not in atributos_ignorados]
+        atributos_comparar = [field.name() for field in camada_dia_2.fields() if field.name() not in atributos_ignorados]
 
       #criamos a camada de saída 
         (sink, dest_id) = self.parameterAsSink(
             parameters,
             self.OUTPUT_LAYER,
             context,
-            camada_dia_1.fields(),
-            camada_dia_1.wkbType(),
-            camada_dia_1.sourceCrs()
+            campos_mudancas(),
+            camada_dia_2.wkbType(),
+            camada_dia_2.sourceCrs()
         )
 
-        #identificamos mudanças entre as camadas
-        self.identificar_mudancas(camada_dia_1, camada_dia_2, sink, atributos_comparar, chave_primaria, tolerancia, context, feedback)
+        #no modo corredor só entram as feições próximas da trajetória do tracker
+        fids_dia_1 = fids_dia_2 = None
+        if restringir_corredor:
+            if camada_pontos is None:
+                raise QgsProcessingException('O modo corredor precisa da camada de pontos (tracker).')
+            corredor = self.montar_corredor(camada_pontos, camada_dia_1.sourceCrs(), tolerancia, context, feedback)
+            if pareamento_espacial:
+                fids_dia_1 = self.feicoes_no_corredor(camada_dia_1, corredor, feedback)
+                fids_dia_2 = self.feicoes_no_corredor(camada_dia_2, corredor, feedback)
+            else:
+                fids_dia_1, fids_dia_2 = self.feicoes_do_corredor(corredor, camada_dia_1, camada_dia_2, chave_primaria, feedback)
 
-        return {self.OUTPUT_LAYER: dest_id}
+        #o delta precisa dos valores do dia 2, que os processos auxiliares não devolvem
+        delta = None
+        if caminho_delta:
+            delta = EscritorDelta(caminho_delta, camada_dia_2.fields().names(), chave_primaria, precisao_delta)
+            if processos > 1 and manifesto_dia_1 is None:
+                feedback.pushInfo('O delta é gerado na comparação sem paralelismo.')
+                processos = 1
 
-    #método para obter os atributos a serem ignorados, de forma que formem uma lista para o usuário selecionar
-    def get_ignored_attributes(self, layer):
-        dialog = AtributosDialog([field.name() for field in layer.fields()])
-        if dialog.exec_() == QDialog.Accepted:
-            return dialog.get_selected_atributos()
-        else:
-            return []
+        #identificamos mudanças entre as camadas; delta e manifesto incompletos são apagados
+        concluido = False
+        try:
+            if pareamento_espacial:
+                self.identificar_mudancas_espacial(camada_dia_1, camada_dia_2, sink, atributos_comparar, tolerancia, feedback, fids_dia_1, fids_dia_2)
+            elif manifesto_dia_1 is not None:
+                self.identificar_mudancas_manifesto(manifesto_dia_1, camada_dia_2, sink, atributos_comparar, chave_primaria, tolerancia, feedback, limite_memoria,
+                                                    manifesto_dia_2, delta)
+            elif processos > 1:
+                self.identificar_mudancas_paralelo(camada_dia_1, camada_dia_2, sink, atributos_comparar, chave_primaria, tolerancia, feedback, processos,
+                                                   fids_dia_1, fids_dia_2, manifesto_dia_2)
+            else:
+                self.identificar_mudancas(camada_dia_1, camada_dia_2, sink, atributos_comparar, chave_primaria, tolerancia, context, feedback, limite_memoria,
+                                          fids_dia_1, fids_dia_2, manifesto_dia_2, delta)
+            concluido = not feedback.isCanceled()
+        finally:
+            if delta is not None:
+                delta.fechar()
+                if not concluido and os.path.exists(caminho_delta):
+                    os.remove(caminho_delta)
+            if manifesto_dia_1 is not None:
+                manifesto_dia_1.fechar()
+          #só o manifesto completo é finalizado: um truncado pareceria válido na comparação seguinte
+            if manifesto_dia_2 is not None:
+                if concluido:
+                    manifesto_dia_2.finalizar()
+                manifesto_dia_2.fechar()
+                if not concluido and os.path.exists(caminho_manifesto_dia_2):
+                    os.remove(caminho_manifesto_dia_2)
+
+        resultado = {self.OUTPUT_LAYER: dest_id}
+        if not concluido:
+            return resultado
+        if manifesto_dia_2 is not None:
+            resultado[self.MANIFESTO_DIA_2] = caminho_manifesto_dia_2
+        if delta is not None:
+            feedback.pushInfo(f'{delta.quantidade} operações gravadas no delta.')
+            resultado[self.DELTA] = caminho_delta
+        return resultado
 
      #definindo a função que vai identificar as mudanças e classificar 
-    def identificar_mudancas(self, camada_dia_1, camada_dia_2, sink, atributos_comparar, chave_primaria, tolerancia, context, feedback):
-      #usamos a função wkbtype para conseguirmos colocar qualquer geometria na camada de entrada 
-        geom_type = camada_dia_1.wkbType()
-      #cria um dicionário com os IDs e as feições da camada do dia 2 para acesso rápido
-        ids_dia_2 = {feature.attribute(chave_primaria): feature for feature in camada_dia_2.getFeatures()}
-
-       #itera sobre as camadas do dia 1, obtem id e geometria do dia 1 e busca correspondente no dia 2
-        for feature_dia_1 in camada_dia_1.getFeatures():
+    def identificar_mudancas(self, camada_dia_1, camada_dia_2, sink, atributos_comparar, chave_primaria, tolerancia, context, feedback, limite_memoria=LIMITE_MEMORIA_PADRAO,
+                             fids_dia_1=None, fids_dia_2=None, manifesto_dia_2=None, delta=None):
+      #cada camada é lida uma única vez e dela só ficam chave, id e assinatura de cada feição;
+      #metade do limite de memória vai para cada camada e o que passar disso é ordenado em disco
+        limite_registros = limite_memoria * 1024 * 1024 // (2 * BYTES_POR_REGISTRO)
+        exata = delta is not None
+        ordenado_dia_1 = self.ordenar_por_chave(camada_dia_1, chave_primaria, atributos_comparar, limite_registros, feedback, fids_dia_1, exata=exata)
+        ordenado_dia_2 = self.ordenar_por_chave(camada_dia_2, chave_primaria, atributos_comparar, limite_registros, feedback, fids_dia_2, manifesto_dia_2, exata)
+        if feedback.isCanceled():
+            ordenado_dia_1.limpar()
+            ordenado_dia_2.limpar()
+            return
+        em_disco = ordenado_dia_1.sequencias_em_disco + ordenado_dia_2.sequencias_em_disco
+        if em_disco:
+            feedback.pushInfo(f'{em_disco} sequências ordenadas foram gravadas em disco para respeitar o limite de memória.')
+
+      #uma única passada intercalando as duas camadas pela chave; as feições completas só são
+      #buscadas, em lotes, para as chaves que precisam aparecer na camada de mudanças
+        lote = []
+        for tipo, registro_1, registro_2 in mesclar_ordenados(ordenado_dia_1.registros(), ordenado_dia_2.registros()):
             if feedback.isCanceled():
                 break
-            id_dia_1 = feature_dia_1.attribute(chave_primaria)
-            geom_dia_1 = feature_dia_1.geometry()
-            
-            feature_proxima = ids_dia_2.get(id_dia_1, None)
-
-            if feature_proxima:
-              #compara mudanças, olha se a geometria mudou
-                mudancas = comparar_atributos(feature_dia_1, feature_proxima, atributos_comparar)
-                if not geom_dia_1.equals(feature_proxima.geometry()):
-                    mudancas.append("geometria")
-                if mudancas:
-                    tipo_mudanca = "Modificada"
-                    nova_feature = QgsFeature()
-                    nova_feature.setGeometry(geom_dia_1)
-                    nova_feature.setAttributes([id_dia_1, tipo_mudanca, ", ".join(mudancas)])
-                    sink.addFeature(nova_feature, QgsFeatureSink.FastInsert)
+          #assinaturas iguais: geometria e atributos comparados são idênticos, nada a comparar
+            if tipo == 'Comum' and registro_1[2] == registro_2[2]:
+                continue
+            lote.append((tipo, registro_1, registro_2))
+            if len(lote) >= TAMANHO_LOTE:
+                self.emitir_lote(lote, camada_dia_1, camada_dia_2, sink, atributos_comparar, tolerancia, delta)
+                lote = []
+        if lote and not feedback.isCanceled():
+            self.emitir_lote(lote, camada_dia_1, camada_dia_2, sink, atributos_comparar, tolerancia, delta)
+        ordenado_dia_1.limpar()
+        ordenado_dia_2.limpar()
+
+    #lê a camada guardando (chave de ordenação, id da feição, assinatura, chave) de cada feição;
+    #com fids, só as feições desses ids são lidas; com manifesto, cada feição lida também é gravada nele;
+    #exata troca a assinatura pela de todos os atributos e do WKB original, para o delta
+    def ordenar_por_chave(self, camada, chave_primaria, atributos_comparar, limite_registros, feedback, fids=None, manifesto=None, exata=False):
+        ordenador = OrdenadorExterno(limite_registros, QgsProcessingUtils.tempFolder())
+        request = QgsFeatureRequest()
+        if fids is not None:
+            if not fids:
+                return ordenador
+            request.setFilterFids(list(fids))
+        for feature in camada.getFeatures(request):
+            if feedback.isCanceled():
+                break
+            chave = normalizar_valor(feature.attribute(chave_primaria))
+            assinatura = assinatura_exata(feature) if exata else assinatura_feicao(feature, atributos_comparar)
+            ordenador.adicionar((chave_ordenacao(chave), feature.id(), assinatura, chave))
+            if manifesto is not None:
+                manifesto.adicionar(chave, feature.id(), *resumir_feicao(feature))
+        return ordenador
+
+    #mesma comparação, com as camadas particionadas pela chave e cada partição comparada em um processo
+    def identificar_mudancas_paralelo(self, camada_dia_1, camada_dia_2, sink, atributos_comparar, chave_primaria, tolerancia, feedback, processos,
+                                      fids_dia_1=None, fids_dia_2=None, manifesto_dia_2=None):
+        particoes = processos * PARTICOES_POR_PROCESSO
+        diretorio = QgsProcessingUtils.tempFolder()
+        particionado_dia_1 = particionar_camada(camada_dia_1, chave_primaria, atributos_comparar, particoes, diretorio, feedback, fids_dia_1)
+        particionado_dia_2 = particionar_camada(camada_dia_2, chave_primaria, atributos_comparar, particoes, diretorio, feedback, fids_dia_2, manifesto_dia_2)
+        try:
+            if feedback.isCanceled():
+                return
+            pares = list(zip(particionado_dia_1.fechar(), particionado_dia_2.fechar()))
+            feedback.pushInfo(f'Comparando {particoes} partições em {processos} processos.')
+            for _, _, tipo, chave, wkb, mudancas in comparar_particoes(pares, atributos_comparar, tolerancia, processos, feedback.isCanceled):
+                geometria = QgsGeometry()
+                if wkb:
+                    geometria.fromWkb(wkb)
+                self.adicionar_mudanca(sink, geometria, chave, tipo, mudancas)
+        finally:
+            particionado_dia_1.limpar()
+            particionado_dia_2.limpar()
+
+    #compara o manifesto do dia 1 com a camada do dia 2, que é a única lida nesta execução
+    def identificar_mudancas_manifesto(self, manifesto_dia_1, camada_dia_2, sink, atributos_comparar, chave_primaria, tolerancia, feedback, limite_memoria,
+                                       manifesto_dia_2=None, delta=None):
+        campos_dia_2 = camada_dia_2.fields().names()
+        ausentes = [nome for nome in atributos_comparar if nome not in manifesto_dia_1.campos]
+        if ausentes:
+            feedback.pushInfo(f'Atributos que não existem no manifesto do dia 1 e não serão comparados: {", ".join(ausentes)}')
+      #posição de cada atributo comparado nos hashes de cada dia
+        posicoes = [(nome, manifesto_dia_1.campos.index(nome), campos_dia_2.index(nome))
+                    for nome in atributos_comparar if nome not in ausentes]
+      #para o delta entram todos os campos do dia 2; o que não existe no manifesto sempre conta como alterado
+        posicoes_delta = [(nome, manifesto_dia_1.campos.index(nome) if nome in manifesto_dia_1.campos else -1, posicao)
+                          for posicao, nome in enumerate(campos_dia_2)]
+        mesmos_campos = manifesto_dia_1.campos == campos_dia_2
+
+        ordenador = OrdenadorExterno(limite_memoria * 1024 * 1024 // (2 * BYTES_POR_REGISTRO), QgsProcessingUtils.tempFolder())
+        for feature in camada_dia_2.getFeatures():
+            if feedback.isCanceled():
+                ordenador.limpar()
+                return
+            chave = normalizar_valor(feature.attribute(chave_primaria))
+            wkb, hash_geom, hashes, caixa = resumir_feicao(feature)
+            ordenador.adicionar((chave_ordenacao(chave), feature.id(), assinatura_registro(hash_geom, hashes), chave, hash_geom, hashes))
+            if manifesto_dia_2 is not None:
+                manifesto_dia_2.adicionar(chave, feature.id(), wkb, hash_geom, hashes, caixa)
+
+        lote = []
+        for tipo, registro_1, registro_2 in mesclar_ordenados(manifesto_dia_1.registros(), ordenador.registros()):
+            if feedback.isCanceled():
+                break
+            if tipo == 'Comum':
+              #assinaturas iguais só garantem feições iguais quando os dois dias têm os mesmos campos
+                if mesmos_campos and registro_1[2] == registro_2[2]:
+                    continue
+                mudancas = [nome for nome, posicao_1, posicao_2 in posicoes
+                            if hash_campo(registro_1[5], posicao_1) != hash_campo(registro_2[5], posicao_2)]
+                alterados = []
+                if delta is not None:
+                    alterados = [nome for nome, posicao_1, posicao_2 in posicoes_delta
+                                 if posicao_1 == -1 or hash_campo(registro_1[5], posicao_1) != hash_campo(registro_2[5], posicao_2)]
+                if not mudancas and not alterados and registro_1[4] == registro_2[4]:
+                    continue
+                lote.append((tipo, registro_1, registro_2, mudancas, alterados))
             else:
-                tipo_mudanca = "Removida"
-                nova_feature = QgsFeature()
-                nova_feature.setGeometry(geom_dia_1)
-                nova_feature.setAttributes([id_dia_1, tipo_mudanca, ""])
-                sink.addFeature(nova_feature, QgsFeatureSink.FastInsert)
-              
-        #segue os mesmos passos comparando o dia 1 com o dia 2
-        ids_dia_1 = {feature.attribute(chave_primaria) for feature in camada_dia_1.getFeatures()}
+                lote.append((tipo, registro_1, registro_2, [], []))
+            if len(lote) >= TAMANHO_LOTE:
+                self.emitir_lote_manifesto(lote, manifesto_dia_1, camada_dia_2, sink, tolerancia, delta)
+                lote = []
+        if lote and not feedback.isCanceled():
+            self.emitir_lote_manifesto(lote, manifesto_dia_1, camada_dia_2, sink, tolerancia, delta)
+        ordenador.limpar()
+
+    #geometrias do dia 1 vêm do manifesto e as do dia 2 da camada, só para as chaves do lote que precisam delas
+    def emitir_lote_manifesto(self, lote, manifesto_dia_1, camada_dia_2, sink, tolerancia, delta=None):
+        geometrias_dia_1 = manifesto_dia_1.geometrias([registro_1[1] for _, registro_1, _, _, _ in lote if registro_1 is not None])
+      #com delta, os novos valores dos atributos também vêm da camada do dia 2
+        features_dia_2 = buscar_feicoes(camada_dia_2, [registro_2[1] for tipo, registro_1, registro_2, _, _ in lote
+                                                       if tipo == 'Adicionada' or (tipo == 'Comum' and (delta is not None or registro_1[4] != registro_2[4]))])
+        for tipo, registro_1, registro_2, mudancas, alterados in lote:
+            if tipo == 'Adicionada':
+                self.adicionar_mudanca(sink, features_dia_2[registro_2[1]].geometry(), registro_2[3], "Adicionada", [])
+                registrar_no_delta(delta, tipo, registro_2[3], features_dia_2[registro_2[1]])
+                continue
+            wkb_dia_1 = geometrias_dia_1[registro_1[1]]
+            geometria = QgsGeometry()
+            if wkb_dia_1:
+                geometria.fromWkb(wkb_dia_1)
+            if tipo == 'Removida':
+                self.adicionar_mudanca(sink, geometria, registro_1[3], "Removida", [])
+                registrar_no_delta(delta, tipo, registro_1[3], None)
+                continue
+          #o hash é do WKB original; a tolerância compara as geometrias normalizadas
+            geometria_alterada = registro_1[4] != registro_2[4]
+            if geometria_alterada:
+                wkb_dia_2 = wkb_normalizado(features_dia_2[registro_2[1]].geometry())
+                if geometria_mudou(wkb_normalizado(geometria), wkb_dia_2, tolerancia):
+                    mudancas = mudancas + ["geometria"]
+            if mudancas:
+                self.adicionar_mudanca(sink, geometria, registro_1[3], "Modificada", mudancas)
+            if alterados or geometria_alterada:
+                registrar_no_delta(delta, "Modificada", registro_1[3], features_dia_2.get(registro_2[1]), alterados, geometria_alterada)
 
-        for feature_dia_2 in camada_dia_2.getFeatures():
+    #sem chave: as feições dos dois dias são pareadas pela geometria e pelos atributos, e cada
+    #par é comparado como se tivesse a mesma chave; o id de saída passa a ser o id da feição
+    def identificar_mudancas_espacial(self, camada_dia_1, camada_dia_2, sink, atributos_comparar, tolerancia, feedback, fids_dia_1=None, fids_dia_2=None):
+        resumo_dia_1 = resumo_espacial(camada_dia_1, atributos_comparar, feedback, fids_dia_1)
+        resumo_dia_2 = resumo_espacial(camada_dia_2, atributos_comparar, feedback, fids_dia_2)
+        if feedback.isCanceled():
+            return
+        fids_1, caixas_1, wkbs_1, assinaturas_1, hashes_1, sem_geometria_1 = resumo_dia_1
+        fids_2, caixas_2, wkbs_2, assinaturas_2, hashes_2, sem_geometria_2 = resumo_dia_2
+        pares_1, pares_2 = parear(caixas_1, caixas_2, wkbs_1, wkbs_2, hashes_1, hashes_2, tolerancia)
+        feedback.pushInfo(f'{len(pares_1)} pares de feições encontrados pela geometria.')
+
+      #registros no formato de emitir_lote, com o próprio id da feição no lugar da chave
+        def registro(fid, assinatura=None):
+            return (None, fid, assinatura, fid)
+
+        lote = []
+        for u, v in zip(pares_1.tolist(), pares_2.tolist()):
+            if assinaturas_1[u] != assinaturas_2[v]:
+                lote.append(('Comum', registro(int(fids_1[u])), registro(int(fids_2[v]))))
+        pareados_1 = np.zeros(len(fids_1), dtype=bool)
+        pareados_1[pares_1] = True
+        pareados_2 = np.zeros(len(fids_2), dtype=bool)
+        pareados_2[pares_2] = True
+        lote.extend(('Removida', registro(fid), None) for fid in fids_1[~pareados_1].tolist() + sem_geometria_1)
+        lote.extend(('Adicionada', None, registro(fid)) for fid in fids_2[~pareados_2].tolist() + sem_geometria_2)
+
+        for inicio in range(0, len(lote), TAMANHO_LOTE):
             if feedback.isCanceled():
                 break
-            id_dia_2 = feature_dia_2.attribute(chave_primaria)
-            geom_dia_2 = feature_dia_2.geometry()
+            self.emitir_lote(lote[inicio:inicio + TAMANHO_LOTE], camada_dia_1, camada_dia_2, sink, atributos_comparar, tolerancia)
 
-            if id_dia_2 not in ids_dia_1:
-                tipo_mudanca = "Adicionada"
-                nova_feature = QgsFeature()
-                nova_feature.setGeometry(geom_dia_2)
-                nova_feature.setAttributes([id_dia_2, tipo_mudanca, ""])
-                sink.addFeature(nova_feature, QgsFeatureSink.FastInsert)
+    #trajetória do tracker no SRC das camadas, com os pontos ordenados pelo horário, sem os
+    #espúrios e dividida em viagens, como na TrajetoriaTracker; viagens distintas não se ligam
+    def montar_corredor(self, camada_pontos, crs, tolerancia, context, feedback):
+        request = QgsFeatureRequest().setDestinationCrs(crs, context.transformContext())
+        indice_tempo = camada_pontos.fields().indexOf(CAMPO_TEMPO_TRACKER)
+        if indice_tempo == -1:
+            feedback.reportError(f'O campo {CAMPO_TEMPO_TRACKER} não existe na camada de pontos; a trajetória seguirá a ordem das feições, '
+                                 'sem limpeza nem divisão em viagens.')
+            request.setNoAttributes()
+        else:
+            request.setSubsetOfAttributes([indice_tempo])
+        xs, ys, tempos = [], [], []
+        sem_horario = 0
+        for feature in camada_pontos.getFeatures(request):
+            if feedback.isCanceled():
+                break
+            geom = feature.geometry()
+            if geom.isEmpty():
+                continue
+            tempo = segundos(feature.attribute(indice_tempo)) if indice_tempo != -1 else 0.0
+            if tempo is None:
+                sem_horario += 1
+                continue
+            for vertice in geom.vertices():
+                xs.append(vertice.x())
+                ys.append(vertice.y())
+                tempos.append(tempo)
+        if sem_horario:
+            feedback.reportError(f'{sem_horario} pontos do tracker sem horário válido ficaram fora do corredor.')
+        if not xs:
+            raise QgsProcessingException('A camada de pontos (tracker) não tem pontos para montar o corredor.')
+        x, y, tempo = np.array(xs, dtype=float), np.array(ys, dtype=float), np.array(tempos, dtype=float)
+        if indice_tempo == -1:
+            viagens = [(0, len(x))]
+        else:
+            ordem = np.argsort(tempo, kind='stable')
+            x, y, tempo = x[ordem], y[ordem], tempo[ordem]
+            mantidos = limpar(x, y, tempo, VELOCIDADE_MAXIMA_PADRAO, crs.isGeographic())
+            x, y, tempo = x[mantidos], y[mantidos], tempo[mantidos]
+            viagens = dividir_viagens(tempo, INTERVALO_MAXIMO_PADRAO)
+        feedback.pushInfo(f'Corredor montado com {len(x)} pontos do tracker em {len(viagens)} viagens.')
+        return Corredor([np.column_stack((x[inicio:fim], y[inicio:fim])) for inicio, fim in viagens], tolerancia)
+
+    #ids das feições de cada dia dentro do corredor; uma chave vista em um dos dias também
+    #traz a feição de mesma chave do outro dia, para que não apareça como adicionada ou removida
+    def feicoes_do_corredor(self, corredor, camada_dia_1, camada_dia_2, chave_primaria, feedback):
+        fids_dia_1 = self.feicoes_no_corredor(camada_dia_1, corredor, feedback)
+        fids_dia_2 = self.feicoes_no_corredor(camada_dia_2, corredor, feedback)
+        chaves_dia_1 = chaves_das_feicoes(camada_dia_1, fids_dia_1, chave_primaria)
+        chaves_dia_2 = chaves_das_feicoes(camada_dia_2, fids_dia_2, chave_primaria)
+        fids_dia_1 |= ids_por_chave(camada_dia_1, chave_primaria, chaves_dia_2 - chaves_dia_1)
+        fids_dia_2 |= ids_por_chave(camada_dia_2, chave_primaria, chaves_dia_1 - chaves_dia_2)
+        feedback.pushInfo(f'{len(fids_dia_1)} feições do dia 1 e {len(fids_dia_2)} do dia 2 estão no corredor.')
+        return fids_dia_1, fids_dia_2
+
+    #consulta a camada pelo retângulo de cada trecho da trajetória (usando o índice espacial
+    #do provedor) e confirma os candidatos comparando suas caixas com os segmentos do trecho
+    def feicoes_no_corredor(self, camada, corredor, feedback):
+        fids = set()
+        for caixa, segmentos in corredor.trechos():
+            if feedback.isCanceled():
+                break
+            request = QgsFeatureRequest().setFilterRect(QgsRectangle(*caixa)).setNoAttributes()
+            candidatos, caixas = [], []
+            for feature in camada.getFeatures(request):
+                if feature.id() in fids:
+                    continue
+                bbox = feature.geometry().boundingBox()
+                candidatos.append(feature.id())
+                caixas.append((bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum()))
+            wkbs.append(bytes(geom.asWkb()))
+            if candidatos:
+                toca = corredor.toca(segmentos, caixas)
+                fids.update(fid for fid, dentro in zip(candidatos, toca) if dentro)
+        return fids
+
+    #busca as feições completas do lote pelo id e grava as mudanças na camada de saída
+    def emitir_lote(self, lote, camada_dia_1, camada_dia_2, sink, atributos_comparar, tolerancia, delta=None):
+        features_dia_1 = buscar_feicoes(camada_dia_1, [registro_1[1] for _, registro_1, _ in lote if registro_1 is not None])
+        features_dia_2 = buscar_feicoes(camada_dia_2, [registro_2[1] for _, _, registro_2 in lote if registro_2 is not None])
+
+      #atributos de todos os pares do lote comparados de uma vez, em colunas, com os campos por índice
+        indices_dia_1 = [camada_dia_1.fields().lookupField(nome_campo) for nome_campo in atributos_comparar]
+        indices_dia_2 = [camada_dia_2.fields().lookupField(nome_campo) for nome_campo in atributos_comparar]
+        comuns = [(registro_1, registro_2) for tipo, registro_1, registro_2 in lote if tipo == 'Comum']
+        modificados = iter(atributos_modificados(
+            [valores_atributos(features_dia_1[registro_1[1]], indices_dia_1) for registro_1, _ in comuns],
+            [valores_atributos(features_dia_2[registro_2[1]], indices_dia_2) for _, registro_2 in comuns],
+            atributos_comparar))
+
+        for tipo, registro_1, registro_2 in lote:
+            if tipo == 'Removida':
+                self.adicionar_mudanca(sink, features_dia_1[registro_1[1]].geometry(), registro_1[3], "Removida", [])
+                registrar_no_delta(delta, tipo, registro_1[3], None)
+            elif tipo == 'Adicionada':
+                self.adicionar_mudanca(sink, features_dia_2[registro_2[1]].geometry(), registro_2[3], "Adicionada", [])
+                registrar_no_delta(delta, tipo, registro_2[3], features_dia_2[registro_2[1]])
+            else:
+                feature_dia_1 = features_dia_1[registro_1[1]]
+                feature_proxima = features_dia_2[registro_2[1]]
+              #compara mudanças, olha se a geometria mudou além da tolerância
+                mudancas = next(modificados)
+                if geometria_mudou(wkb_normalizado(feature_dia_1.geometry()), wkb_normalizado(feature_proxima.geometry()), tolerancia):
+                    mudancas.append("geometria")
+                if mudancas:
+                    self.adicionar_mudanca(sink, feature_dia_1.geometry(), registro_1[3], "Modificada", mudancas)
+              #o delta registra qualquer diferença, sem atributos ignorados nem tolerância
+                if delta is not None:
+                    alterados, geometria_alterada = alteracoes_exatas(feature_dia_1, feature_proxima)
+                    if alterados or geometria_alterada:
+                        registrar_no_delta(delta, "Modificada", registro_1[3], feature_proxima, alterados, geometria_alterada)
+
+    def adicionar_mudanca(self, sink, geometria, chave, tipo_mudanca, mudancas):
+        nova_feature = QgsFeature()
+        nova_feature.setGeometry(geometria)
+        nova_feature.setAttributes(["" if chave is None else str(chave), tipo_mudanca, ", ".join(mudancas)])
+        sink.addFeature(nova_feature, QgsFeatureSink.FastInsert)
               
     #apenas define nome e nome a ser exibido
     def name(self):
@@ -169,37 +646,135 @@ class IdentificarMudancas(QgsProcessingAlgorithm):
     def createInstance(self):
         return IdentificarMudancas()
       
-  #nosso código só rodou a caixa de atributos quando usamos essa checkbox, ela está deslocada, mas ainda se refere a caixa inicial
-class AtributosDialog(QDialog):
-    def __init__(self, atributos, parent=None):
-        super(AtributosDialog, self).__init__(parent)
-        self.setWindowTitle('Selecionar Atributos para Ignorar')
-        self.layout = QVBoxLayout(self)
-        self.checkboxes = []
-        
-        for atributo in atributos:
-            checkbox = QCheckBox(atributo)
-            self.layout.addWidget(checkbox)
-            self.checkboxes.append(checkbox)
-        
-        self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
-        self.layout.addWidget(self.buttons)
-        
-        self.buttons.accepted.connect(self.accept)
-        self.buttons.rejected.connect(self.reject)
+#campos da camada de mudanças
+def campos_mudancas():
+    fields = QgsFields()
+    fields.append(QgsField("id", QVariant.String))
+    fields.append(QgsField("tipo_mudanca", QVariant.String))
+    fields.append(QgsField("atributos_modificados", QVariant.String))
+    return fields
 
-    def get_selected_atributos(self):
-        return [cb.text() for cb in self.checkboxes if cb.isChecked()]
+#busca as feições de uma lista de ids em uma única requisição ao provedor
+def buscar_feicoes(camada, ids):
+    if not ids:
+        return {}
+    return {feature.id(): feature for feature in camada.getFeatures(QgsFeatureRequest().setFilterFids(ids))}
 
-#compara os atributos finais 
-def comparar_atributos(feature1, feature2, atributos_comparar):
-    mudancas = []
-    for nome_campo in atributos_comparar:
-        valor1 = feature1[nome_campo]
-        valor2 = feature2[nome_campo]
-        if valor1 != valor2:
-            mudancas.append(nome_campo)
-    return mudancas
+#valores da chave primária das feições de uma lista de ids
+def chaves_das_feicoes(camada, fids, chave_primaria):
+    if not fids:
+        return set()
+    request = QgsFeatureRequest().setFilterFids(list(fids)).setSubsetOfAttributes([chave_primaria], camada.fields())
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    chaves = {normalizar_valor(feature.attribute(chave_primaria)) for feature in camada.getFeatures(request)}
+    chaves.discard(None)
+    return chaves
+
+#ids das feições cuja chave primária está no conjunto, consultados em lotes com IN
+def ids_por_chave(camada, chave_primaria, chaves):
+    ids = set()
+    chaves = list(chaves)
+    for inicio in range(0, len(chaves), TAMANHO_LOTE):
+        valores = ', '.join(QgsExpression.quotedValue(chave) for chave in chaves[inicio:inicio + TAMANHO_LOTE])
+        request = QgsFeatureRequest().setFilterExpression(f'{QgsExpression.quotedColumnRef(chave_primaria)} IN ({valores})')
+        request.setFlags(QgsFeatureRequest.NoGeometry).setNoAttributes()
+        ids.update(feature.id() for feature in camada.getFeatures(request))
+    return ids
+
+#lê a camada uma única vez e grava cada feição, como WKBs mais tupla de atributos, na partição da sua chave;
+#com crs, as geometrias são transformadas para ele
+def particionar_camada(camada, chave_primaria, atributos_comparar, particoes, diretorio, feedback, fids=None, manifesto=None,
+                       crs=None, transform_context=None):
+    particionador = Particionador(particoes, diretorio)
+    request = QgsFeatureRequest()
+    if crs is not None:
+        request.setDestinationCrs(crs, transform_context)
+    if fids is not None:
+        if not fids:
+            return particionador
+        request.setFilterFids(list(fids))
+    for feature in camada.getFeatures(request):
+        if feedback.isCanceled():
+            break
+        chave = normalizar_valor(feature.attribute(chave_primaria))
+        valores = tuple(normalizar_valor(feature[nome_campo]) for nome_campo in atributos_comparar)
+        geometria = feature.geometry()
+        wkb = b'' if geometria.isNull() else bytes(geometria.asWkb())
+        normalizado = wkb_normalizado(geometria)
+        #a comparação usa o WKB normalizado e a saída, a geometria original
+        particionador.adicionar((chave_ordenacao(chave), feature.id(), chave, normalizado, valores,
+                                 None if wkb == normalizado else wkb))
+        if manifesto is not None:
+            manifesto.adicionar(chave, feature.id(), *resumir_feicao(feature))
+    return particionador
+
+#ids, caixas envolventes, WKB, assinaturas e hashes dos atributos comparados das feições de uma camada,
+#para o pareamento espacial; as feições sem geometria ficam de fora e têm só o id devolvido
+def resumo_espacial(camada, atributos_comparar, feedback, fids=None):
+    request = QgsFeatureRequest()
+    if fids is not None:
+        request.setFilterFids(list(fids))
+    indices = [camada.fields().lookupField(nome_campo) for nome_campo in atributos_comparar]
+    ids, caixas, wkbs, assinaturas, hashes, sem_geometria = [], [], [], [], bytearray(), []
+    if fids is None or fids:
+        for feature in camada.getFeatures(request):
+            if feedback.isCanceled():
+                break
+            geom = feature.geometry()
+            if geom.isNull() or geom.isEmpty():
+                sem_geometria.append(feature.id())
+                continue
+            bbox = geom.boundingBox()
+            ids.append(feature.id())
+            caixas.append((bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum()))
+            wkbs.append(bytes(geom.asWkb()))
+            assinaturas.append(assinatura_feicao(feature, atributos_comparar))
+            hashes += hashes_campos(valores_atributos(feature, indices))
+    caixas = np.asarray(caixas, dtype=float).reshape(-1, 4)
+    hashes = np.frombuffer(bytes(hashes), dtype=np.uint64).reshape(len(ids), len(indices))
+    return np.asarray(ids, dtype=np.int64), caixas, wkbs, assinaturas, hashes, sem_geometria
+
+#grava a mudança no delta: só a chave na remoção, tudo na adição e, na modificação,
+#só os atributos alterados e a geometria se ela mudou
+def registrar_no_delta(delta, tipo, chave, feature_dia_2, alterados=(), geometria_alterada=False):
+    if delta is None:
+        return
+    if tipo == 'Removida':
+        delta.removida(chave)
+    elif tipo == 'Adicionada':
+        valores = valores_atributos(feature_dia_2, range(feature_dia_2.fields().count()))
+        delta.adicionada(chave, valores, bytes(feature_dia_2.geometry().asWkb()))
+    else:
+        valores = [(nome_campo, normalizar_valor(feature_dia_2.attribute(nome_campo))) for nome_campo in alterados]
+        wkb = bytes(feature_dia_2.geometry().asWkb()) if geometria_alterada else INALTERADA
+        delta.modificada(chave, valores, wkb)
+
+#campos do dia 2 com valor diferente do dia 1 (ou ausentes nele) e se os bytes da geometria mudaram
+def alteracoes_exatas(feature_dia_1, feature_dia_2):
+    campos_dia_1 = feature_dia_1.fields()
+    alterados = []
+    for nome_campo, valor in zip(feature_dia_2.fields().names(), feature_dia_2.attributes()):
+        indice = campos_dia_1.lookupField(nome_campo)
+        if indice == -1 or codificar_valor(normalizar_valor(feature_dia_1.attributes()[indice])) != codificar_valor(normalizar_valor(valor)):
+            alterados.append(nome_campo)
+    return alterados, bytes(feature_dia_1.geometry().asWkb()) != bytes(feature_dia_2.geometry().asWkb())
+
+#horário do ponto em segundos desde a época; aceita data e hora, data, número ou texto ISO
+def segundos(valor):
+    if isinstance(valor, str):
+        valor = QDateTime.fromString(valor, Qt.ISODateWithMs)
+    if isinstance(valor, QDate):
+        valor = QDateTime(valor) if valor.isValid() else None
+    if isinstance(valor, QDateTime):
+        return valor.toMSecsSinceEpoch() / 1000.0 if valor.isValid() else None
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)
+    return None
+
+#valores normalizados dos atributos de uma feição, pelos índices dos campos (-1 é um campo ausente)
+def valores_atributos(feature, indices):
+    atributos = feature.attributes()
+    return tuple(normalizar_valor(atributos[indice]) if indice != -1 else None for indice in indices)
 
 #registrar o algoritmo no QGIS
 def classFactory(iface):
@@ -0,0 +1,198 @@
+#importando os módulos
+from qgis.PyQt.QtCore import QVariant, QDateTime
+from qgis.core import (QgsProcessing, QgsProcessingAlgorithm, QgsProcessingParameterFeatureSource,
+                       QgsProcessingParameterField, QgsProcessingParameterNumber, QgsProcessingParameterFeatureSink,
+                       QgsProcessingException, QgsFeatureSink, QgsFeature, QgsFeatureRequest, QgsField, QgsFields,
+                       QgsGeometry, QgsLineString, QgsWkbTypes)
+import numpy as np
+
+from .solucao import CAMPO_TEMPO_TRACKER, segundos
+from .trajetoria import (RAIO_TERRA, VELOCIDADE_MAXIMA_PADRAO, INTERVALO_MAXIMO_PADRAO, distancias, limpar,
+                         dividir_viagens, douglas_peucker)
+
+#trajetória do tracker com uma linha por viagem, já sem os pontos espúrios e simplificada
+class TrajetoriaTracker(QgsProcessingAlgorithm):
+    PONTOS_TRACKER = 'PONTOS_TRACKER'
+    CAMPO_TEMPO = 'CAMPO_TEMPO'
+    VELOCIDADE_MAXIMA = 'VELOCIDADE_MAXIMA'
+    INTERVALO_MAXIMO = 'INTERVALO_MAXIMO'
+    TOLERANCIA_SIMPLIFICACAO = 'TOLERANCIA_SIMPLIFICACAO'
+    OUTPUT_LAYER = 'OUTPUT_LAYER'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.PONTOS_TRACKER,
+                'Camada de pontos (tracker)',
+                [QgsProcessing.TypeVectorPoint]
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.CAMPO_TEMPO,
+                'Campo com o horário de cada ponto',
+                defaultValue=CAMPO_TEMPO_TRACKER,
+                parentLayerParameterName=self.PONTOS_TRACKER
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.VELOCIDADE_MAXIMA,
+                'Velocidade máxima plausível (m/s)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=VELOCIDADE_MAXIMA_PADRAO,
+                minValue=0.0
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.INTERVALO_MAXIMO,
+                'Intervalo entre pontos que separa viagens (segundos)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=INTERVALO_MAXIMO_PADRAO,
+                minValue=0.0
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCIA_SIMPLIFICACAO,
+                'Tolerância da simplificação (metros)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=1.0,
+                minValue=0.0
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_LAYER,
+                'Trajetória',
+                QgsProcessing.TypeVectorLine
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        camada_pontos = self.parameterAsSource(parameters, self.PONTOS_TRACKER, context)
+        campo_tempo = self.parameterAsString(parameters, self.CAMPO_TEMPO, context)
+        velocidade_maxima = self.parameterAsDouble(parameters, self.VELOCIDADE_MAXIMA, context)
+        intervalo_maximo = self.parameterAsDouble(parameters, self.INTERVALO_MAXIMO, context)
+        tolerancia = self.parameterAsDouble(parameters, self.TOLERANCIA_SIMPLIFICACAO, context)
+
+        indice_tempo = camada_pontos.fields().indexOf(campo_tempo)
+        if indice_tempo == -1:
+            raise QgsProcessingException(f'O campo {campo_tempo} não existe na camada de pontos.')
+        crs = camada_pontos.sourceCrs()
+        geografico = crs.isGeographic()
+        if geografico:
+            #a simplificação trabalha nas coordenadas da camada; a tolerância vira graus de latitude
+            tolerancia = np.degrees(tolerancia / RAIO_TERRA)
+
+        x, y, tempo, sem_horario = self.ler_pontos(camada_pontos, indice_tempo, feedback)
+        if sem_horario:
+            feedback.reportError(f'{sem_horario} pontos sem horário válido foram ignorados.')
+        if len(x) == 0:
+            raise QgsProcessingException('A camada de pontos (tracker) não tem pontos com horário.')
+
+        #uma única ordenação pelo horário; a limpeza e a divisão usam os arrays já ordenados
+        ordem = np.argsort(tempo, kind='stable')
+        x, y, tempo = x[ordem], y[ordem], tempo[ordem]
+        mantidos = limpar(x, y, tempo, velocidade_maxima, geografico)
+        feedback.pushInfo(f'{len(x)} pontos lidos, {int((~mantidos).sum())} descartados como espúrios.')
+        x, y, tempo = x[mantidos], y[mantidos], tempo[mantidos]
+        feedback.setProgress(30)
+
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT_LAYER,
+            context,
+            campos_trajetoria(),
+            QgsWkbTypes.LineString,
+            crs
+        )
+
+        viagens = dividir_viagens(tempo, intervalo_maximo)
+        numero = 0
+        vertices_total = 0
+        for atual, (inicio, fim) in enumerate(viagens):
+            if feedback.isCanceled():
+                break
+            #viagens de um ponto só não formam linha
+            if fim - inicio < 2:
+                continue
+            xv, yv, tv = x[inicio:fim], y[inicio:fim], tempo[inicio:fim]
+            simplificados = douglas_peucker(xv, yv, tolerancia)
+            numero += 1
+            vertices_total += int(simplificados.sum())
+            nova_feature = QgsFeature()
+            nova_feature.setGeometry(QgsGeometry(QgsLineString(xv[simplificados].tolist(), yv[simplificados].tolist())))
+            nova_feature.setAttributes([numero, horario(tv[0]), horario(tv[-1]), float(tv[-1] - tv[0]),
+                                        fim - inicio, int(simplificados.sum()),
+                                        float(distancias(xv, yv, geografico).sum())])
+            sink.addFeature(nova_feature, QgsFeatureSink.FastInsert)
+            feedback.setProgress(30 + int(70 * (atual + 1) / len(viagens)))
+        feedback.pushInfo(f'{numero} viagens com {vertices_total} vértices no total.')
+
+        return {self.OUTPUT_LAYER: dest_id}
+
+    #coordenadas e horários (segundos) dos pontos, com as partes de multipontos como pontos separados
+    def ler_pontos(self, camada_pontos, indice_tempo, feedback):
+        request = QgsFeatureRequest().setSubsetOfAttributes([indice_tempo])
+        xs, ys, tempos = [], [], []
+        sem_horario = 0
+        total = camada_pontos.featureCount() or 1
+        for atual, feature in enumerate(camada_pontos.getFeatures(request)):
+            if feedback.isCanceled():
+                break
+            geom = feature.geometry()
+            if geom.isEmpty():
+                continue
+            tempo = segundos(feature.attribute(indice_tempo))
+            if tempo is None:
+                sem_horario += 1
+                continue
+            for vertice in geom.vertices():
+                xs.append(vertice.x())
+                ys.append(vertice.y())
+                tempos.append(tempo)
+            if atual % 10000 == 0:
+                feedback.setProgress(int(20 * atual / total))
+        return np.array(xs, dtype=float), np.array(ys, dtype=float), np.array(tempos, dtype=float), sem_horario
+
+    def name(self):
+        return 'trajetoria_tracker'
+
+    def displayName(self):
+        return 'Trajetória do Tracker'
+
+    def group(self):
+        return 'Projeto 3'
+
+    def groupId(self):
+        return 'Projeto3'
+
+    def shortHelpString(self):
+        return ('Monta a trajetória dos pontos do tracker: ordena pelo horário, descarta pontos com velocidades ou '
+                'mudanças de rumo impossíveis, separa viagens nos intervalos longos e gera uma linha simplificada '
+                '(Douglas-Peucker) por viagem.')
+
+    def createInstance(self):
+        return TrajetoriaTracker()
+
+#campos da camada de trajetória
+def campos_trajetoria():
+    fields = QgsFields()
+    fields.append(QgsField("viagem", QVariant.Int))
+    fields.append(QgsField("inicio", QVariant.DateTime))
+    fields.append(QgsField("fim", QVariant.DateTime))
+    fields.append(QgsField("duracao", QVariant.Double))
+    fields.append(QgsField("pontos", QVariant.Int))
+    fields.append(QgsField("vertices", QVariant.Int))
+    fields.append(QgsField("comprimento", QVariant.Double))
+    return fields
+
+def horario(tempo):
+    return QDateTime.fromMSecsSinceEpoch(int(round(tempo * 1000)))
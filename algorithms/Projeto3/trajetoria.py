@@ -0,0 +1,118 @@
+#Limpeza, divisão em viagens e simplificação da trajetória do tracker, sobre arrays (x, y, tempo em segundos).
+import numpy as np
+
+from ..geometria import distancia_ponto_segmento
+
+#raio médio da Terra (metros), para distâncias aproximadas em SRC geográfico
+RAIO_TERRA = 6371008.8
+#mudança de rumo (graus) a partir da qual o ponto é tratado como um vai e volta
+ANGULO_REVERSAO = 150.0
+#passadas da limpeza; cada uma pode expor pontos espúrios que estavam vizinhos de outros
+PASSADAS_LIMPEZA = 5
+#velocidade máxima plausível (m/s) e intervalo (s) que separa viagens, quando não informados
+VELOCIDADE_MAXIMA_PADRAO = 40.0
+INTERVALO_MAXIMO_PADRAO = 300.0
+
+
+def distancias(x, y, geografico=False):
+    """Distância (metros) entre pontos consecutivos. Em SRC geográfico usa a
+    projeção equiretangular local, suficiente para pontos próximos."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    dx, dy = np.diff(x), np.diff(y)
+    if geografico:
+        latitude = np.radians((y[:-1] + y[1:]) / 2.0)
+        dx = np.radians(dx) * np.cos(latitude) * RAIO_TERRA
+        dy = np.radians(dy) * RAIO_TERRA
+    return np.hypot(dx, dy)
+
+
+def rumos(x, y):
+    """Rumo (radianos) de cada deslocamento entre pontos consecutivos."""
+    return np.arctan2(np.diff(np.asarray(y, dtype=float)), np.diff(np.asarray(x, dtype=float)))
+
+
+def velocidades(distancia, intervalo):
+    """Velocidade (m/s) de cada deslocamento; intervalo nulo com deslocamento
+    vira velocidade infinita e sem deslocamento vira zero."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v = distancia / intervalo
+    return np.where(distancia == 0, 0.0, np.where(intervalo > 0, v, np.inf))
+
+
+def pontos_espurios(x, y, tempo, velocidade_maxima, geografico=False):
+    """Máscara dos pontos espúrios de uma trajetória ordenada: repetidos, saltos acima da velocidade
+    máxima e vai e voltas acima da metade dela."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    tempo = np.asarray(tempo, dtype=float)
+    n = len(x)
+    espurio = np.zeros(n, dtype=bool)
+    if n < 2:
+        return espurio
+    distancia = distancias(x, y, geografico)
+    intervalo = np.diff(tempo)
+    espurio[1:] = (distancia == 0) & (intervalo == 0)
+    if n < 3:
+        return espurio
+    v = velocidades(distancia, intervalo)
+    v_chegada, v_saida = v[:-1], v[1:]
+    giro = np.abs(np.angle(np.exp(1j * np.diff(rumos(x, y)))))
+    reversao = giro > np.radians(ANGULO_REVERSAO)
+    salto = (v_chegada > velocidade_maxima) & (v_saida > velocidade_maxima)
+    vai_e_volta = reversao & (v_chegada > velocidade_maxima / 2.0) & (v_saida > velocidade_maxima / 2.0)
+    espurio[1:-1] |= salto | vai_e_volta
+    espurio[0] |= (v[0] > velocidade_maxima) & (v[1] <= velocidade_maxima)
+    espurio[-1] |= (v[-1] > velocidade_maxima) & (v[-2] <= velocidade_maxima)
+    return espurio
+
+
+def limpar(x, y, tempo, velocidade_maxima, geografico=False, passadas=PASSADAS_LIMPEZA):
+    """Máscara dos pontos mantidos após remover os espúrios, repetindo enquanto
+    alguma passada descartar pontos."""
+    mantidos = np.arange(len(x))
+    for _ in range(passadas):
+        espurio = pontos_espurios(x[mantidos], y[mantidos], tempo[mantidos], velocidade_maxima, geografico)
+        if not espurio.any():
+            break
+        mantidos = mantidos[~espurio]
+    mascara = np.zeros(len(x), dtype=bool)
+    mascara[mantidos] = True
+    return mascara
+
+
+def dividir_viagens(tempo, intervalo_maximo):
+    """Limites (início, fim exclusivo) de cada viagem: uma nova começa sempre que
+    o intervalo entre dois pontos consecutivos passa do máximo."""
+    tempo = np.asarray(tempo, dtype=float)
+    if len(tempo) == 0:
+        return []
+    cortes = np.flatnonzero(np.diff(tempo) > intervalo_maximo) + 1
+    inicios = np.r_[0, cortes]
+    fins = np.r_[cortes, len(tempo)]
+    return list(zip(inicios.tolist(), fins.tolist()))
+
+
+def douglas_peucker(x, y, tolerancia):
+    """Máscara dos vértices mantidos pela simplificação de Douglas-Peucker."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    mantidos = np.zeros(n, dtype=bool)
+    if n == 0:
+        return mantidos
+    mantidos[0] = mantidos[-1] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        if fim - inicio < 2:
+            continue
+        d = distancia_ponto_segmento(np.column_stack((x[inicio + 1:fim], y[inicio + 1:fim])),
+                                     np.array([[x[inicio], y[inicio], x[fim], y[fim]]]))
+        maior = int(np.argmax(d))
+        if d[maior] > tolerancia:
+            meio = inicio + 1 + maior
+            mantidos[meio] = True
+            pilha.append((inicio, meio))
+            pilha.append((meio, fim))
+    return mantidos
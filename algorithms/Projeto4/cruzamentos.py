@@ -0,0 +1,50 @@
+#Cruzamentos entre duas redes de linhas (drenagem x vias) e interseções múltiplas.
+import numpy as np
+
+from ..geometria import MAXIMO_CELULAS_CAIXA, IndiceCaixas, agrupar_pontos, caixas_segmentos, intersecao_segmentos
+
+#células da grade consultadas de cada vez, para limitar a memória dos pares candidatos;
+#um segmento de a longo demais para a grade conta como uma célula, pois vai para a ArvoreSTR
+CELULAS_POR_BLOCO = 2000000
+
+
+def cruzamentos(segmentos_a, segmentos_b, bloco=CELULAS_POR_BLOCO):
+    """Pontos onde os segmentos de a tocam os de b. Retorna (i, j, x, y): índice do
+    segmento de a, do segmento de b e coordenadas de cada ponto."""
+    segmentos_a = np.asarray(segmentos_a, dtype=float).reshape(-1, 4)
+    segmentos_b = np.asarray(segmentos_b, dtype=float).reshape(-1, 4)
+    vazio = np.empty(0, dtype=np.int64)
+    if len(segmentos_a) == 0 or len(segmentos_b) == 0:
+        return vazio, vazio, np.empty(0), np.empty(0)
+    indice = IndiceCaixas(caixas_segmentos(segmentos_b))
+    caixas_a = caixas_segmentos(segmentos_a)
+    celulas = indice.quantidade_celulas(caixas_a)
+    celulas[~(celulas <= MAXIMO_CELULAS_CAIXA)] = 1
+    acumulado = np.cumsum(celulas)
+    blocos = []
+    inicio = 0
+    while inicio < len(caixas_a):
+        #o bloco vai até onde a soma das células passa de bloco, com ao menos um segmento
+        fim = max(int(np.searchsorted(acumulado, acumulado[inicio] - celulas[inicio] + bloco, side='right')), inicio + 1)
+        i, j = indice.pares(caixas_a[inicio:fim])
+        i = i + inicio
+        toca, x, y, _ = intersecao_segmentos(segmentos_a[i], segmentos_b[j])
+        blocos.append((i[toca], j[toca], x[toca], y[toca]))
+        inicio = fim
+    return tuple(np.concatenate(partes) for partes in zip(*blocos))
+
+
+def intersecoes_multiplas(segmentos_a, rotulo_a, segmentos_b, rotulo_b, tolerancia=0.0):
+    """(feicao_a, feicao_b, x, y) dos cruzamentos em grupos, pela tolerância, com mais de um par de feições."""
+    i, j, x, y = cruzamentos(segmentos_a, segmentos_b)
+    vazio = np.empty(0, dtype=np.int64)
+    if len(i) == 0:
+        return vazio, vazio, np.empty(0), np.empty(0)
+    grupo = agrupar_pontos(x, y, max(float(tolerancia), 0.0))
+    feicao_a = np.asarray(rotulo_a)[i]
+    feicao_b = np.asarray(rotulo_b)[j]
+    _, unico = np.unique(np.column_stack((grupo, feicao_a, feicao_b)), axis=0, return_index=True)
+    grupo, feicao_a, feicao_b, x, y = grupo[unico], feicao_a[unico], feicao_b[unico], x[unico], y[unico]
+    pares_no_grupo = np.bincount(grupo)
+    multipla = pares_no_grupo[grupo] > 1
+    return feicao_a[multipla], feicao_b[multipla], x[multipla], y[multipla]
@@ -0,0 +1,197 @@
+from qgis.core import (
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterNumber,
+    QgsProcessingException,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPoint,
+    QgsPointXY,
+    QgsRectangle,
+    QgsSpatialIndex,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+import numpy as np
+
+from .motor import DadosValidacao, ler_camada
+from .proximidade import segmento_mais_proximo
+
+class ValidarRedeDrenagem(QgsProcessingAlgorithm):
+
+    DRENAGEM = 'DRENAGEM'
+    MASSAS_DAGUA = 'MASSAS_DAGUA'
+    MOLDURA = 'MOLDURA'
+    TOLERANCIA = 'TOLERANCIA'
+    OUTPUT = 'OUTPUT'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.DRENAGEM,
+                'Trecho de Drenagem (elemnat_trecho_drenagem_l)',
+                [QgsProcessing.TypeVectorLine]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.MASSAS_DAGUA,
+                'Massa d\'água (cobter_massa_dagua_a)',
+                [QgsProcessing.TypeVectorPolygon],
+                optional=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.MOLDURA,
+                'Moldura (se vazia, usa a extensão da drenagem)',
+                [QgsProcessing.TypeVectorPolygon],
+                optional=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCIA,
+                'Tolerância de conexão (unidades do SRC)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.000001,
+                minValue=0.0
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                'Erros da Rede de Drenagem',
+                QgsProcessing.TypeVectorPoint
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        drenagem = self.parameterAsSource(parameters, self.DRENAGEM, context)
+        if drenagem is None:
+            raise QgsProcessingException('Não foi possível carregar a camada de drenagem.')
+        massas = self.parameterAsSource(parameters, self.MASSAS_DAGUA, context)
+        moldura = self.parameterAsSource(parameters, self.MOLDURA, context)
+        tolerancia = self.parameterAsDouble(parameters, self.TOLERANCIA, context)
+        crs = drenagem.sourceCrs()
+
+        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT, context,
+                                               campos_rede(), QgsWkbTypes.Point, crs)
+
+        #Grafo da drenagem: trechos são arestas e as pontas unidas pela tolerância são nós
+        feedback.pushInfo(f'Lendo {drenagem.sourceName()}')
+        camadas = {'drenagem': ler_camada('drenagem', drenagem.sourceName(), drenagem, [], crs, context, feedback)}
+        if moldura is not None:
+            camadas['moldura'] = ler_camada('moldura', moldura.sourceName(), moldura, [], crs, context, feedback)
+        if feedback.isCanceled():
+            return {self.OUTPUT: dest_id}
+        dados = DadosValidacao(camadas, tolerancia)
+        grafo = dados.grafo('drenagem')
+        feedback.setProgress(30)
+
+        #Pontas da rede (grau 1) que chegam à moldura ou a uma massa d'água são saídas legítimas
+        pontas = grafo.pontas_soltas()
+        xy = grafo.no_xy[pontas]
+        saida = self.na_moldura(dados, grafo, xy, tolerancia)
+        if massas is not None:
+            restantes = np.flatnonzero(~saida)
+            saida[restantes] = self.na_massa_dagua(massas, xy[restantes], crs, tolerancia, context, feedback)
+        feedback.setProgress(70)
+
+        #Componentes (union-find) e quantos trechos cada um tem; sem nenhuma saída, a rede está desconectada
+        componentes = grafo.componentes()
+        tamanhos = grafo.tamanho_componentes()
+        com_saida = np.bincount(componentes[pontas[saida]], minlength=len(tamanhos)) > 0
+
+        fids = camadas['drenagem'].fids
+        quantidade = 0
+        for no, ponto in zip(pontas[~saida].tolist(), xy[~saida].tolist()):
+            componente = int(componentes[no])
+            aresta = grafo.arestas_de(no)[0]
+            self.adicionar_erro(sink, ponto, 'Ponta solta', fids[grafo.rotulo[aresta]], componente, tamanhos[componente])
+            quantidade += 1
+        #a rede desconectada é marcada no início do seu primeiro trecho
+        arestas_componente = grafo.componente_aresta()
+        desconectados, primeira = np.unique(arestas_componente, return_index=True)
+        for componente, aresta in zip(desconectados.tolist(), primeira.tolist()):
+            if com_saida[componente]:
+                continue
+            ponto = grafo.no_xy[grafo.origem[aresta]].tolist()
+            self.adicionar_erro(sink, ponto, 'Rede desconectada', fids[grafo.rotulo[aresta]], componente, tamanhos[componente])
+            quantidade += 1
+        feedback.pushInfo(f'{len(tamanhos)} redes e {quantidade} erros encontrados.')
+        feedback.setProgress(100)
+
+        return {self.OUTPUT: dest_id}
+
+    def na_moldura(self, dados, grafo, xy, tolerancia):
+        #Pontas sobre a borda da moldura ou, sem moldura, sobre a borda da extensão da drenagem
+        if 'moldura' in dados:
+            segmentos = dados.segmentos('moldura').xy
+        else:
+            if len(grafo) == 0:
+                return np.zeros(len(xy), dtype=bool)
+            x0, y0 = grafo.no_xy.min(axis=0)
+            x1, y1 = grafo.no_xy.max(axis=0)
+            segmentos = np.array([[x0, y0, x1, y0], [x1, y0, x1, y1], [x1, y1, x0, y1], [x0, y1, x0, y0]])
+        return segmento_mais_proximo(xy, segmentos, tolerancia) >= 0
+
+    def na_massa_dagua(self, massas, xy, crs, tolerancia, context, feedback):
+        #Índice espacial carregado de uma vez (com as geometrias) e consultado só para as pontas
+        request = QgsFeatureRequest().setNoAttributes().setDestinationCrs(crs, context.transformContext())
+        indice = QgsSpatialIndex(massas.getFeatures(request), feedback, QgsSpatialIndex.FlagStoreFeatureGeometries)
+        motores = {}
+        resultado = np.zeros(len(xy), dtype=bool)
+        for k, (x, y) in enumerate(xy.tolist()):
+            ponto = QgsPoint(x, y)
+            for fid in indice.intersects(QgsRectangle(x - tolerancia, y - tolerancia, x + tolerancia, y + tolerancia)):
+                if fid not in motores:
+                    motor = QgsGeometry.createGeometryEngine(indice.geometry(fid).constGet())
+                    motor.prepareGeometry()
+                    motores[fid] = motor
+                if motores[fid].distance(ponto) <= tolerancia:
+                    resultado[k] = True
+                    break
+        return resultado
+
+    def adicionar_erro(self, sink, ponto, erro, fid, componente, tamanho):
+        error_feature = QgsFeature()
+        error_feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(ponto[0], ponto[1])))
+        error_feature.setAttributes([erro, int(fid), int(componente), int(tamanho)])
+        sink.addFeature(error_feature, QgsFeatureSink.FastInsert)
+
+    def tr(self, string):
+        return QgsProcessingAlgorithm.tr(string)
+
+    def createInstance(self):
+        return ValidarRedeDrenagem()
+
+    def name(self):
+        return 'validar_rede_drenagem'
+
+    def displayName(self):
+        return self.tr('Validar Rede de Drenagem')
+
+    def group(self):
+        return self.tr('Projeto 4')
+
+    def groupId(self):
+        return 'projeto4'
+
+    def shortHelpString(self):
+        return self.tr("Marca as pontas soltas dos trechos de drenagem (nós de grau 1 fora das massas d'água e da moldura) e as redes desconectadas, que não chegam a nenhuma delas, com o tamanho de cada rede em trechos.")
+
+#campos da camada de erros da rede de drenagem
+def campos_rede():
+    fields = QgsFields()
+    fields.append(QgsField('erro', QVariant.String))
+    fields.append(QgsField('feicao', QVariant.LongLong))
+    fields.append(QgsField('componente', QVariant.Int))
+    fields.append(QgsField('tamanho_componente', QVariant.Int))
+    return fields
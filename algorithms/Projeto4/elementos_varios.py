@@ -0,0 +1,128 @@
+from qgis.core import (
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterNumber,
+    QgsProcessingException,
+    QgsFeature,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from ..geometria import empilhar_segmentos
+from .cruzamentos import intersecoes_multiplas
+from .motor import ler_camada
+
+class ValidacaoElementosVarios(QgsProcessingAlgorithm):
+
+    DRENAGEM = 'DRENAGEM'
+    VIA_DESLOCAMENTO = 'VIA_DESLOCAMENTO'
+    TOLERANCIA = 'TOLERANCIA'
+    OUTPUT = 'OUTPUT'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.DRENAGEM,
+                'Trecho de Drenagem',
+                [QgsProcessing.TypeVectorLine]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.VIA_DESLOCAMENTO,
+                'Via de Deslocamento',
+                [QgsProcessing.TypeVectorLine]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCIA,
+                'Tolerância para agrupar cruzamentos (unidades do SRC)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.000001,
+                minValue=0.0
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                'Erros de Validação',
+                QgsProcessing.TypeVectorPoint
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        #Carregar camadas de entrada
+        drenagem = self.parameterAsSource(parameters, self.DRENAGEM, context)
+        vias = self.parameterAsSource(parameters, self.VIA_DESLOCAMENTO, context)
+        if drenagem is None or vias is None:
+            raise QgsProcessingException('Não foi possível carregar uma das camadas de entrada.')
+        tolerancia = self.parameterAsDouble(parameters, self.TOLERANCIA, context)
+        crs = drenagem.sourceCrs()
+
+        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT, context,
+                                               campos_cruzamentos(), QgsWkbTypes.Point, crs)
+
+        #Segmentos das duas camadas em arrays, sem camada intermediária de interseções
+        camadas = []
+        for papel, fonte in (('drenagem', drenagem), ('vias', vias)):
+            feedback.pushInfo(f'Lendo {fonte.sourceName()}')
+            camada = ler_camada(papel, fonte.sourceName(), fonte, [], crs, context, feedback)
+            if feedback.isCanceled():
+                return {self.OUTPUT: dest_id}
+            segmentos = empilhar_segmentos(
+                (i, parte) for i, partes in enumerate(camada.partes()) for parte in partes)
+            camadas.append((camada, segmentos))
+        (camada_drenagem, segmentos_drenagem), (camada_vias, segmentos_vias) = camadas
+        feedback.setProgress(50)
+
+        #Cruzamentos agrupados pela tolerância; cada par de feições de um grupo com mais de um par é um erro
+        feedback.pushInfo('Procurando interseções múltiplas')
+        feicao_drenagem, feicao_via, x, y = intersecoes_multiplas(
+            segmentos_drenagem.xy, segmentos_drenagem.rotulo, segmentos_vias.xy, segmentos_vias.rotulo, tolerancia)
+
+        for d, v, px, py in zip(feicao_drenagem.tolist(), feicao_via.tolist(), x.tolist(), y.tolist()):
+            error_feature = QgsFeature()
+            error_feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(px, py)))
+            error_feature.setAttributes(['Interseção múltipla', int(camada_drenagem.fids[d]), int(camada_vias.fids[v])])
+            sink.addFeature(error_feature, QgsFeatureSink.FastInsert)
+        feedback.pushInfo(f'{len(x)} erros encontrados.')
+        feedback.setProgress(100)
+
+        return {self.OUTPUT: dest_id}
+
+    def tr(self, string):
+        return QgsProcessingAlgorithm.tr(string)
+
+    def createInstance(self):
+        return ValidacaoElementosVarios()
+
+    def name(self):
+        return 'validacao_elementos_varios'
+
+    def displayName(self):
+        return self.tr('Validação de Elementos Viários')
+
+    def group(self):
+        return self.tr('Projeto 4')
+
+    def groupId(self):
+        return 'projeto4'
+
+    def shortHelpString(self):
+        return self.tr("Encontra os cruzamentos entre trechos de drenagem e vias de deslocamento e marca como 'Interseção múltipla' os pontos onde mais de um par de feições se cruza (a até a tolerância).")
+
+#campos da camada de erros de cruzamento
+def campos_cruzamentos():
+    fields = QgsFields()
+    fields.append(QgsField('erro', QVariant.String))
+    fields.append(QgsField('drenagem', QVariant.LongLong))
+    fields.append(QgsField('via', QVariant.LongLong))
+    return fields
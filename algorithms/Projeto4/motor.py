@@ -0,0 +1,200 @@
+#Motor de regras das validações do Projeto 4: lê cada camada uma única vez com a união dos campos pedidos pelas
+#regras e monta as estruturas derivadas na primeira vez em que alguma regra as pede.
+from collections import namedtuple
+
+import numpy as np
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsFeatureRequest, QgsGeometry, QgsProcessingException, QgsWkbTypes
+
+from ..geometria import partes_wkb, empilhar_segmentos
+from .topologia import GrafoRede
+from .vertices import IndiceVertices
+
+#erro encontrado por uma regra: feição de origem, ponto onde o erro é marcado e descrição
+Erro = namedtuple('Erro', ['regra', 'papel', 'fid', 'x', 'y', 'descricao'])
+
+
+def valor_simples(valor):
+    """Valor de atributo com None no lugar de NULL."""
+    if valor is None or (isinstance(valor, QVariant) and valor.isNull()):
+        return None
+    return valor
+
+
+class CamadaLida(object):
+    """Feições de uma camada lidas uma vez: ids, colunas dos campos pedidos pelas
+    regras e geometrias em WKB (convertidas em coordenadas sob demanda)."""
+
+    def __init__(self, papel, nome, fids, colunas, wkbs):
+        self.papel = papel
+        self.nome = nome
+        self.fids = np.asarray(fids, dtype=np.int64)
+        self.colunas = colunas
+        self.wkbs = wkbs
+        self._partes = None
+        self._caixas = None
+        self._geometrias = {}
+
+    def __len__(self):
+        return len(self.fids)
+
+    def coluna(self, campo):
+        return self.colunas[campo]
+
+    def partes(self):
+        """Lista, por feição, das partes (arrays (n, 2)) de cada linha, anel ou ponto."""
+        if self._partes is None:
+            self._partes = [partes_wkb(wkb) if wkb else [] for wkb in self.wkbs]
+        return self._partes
+
+    def caixas(self):
+        """Caixas envolventes (n, 4); feições sem geometria ficam com NaN."""
+        if self._caixas is None:
+            caixas = np.full((len(self), 4), np.nan)
+            for i, partes in enumerate(self.partes()):
+                if partes:
+                    coords = np.vstack(partes)
+                    caixas[i] = (coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max())
+            self._caixas = caixas
+        return self._caixas
+
+    def ponto(self, i):
+        """Primeiro vértice da feição, usado para marcar os erros."""
+        partes = self.partes()[i]
+        if not partes:
+            return None, None
+        return float(partes[0][0, 0]), float(partes[0][0, 1])
+
+    def geometria(self, i):
+        if i not in self._geometrias:
+            geometria = QgsGeometry()
+            if self.wkbs[i]:
+                geometria.fromWkb(self.wkbs[i])
+            self._geometrias[i] = geometria
+        return self._geometrias[i]
+
+
+class DadosValidacao(object):
+    """Camadas lidas, por papel, e as estruturas derivadas compartilhadas."""
+
+    def __init__(self, camadas, tolerancia):
+        self.camadas = camadas
+        self.tolerancia = tolerancia
+        self._derivados = {}
+
+    def __contains__(self, papel):
+        return papel in self.camadas
+
+    def __getitem__(self, papel):
+        return self.camadas[papel]
+
+    def derivado(self, chave, construtor):
+        """Resultado de construtor(), calculado só na primeira vez que a chave é pedida."""
+        if chave not in self._derivados:
+            self._derivados[chave] = construtor()
+        return self._derivados[chave]
+
+    def segmentos(self, papel):
+        """Segmentos de todas as linhas e anéis da camada; o rótulo é o índice da feição."""
+        camada = self[papel]
+        return self.derivado(('segmentos', papel), lambda: empilhar_segmentos(
+            (i, parte) for i, partes in enumerate(camada.partes()) for parte in partes))
+
+    def vertices(self, papel):
+        """Índice de todos os vértices da camada, com a tolerância da validação;
+        o rótulo é o índice da feição."""
+        camada = self[papel]
+        return self.derivado(('vertices', papel), lambda: IndiceVertices.de_wkbs(camada.wkbs, self.tolerancia))
+
+    def grafo(self, papel):
+        """Grafo topológico da rede de linhas da camada, com as pontas unidas pela
+        tolerância da validação; o rótulo de cada aresta é o índice da feição."""
+        camada = self[papel]
+        return self.derivado(('grafo', papel), lambda: GrafoRede.de_linhas(
+            ((i, parte) for i, partes in enumerate(camada.partes()) for parte in partes), self.tolerancia))
+
+    def pontos(self, papel):
+        """Coordenadas (n, 2) do primeiro vértice de cada feição (NaN se vazia)."""
+        camada = self[papel]
+        return self.derivado(('pontos', papel), lambda: np.array(
+            [camada.ponto(i) for i in range(len(camada))], dtype=float).reshape(-1, 2))
+
+
+class Regra(object):
+    """Regra de validação. As subclasses definem o código, as camadas de que
+    precisam ({papel: campos}) e avaliar(dados), que gera os erros; sem avaliar, a regra não gera nenhum."""
+    codigo = ''
+    camadas = {}
+
+    def aplicavel(self, papeis):
+        return all(papel in papeis for papel in self.camadas)
+
+    def avaliar(self, dados):
+        return iter(())
+
+    def erro(self, dados, papel, i, descricao, ponto=None):
+        x, y = dados[papel].ponto(i) if ponto is None else ponto
+        return Erro(self.codigo, papel, int(dados[papel].fids[i]), x, y, descricao)
+
+
+class MotorRegras(object):
+    """Planeja a leitura das camadas a partir das declarações das regras e avalia
+    todas as regras sobre os mesmos dados."""
+
+    def __init__(self, regras):
+        self.regras = list(regras)
+
+    def planejar(self, papeis):
+        """Regras aplicáveis às camadas informadas e campos a ler de cada camada."""
+        aplicaveis = [regra for regra in self.regras if regra.aplicavel(papeis)]
+        campos = {}
+        for regra in aplicaveis:
+            for papel, nomes in regra.camadas.items():
+                lista = campos.setdefault(papel, [])
+                lista.extend(nome for nome in nomes if nome not in lista)
+        return aplicaveis, campos
+
+    def executar(self, fontes, crs, tolerancia, context, feedback):
+        """Gera os erros de todas as regras; fontes é {papel: (nome, QgsFeatureSource)}."""
+        aplicaveis, campos = self.planejar(set(fontes))
+        for regra in self.regras:
+            if regra not in aplicaveis:
+                feedback.pushInfo(f'{regra.codigo} ignorada: faltam as camadas {", ".join(sorted(set(regra.camadas) - set(fontes)))}.')
+        camadas = {}
+        for papel in campos:
+            nome, fonte = fontes[papel]
+            feedback.pushInfo(f'Lendo {nome}')
+            camadas[papel] = ler_camada(papel, nome, fonte, campos[papel], crs, context, feedback)
+            if feedback.isCanceled():
+                return
+        dados = DadosValidacao(camadas, tolerancia)
+        for regra in aplicaveis:
+            if feedback.isCanceled():
+                return
+            feedback.pushInfo(f'Avaliando {regra.codigo}')
+            for erro in regra.avaliar(dados):
+                yield erro
+
+
+def ler_camada(papel, nome, fonte, campos, crs, context, feedback):
+    """Leitura única da camada: só os campos pedidos e a geometria em WKB, já no SRC de saída."""
+    ausentes = [campo for campo in campos if fonte.fields().indexOf(campo) == -1]
+    if ausentes:
+        raise QgsProcessingException(f'A camada {nome} não tem os campos {", ".join(ausentes)}.')
+    request = QgsFeatureRequest().setSubsetOfAttributes(campos, fonte.fields())
+    request.setDestinationCrs(crs, context.transformContext())
+    indices = [fonte.fields().indexOf(campo) for campo in campos]
+    fids, wkbs = [], []
+    colunas = {campo: [] for campo in campos}
+    for feature in fonte.getFeatures(request):
+        if feedback.isCanceled():
+            break
+        fids.append(feature.id())
+        geometria = feature.geometry()
+        if QgsWkbTypes.isCurvedType(geometria.wkbType()):
+            #os arrays de coordenadas só tratam segmentos de reta
+            geometria = QgsGeometry(geometria.constGet().segmentize())
+        wkbs.append(bytes(geometria.asWkb()) if not geometria.isNull() else b'')
+        for campo, indice in zip(campos, indices):
+            colunas[campo].append(valor_simples(feature.attribute(indice)))
+    return CamadaLida(papel, nome, fids, colunas, wkbs)
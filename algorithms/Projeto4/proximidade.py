@@ -0,0 +1,32 @@
+#Predicados de proximidade entre pontos e segmentos usados pelas regras do Projeto 4.
+import numpy as np
+
+from ..geometria import distancia_ponto_segmento, pares_candidatos
+
+
+def segmento_mais_proximo(pontos, segmentos, tolerancia):
+    """Índice do segmento mais próximo de cada ponto, entre os que estão a até a
+    tolerância dele; -1 quando nenhum está."""
+    pontos = np.asarray(pontos, dtype=float).reshape(-1, 2)
+    segmentos = np.asarray(segmentos, dtype=float).reshape(-1, 4)
+    n = len(pontos)
+    resultado = np.full(n, -1, dtype=np.int64)
+    if n == 0 or len(segmentos) == 0:
+        return resultado
+    tolerancia = max(float(tolerancia), 0.0)
+    caixas = np.vstack((
+        np.column_stack((pontos - tolerancia, pontos + tolerancia)),
+        np.column_stack((np.minimum(segmentos[:, 0], segmentos[:, 2]), np.minimum(segmentos[:, 1], segmentos[:, 3]),
+                         np.maximum(segmentos[:, 0], segmentos[:, 2]), np.maximum(segmentos[:, 1], segmentos[:, 3]))),
+    ))
+    grupo = np.r_[np.zeros(n, dtype=np.int8), np.ones(len(segmentos), dtype=np.int8)]
+    i, j = pares_candidatos(caixas, grupo=grupo)
+    #os pontos vêm antes na pilha, então i é sempre o ponto
+    j = j - n
+    distancia = distancia_ponto_segmento(pontos[i], segmentos[j])
+    perto = distancia <= tolerancia
+    i, j, distancia = i[perto], j[perto], distancia[perto]
+    #o mais próximo de cada ponto é o último após ordenar por ponto e distância decrescente
+    ordem = np.lexsort((-distancia, i))
+    resultado[i[ordem]] = j[ordem]
+    return resultado
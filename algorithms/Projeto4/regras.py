@@ -0,0 +1,157 @@
+#Regras 1 a 7 da validação de uma folha do Projeto 4, declaradas para o motor de
+#regras. Os papéis das camadas são:
+#  vias       infra_via_deslocamento_l
+#  elementos  infra_elemento_viario_p
+#  drenagem   elemnat_trecho_drenagem_l
+#  barragens  infra_barragem_l
+#  massas     cobter_massa_dagua_a
+import numpy as np
+
+from .motor import Regra
+from .proximidade import segmento_mais_proximo
+from .sobreposicao import BarragensPreparadas, sobreposicao_entre_linhas
+
+#tipos de elemento viário que marcam a travessia de uma via sobre a drenagem
+TIPOS_TRAVESSIA = {501, 203, 401}
+TIPO_ELEMENTO_VERTICE = 203
+TIPO_VIA_TRAVESSIA = 2
+
+
+def inteiro(valor, padrao=1):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return padrao
+
+
+def linha_sob_pontos(dados, papel_pontos, papel_linhas):
+    """Feição de papel_linhas a até a tolerância do ponto de cada feição de papel_pontos, ou -1."""
+    def construir():
+        pontos = dados.pontos(papel_pontos)
+        segmentos = dados.segmentos(papel_linhas)
+        resultado = np.full(len(pontos), -1, dtype=np.int64)
+        validos = ~np.isnan(pontos[:, 0])
+        mais_proximo = segmento_mais_proximo(pontos[validos], segmentos.xy, dados.tolerancia)
+        resultado[validos] = np.where(mais_proximo >= 0, segmentos.rotulo[np.maximum(mais_proximo, 0)], -1)
+        return resultado
+    return dados.derivado(('linha_sob_pontos', papel_pontos, papel_linhas), construir)
+
+
+class RegraFaixas(Regra):
+    """O número de pistas de uma via não pode passar do número de faixas."""
+    codigo = 'Regra 1'
+    camadas = {'vias': ('nr_pistas', 'nr_faixas')}
+
+    def avaliar(self, dados):
+        vias = dados['vias']
+        for i, (pistas, faixas) in enumerate(zip(vias.coluna('nr_pistas'), vias.coluna('nr_faixas'))):
+            pistas, faixas = max(inteiro(pistas), 1), max(inteiro(faixas), 1)
+            if pistas > faixas:
+                yield self.erro(dados, 'vias', i, 'nr_pistas maior que nr_faixas')
+
+
+class RegraSituacao(Regra):
+    """Elementos viários abandonados, e pontes (401) com material 3, são erros."""
+    codigo = 'Regra 2'
+    camadas = {'elementos': ('tipo', 'material_construcao', 'situacao_fisica')}
+
+    def avaliar(self, dados):
+        elementos = dados['elementos']
+        colunas = zip(elementos.coluna('tipo'), elementos.coluna('material_construcao'),
+                      elementos.coluna('situacao_fisica'))
+        for i, (tipo, material, situacao) in enumerate(colunas):
+            if tipo == 401 and material == 3:
+                yield self.erro(dados, 'elementos', i, 'Erro Material')
+            elif situacao == 1:
+                yield self.erro(dados, 'elementos', i, 'Erro Abandono')
+
+
+class RegraTravessia(Regra):
+    """Elemento viário no cruzamento de via com drenagem deve ser de travessia."""
+    codigo = 'Regra 3'
+    camadas = {'elementos': ('tipo',), 'vias': (), 'drenagem': ()}
+
+    def avaliar(self, dados):
+        na_via = linha_sob_pontos(dados, 'elementos', 'vias') >= 0
+        na_drenagem = linha_sob_pontos(dados, 'elementos', 'drenagem') >= 0
+        tipos = dados['elementos'].coluna('tipo')
+        for i in np.flatnonzero(na_via & na_drenagem).tolist():
+            if tipos[i] not in TIPOS_TRAVESSIA:
+                yield self.erro(dados, 'elementos', i, 'Elemento no cruzamento de via e drenagem não é de travessia')
+
+
+class RegraTravessiaDrenagem(Regra):
+    """Elemento de travessia sobre via do tipo 2 precisa estar sobre a drenagem."""
+    codigo = 'Regra 4'
+    camadas = {'elementos': ('tipo',), 'vias': ('tipo',), 'drenagem': ()}
+
+    def avaliar(self, dados):
+        via = linha_sob_pontos(dados, 'elementos', 'vias')
+        na_drenagem = linha_sob_pontos(dados, 'elementos', 'drenagem') >= 0
+        tipos = dados['elementos'].coluna('tipo')
+        tipos_via = dados['vias'].coluna('tipo')
+        for i in np.flatnonzero((via >= 0) & ~na_drenagem).tolist():
+            if tipos[i] in TIPOS_TRAVESSIA and tipos_via[via[i]] == TIPO_VIA_TRAVESSIA:
+                yield self.erro(dados, 'elementos', i, 'Elemento de travessia fora da drenagem')
+
+
+class RegraAtributosVia(Regra):
+    """Elemento 203 em um vértice de via deve repetir pistas, faixas e situação da via."""
+    codigo = 'Regra 5'
+    campos_comparados = ('nr_pistas', 'nr_faixas', 'situacao_fisica')
+    camadas = {'elementos': ('tipo',) + campos_comparados, 'vias': campos_comparados}
+
+    def avaliar(self, dados):
+        elementos, vias = dados['elementos'], dados['vias']
+        tipos = elementos.coluna('tipo')
+        candidatos = np.array([i for i, tipo in enumerate(tipos) if tipo == TIPO_ELEMENTO_VERTICE], dtype=np.int64)
+        pontos = dados.pontos('elementos')[candidatos]
+        candidatos, pontos = candidatos[~np.isnan(pontos[:, 0])], pontos[~np.isnan(pontos[:, 0])]
+        #uma consulta só para todos os elementos 203; o rótulo do vértice é a via
+        vias_dos_pontos = dados.vertices('vias').rotulos(pontos)
+        for i, via in zip(candidatos.tolist(), vias_dos_pontos.tolist()):
+            if via < 0:
+                continue
+            diferentes = [campo for campo in self.campos_comparados
+                          if elementos.coluna(campo)[i] != vias.coluna(campo)[via]]
+            if diferentes:
+                yield self.erro(dados, 'elementos', i, f'Diferente da via em {", ".join(diferentes)}')
+
+
+class RegraBordaBarragem(Regra):
+    """A borda da massa d'água não pode estar sobre uma barragem."""
+    codigo = 'Regra 6'
+    camadas = {'massas': (), 'barragens': ()}
+
+    def avaliar(self, dados):
+        aneis = dados.segmentos('massas')
+        barragens = dados.derivado('barragens_preparadas', lambda: BarragensPreparadas(
+            dados.segmentos('barragens').xy, dados.tolerancia))
+        #todos os segmentos das bordas de uma vez; a massa é marcada no início do primeiro trecho sobreposto
+        comprimento, ponto = barragens.sobreposicao(aneis.xy)
+        sobre = comprimento > 0
+        massas, primeiro = np.unique(aneis.rotulo[sobre], return_index=True)
+        for i, (x, y) in zip(massas.tolist(), ponto[sobre][primeiro].tolist()):
+            yield self.erro(dados, 'massas', i, 'erro borda', (x, y))
+
+
+class RegraBarragemVia(Regra):
+    """sobreposto_transportes da barragem deve indicar se há via sobre ela."""
+    codigo = 'Regra 7'
+    camadas = {'barragens': ('sobreposto_transportes',), 'vias': ()}
+
+    def avaliar(self, dados):
+        sobrepostas = self.barragens_sob_vias(dados)
+        for i, valor in enumerate(dados['barragens'].coluna('sobreposto_transportes')):
+            if (i in sobrepostas) != (valor == 1):
+                yield self.erro(dados, 'barragens', i, 'Erro 7')
+
+    def barragens_sob_vias(self, dados):
+        barragens = dados.segmentos('barragens')
+        comprimento = sobreposicao_entre_linhas(barragens.xy, barragens.rotulo, len(dados['barragens']),
+                                                dados.segmentos('vias').xy, dados.tolerancia)
+        return set(np.flatnonzero(comprimento > 0).tolist())
+
+
+REGRAS = [RegraFaixas(), RegraSituacao(), RegraTravessia(), RegraTravessiaDrenagem(),
+          RegraAtributosVia(), RegraBordaBarragem(), RegraBarragemVia()]
@@ -0,0 +1,162 @@
+from qgis.core import (
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterRasterLayer,
+    QgsProcessingException,
+    QgsCoordinateTransform,
+    QgsFeature,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+import numpy as np
+
+from ..Projeto2.altitude import GradeMDT
+from .motor import DadosValidacao, ler_camada
+
+class ValidarSentidoDrenagem(QgsProcessingAlgorithm):
+
+    DRENAGEM = 'DRENAGEM'
+    MDT = 'MDT'
+    TOLERANCIA_ALTIMETRICA = 'TOLERANCIA_ALTIMETRICA'
+    TOLERANCIA = 'TOLERANCIA'
+    OUTPUT = 'OUTPUT'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.DRENAGEM,
+                'Trecho de Drenagem (elemnat_trecho_drenagem_l)',
+                [QgsProcessing.TypeVectorLine]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterRasterLayer(
+                self.MDT,
+                'MDT'
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCIA_ALTIMETRICA,
+                'Subida tolerada ao longo do trecho (m)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=1.0,
+                minValue=0.0
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCIA,
+                'Tolerância de conexão (unidades do SRC do MDT)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.000001,
+                minValue=0.0
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                'Trechos Contra o Relevo',
+                QgsProcessing.TypeVectorPoint
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        drenagem = self.parameterAsSource(parameters, self.DRENAGEM, context)
+        mdt_layer = self.parameterAsRasterLayer(parameters, self.MDT, context)
+        if drenagem is None or mdt_layer is None:
+            raise QgsProcessingException('Não foi possível carregar uma das camadas de entrada.')
+        tolerancia_z = self.parameterAsDouble(parameters, self.TOLERANCIA_ALTIMETRICA, context)
+        tolerancia = self.parameterAsDouble(parameters, self.TOLERANCIA, context)
+        #a drenagem é lida no SRC do MDT, para amostrar direto nos pixels
+        crs = mdt_layer.crs()
+
+        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT, context,
+                                               campos_sentido(), QgsWkbTypes.Point, crs)
+
+        feedback.pushInfo(f'Lendo {drenagem.sourceName()}')
+        camada = ler_camada('drenagem', drenagem.sourceName(), drenagem, [], crs, context, feedback)
+        if feedback.isCanceled():
+            return {self.OUTPUT: dest_id}
+        dados = DadosValidacao({'drenagem': camada}, tolerancia)
+        segmentos = dados.segmentos('drenagem')
+        grafo = dados.grafo('drenagem')
+        feedback.setProgress(30)
+
+        #A grade fica limitada à janela sob a drenagem e dela só são lidos, em blocos, os que têm
+        #pontos; início e fim de todos os segmentos e os nós do grafo vão numa única chamada bilinear
+        extensao = QgsCoordinateTransform(drenagem.sourceCrs(), crs, context.transformContext()).transformBoundingBox(drenagem.sourceExtent())
+        grade = GradeMDT(mdt_layer, janela=(extensao.xMinimum(), extensao.yMinimum(), extensao.xMaximum(), extensao.yMaximum()))
+        m = len(segmentos)
+        x = np.concatenate((segmentos.xy[:, 0], segmentos.xy[:, 2], grafo.no_xy[:, 0]))
+        y = np.concatenate((segmentos.xy[:, 1], segmentos.xy[:, 3], grafo.no_xy[:, 1]))
+        z = grade.interpolar(x, y)
+        z_inicio, z_fim, z_nos = z[:m], z[m:2 * m], z[2 * m:]
+        feedback.setProgress(60)
+
+        #Segmentos em subida por feição, e trechos cujo fim está acima do início além da tolerância
+        with np.errstate(invalid='ignore'):
+            subida = (z_fim - z_inicio) > tolerancia_z
+        segmentos_subida = np.bincount(segmentos.rotulo[subida], minlength=len(camada))
+        desnivel = z_nos[grafo.destino] - z_nos[grafo.origem]
+        with np.errstate(invalid='ignore'):
+            invertidas = np.flatnonzero(desnivel > tolerancia_z)
+        sem_mdt = int(np.count_nonzero(np.isnan(desnivel)))
+
+        #Trechos invertidos que se tocam formam uma cadeia, digitalizada toda no sentido contrário
+        cadeia, tamanho_cadeia = grafo.agrupar_arestas(invertidas)
+
+        for aresta, c in zip(invertidas.tolist(), cadeia.tolist()):
+            feicao = grafo.rotulo[aresta]
+            ponto = grafo.no_xy[grafo.origem[aresta]]
+            error_feature = QgsFeature()
+            error_feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(float(ponto[0]), float(ponto[1]))))
+            error_feature.setAttributes(['Trecho contra o relevo', int(camada.fids[feicao]), float(desnivel[aresta]),
+                                         int(segmentos_subida[feicao]), int(c), int(tamanho_cadeia[c])])
+            sink.addFeature(error_feature, QgsFeatureSink.FastInsert)
+        if sem_mdt:
+            feedback.pushInfo(f'{sem_mdt} trechos fora do MDT não foram avaliados.')
+        feedback.pushInfo(f'{len(invertidas)} trechos contra o relevo em {len(tamanho_cadeia)} cadeias.')
+        feedback.setProgress(100)
+
+        return {self.OUTPUT: dest_id}
+
+    def tr(self, string):
+        return QgsProcessingAlgorithm.tr(string)
+
+    def createInstance(self):
+        return ValidarSentidoDrenagem()
+
+    def name(self):
+        return 'validar_sentido_drenagem'
+
+    def displayName(self):
+        return self.tr('Validar Sentido da Drenagem')
+
+    def group(self):
+        return self.tr('Projeto 4')
+
+    def groupId(self):
+        return 'projeto4'
+
+    def shortHelpString(self):
+        return self.tr("Amostra o MDT no início e no fim de cada trecho de drenagem e marca os trechos digitalizados morro acima (o fim mais alto que o início além da tolerância), agrupando os trechos invertidos ligados entre si em cadeias.")
+
+#campos da camada de trechos contra o relevo
+def campos_sentido():
+    fields = QgsFields()
+    fields.append(QgsField('erro', QVariant.String))
+    fields.append(QgsField('feicao', QVariant.LongLong))
+    fields.append(QgsField('desnivel', QVariant.Double))
+    fields.append(QgsField('segmentos_subida', QVariant.Int))
+    fields.append(QgsField('cadeia', QVariant.Int))
+    fields.append(QgsField('trechos_cadeia', QVariant.Int))
+    return fields
@@ -0,0 +1,89 @@
+#Sobreposição colinear entre linhas (borda de massa d'água sobre barragem).
+import numpy as np
+
+from ..geometria import ArvoreSTR, IndiceCaixas, caixas_segmentos
+
+#segmentos da borda testados de cada vez antes de decidir se a feição já está classificada
+SEGMENTOS_POR_BLOCO = 256
+
+
+def comprimento_sobreposto(a, b, tolerancia):
+    """Comprimento de a[k] que corre sobre b[k] (pontas a até a tolerância da reta de b) e o ponto
+    inicial da sobreposição."""
+    bx, by = b[:, 0], b[:, 1]
+    dx, dy = b[:, 2] - bx, b[:, 3] - by
+    comprimento_b = np.hypot(dx, dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ux = np.where(comprimento_b > 0, dx / comprimento_b, 0.0)
+        uy = np.where(comprimento_b > 0, dy / comprimento_b, 0.0)
+    #projeção (t) e afastamento (d) das pontas de a no sistema da reta de b
+    t0 = (a[:, 0] - bx) * ux + (a[:, 1] - by) * uy
+    t1 = (a[:, 2] - bx) * ux + (a[:, 3] - by) * uy
+    d0 = np.abs((a[:, 1] - by) * ux - (a[:, 0] - bx) * uy)
+    d1 = np.abs((a[:, 3] - by) * ux - (a[:, 2] - bx) * uy)
+    #folga numérica proporcional ao tamanho das coordenadas, para coincidências exatas
+    folga = tolerancia + 1e-9 * np.maximum(comprimento_b, 1.0)
+    inicio = np.maximum(np.minimum(t0, t1), 0.0)
+    fim = np.minimum(np.maximum(t0, t1), comprimento_b)
+    colinear = (comprimento_b > 0) & (d0 <= folga) & (d1 <= folga)
+    comprimento = np.where(colinear, np.clip(fim - inicio, 0.0, None), 0.0)
+    return comprimento, np.column_stack((bx + inicio * ux, by + inicio * uy))
+
+
+class BarragensPreparadas(object):
+    """Segmentos das barragens com a grade de consulta, montados uma vez."""
+
+    def __init__(self, segmentos, tolerancia=0.0):
+        self.segmentos = np.asarray(segmentos, dtype=float).reshape(-1, 4)
+        self.tolerancia = max(float(tolerancia), 0.0)
+        self.indice = IndiceCaixas(caixas_segmentos(self.segmentos, self.tolerancia))
+
+    def __len__(self):
+        return len(self.segmentos)
+
+    def sobreposicao(self, segmentos):
+        """Comprimento de cada segmento que corre sobre alguma barragem e o ponto
+        inicial da primeira sobreposição encontrada (NaN quando não há)."""
+        segmentos = np.asarray(segmentos, dtype=float).reshape(-1, 4)
+        total = np.zeros(len(segmentos))
+        ponto = np.full((len(segmentos), 2), np.nan)
+        i, j = self.indice.pares(caixas_segmentos(segmentos))
+        if len(i) == 0:
+            return total, ponto
+        comprimento, inicio = comprimento_sobreposto(segmentos[i], self.segmentos[j], self.tolerancia)
+        sobre = comprimento > 0
+        np.add.at(total, i[sobre], comprimento[sobre])
+        #o primeiro par de cada segmento fica por último na atribuição invertida
+        ponto[i[sobre][::-1]] = inicio[sobre][::-1]
+        return total, ponto
+
+    def borda_sobreposta(self, partes, bloco=SEGMENTOS_POR_BLOCO):
+        """Comprimento e ponto inicial da sobreposição no primeiro bloco de segmentos da borda que corre
+        sobre uma barragem, ou (0, None)."""
+        if len(self.segmentos) == 0:
+            return 0.0, None
+        for parte in partes:
+            if len(parte) < 2:
+                continue
+            segmentos = np.hstack((parte[:-1], parte[1:]))
+            for inicio in range(0, len(segmentos), bloco):
+                comprimento, ponto = self.sobreposicao(segmentos[inicio:inicio + bloco])
+                sobre = np.flatnonzero(comprimento > 0)
+                if len(sobre):
+                    return float(comprimento.sum()), (float(ponto[sobre[0], 0]), float(ponto[sobre[0], 1]))
+        return 0.0, None
+
+
+def sobreposicao_entre_linhas(segmentos_a, rotulo_a, quantidade, segmentos_b, tolerancia=0.0):
+    """Comprimento de cada feição de a (rótulos 0 a quantidade - 1) que corre sobre alguma linha de b."""
+    segmentos_a = np.asarray(segmentos_a, dtype=float).reshape(-1, 4)
+    segmentos_b = np.asarray(segmentos_b, dtype=float).reshape(-1, 4)
+    total = np.zeros(quantidade)
+    if len(segmentos_a) == 0 or len(segmentos_b) == 0:
+        return total
+    tolerancia = max(float(tolerancia), 0.0)
+    arvore = ArvoreSTR(caixas_segmentos(segmentos_b, tolerancia))
+    i, j = arvore.pares(caixas_segmentos(segmentos_a))
+    comprimento, _ = comprimento_sobreposto(segmentos_a[i], segmentos_b[j], tolerancia)
+    np.add.at(total, np.asarray(rotulo_a)[i], comprimento)
+    return total
@@ -1,25 +1,48 @@
 from qgis.core import (
+    QgsProcessing,
     QgsProcessingAlgorithm,
     QgsProcessingParameterVectorLayer,
     QgsProcessingParameterFeatureSink,
     QgsProcessingParameterBoolean,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterField,
+    QgsProcessingUtils,
     QgsField,
+    QgsFields,
     QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
     QgsGeometry,
     QgsPointXY,
+    QgsProject,
+    QgsVectorLayer,
+    QgsVectorLayerJoinInfo,
+    QgsWkbTypes,
     QgsProcessingContext,
     QgsProcessingFeedback,
     QgsProcessingException,
     QgsProcessingOutputVectorLayer,
 )
-from qgis import processing
 from PyQt5.QtCore import QVariant
-import processing
+import numpy as np
+
+from ..geometria import partes_wkb
+from .motor import ler_camada
+from .vertices import IndiceVertices
+
+#vértices acumulados antes de cada gravação no sink
+VERTICES_POR_LOTE = 50000
+
 class ValidateAndCorrectFeaturesAlgorithm(QgsProcessingAlgorithm):
 
     INPUT_LINE_LAYER = 'INPUT_LINE_LAYER'
+    INPUT_ELEMENT_LAYER = 'INPUT_ELEMENT_LAYER'
     OUTPUT_POINT_LAYER = 'OUTPUT_POINT_LAYER'
     CLASSIFY_FEATURES = 'CLASSIFY_FEATURES'
+    TOLERANCE = 'TOLERANCE'
+    OUTPUT_VERTICES_LAYER = 'OUTPUT_VERTICES_LAYER'
+    ID_FIELD = 'ID_FIELD'
+    JOIN_ATTRIBUTES = 'JOIN_ATTRIBUTES'
 
     def initAlgorithm(self, config=None):
         self.addParameter(
@@ -29,6 +52,14 @@ class ValidateAndCorrectFeaturesAlgorithm(QgsProcessingAlgorithm):
                 [QgsProcessing.TypeVectorLine]
             )
         )
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                self.INPUT_ELEMENT_LAYER,
+                'Camada de elementos viários (validação da regra 5)',
+                [QgsProcessing.TypeVectorPoint],
+                optional=True
+            )
+        )
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT_POINT_LAYER,
@@ -42,12 +73,61 @@ class ValidateAndCorrectFeaturesAlgorithm(QgsProcessingAlgorithm):
                 defaultValue=True
             )
         )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCE,
+                'Tolerância de coincidência de vértices (unidades do SRC)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.0,
+                minValue=0.0
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_VERTICES_LAYER,
+                'Vértices da Camada de Linha',
+                QgsProcessing.TypeVectorPoint
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.ID_FIELD,
+                'Atributo identificador da linha (se vazio, usa o id da feição)',
+                parentLayerParameterName=self.INPUT_LINE_LAYER,
+                type=QgsProcessingParameterField.Any,
+                optional=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.JOIN_ATTRIBUTES,
+                'Juntar os atributos da linha aos vértices (junção virtual)',
+                defaultValue=False
+            )
+        )
 
     def processAlgorithm(self, parameters, context, feedback):
         #Obter os parâmetros
         input_line_layer = self.parameterAsVectorLayer(parameters, self.INPUT_LINE_LAYER, context)
-        output_point_layer = self.parameterAsSink(parameters, self.OUTPUT_POINT_LAYER, context, input_line_layer.fields(), QgsWkbTypes.Point, input_line_layer.crs())
+        element_layer = self.parameterAsVectorLayer(parameters, self.INPUT_ELEMENT_LAYER, context)
+        (output_point_layer, dest_id) = self.parameterAsSink(parameters, self.OUTPUT_POINT_LAYER, context, input_line_layer.fields(), QgsWkbTypes.Point, input_line_layer.crs())
         classify_features = self.parameterAsBool(parameters, self.CLASSIFY_FEATURES, context)
+        tolerance = self.parameterAsDouble(parameters, self.TOLERANCE, context)
+        id_field = self.parameterAsString(parameters, self.ID_FIELD, context)
+        join_attributes = self.parameterAsBool(parameters, self.JOIN_ATTRIBUTES, context)
+
+        #A junção virtual precisa de um atributo da linha para casar com o id de origem dos vértices
+        if join_attributes and not id_field:
+            raise QgsProcessingException("Informe o atributo identificador da linha para juntar os atributos aos vértices.")
+        vertex_fields = QgsFields()
+        if id_field:
+            parent_field = QgsField(input_line_layer.fields().field(id_field))
+            parent_field.setName('id_linha')
+            vertex_fields.append(parent_field)
+        else:
+            vertex_fields.append(QgsField('id_linha', QVariant.LongLong))
+        vertex_fields.append(QgsField('vertice', QVariant.Int))
+        (vertices_sink, vertices_dest_id) = self.parameterAsSink(parameters, self.OUTPUT_VERTICES_LAYER, context, vertex_fields, QgsWkbTypes.Point, input_line_layer.crs())
 
         #Lista para armazenar as feições inválidas
         invalid_features = []
@@ -103,63 +183,117 @@ class ValidateAndCorrectFeaturesAlgorithm(QgsProcessingAlgorithm):
                 feedback.setProgress(int(current_count / total_count * 100))
 
         #Transformar a camada de linha em pontos
-        self.create_point_layer_from_line_layer(input_line_layer, output_point_layer)
+        total_vertices = self.create_point_layer_from_line_layer(input_line_layer, vertices_sink, id_field, feedback)
+        feedback.pushInfo(f"{total_vertices} vértices gravados a partir da camada de linha '{input_line_layer.name()}'.")
 
-        #Validar os pontos e plotar erros
-        self.validate_points()
+        #A junção usa a camada de vértices, que só existe depois que o sink é fechado, e a validação
+        #cria a camada de erros no projeto; guarda-se a origem da camada de linha, que pode ser temporária do contexto
+        self.vertices_info = (vertices_dest_id, input_line_layer.id(), input_line_layer.source(),
+                              input_line_layer.providerType(), input_line_layer.name(), id_field, join_attributes, tolerance,
+                              element_layer.id() if element_layer is not None else None)
 
         #Retorna resultados
-        return {self.OUTPUT_POINT_LAYER: output_point_layer}
-
-    def create_point_layer_from_line_layer(self, line_layer, output_point_layer):
-        #Cria uma nova camada de ponto
-        point_layer = QgsVectorLayer('Point?crs=' + line_layer.crs().authid(), output_point_layer.name(), 'memory')
-        point_layer_data = point_layer.dataProvider()
-
-        #Copia todos os campos da camada de linha para a camada de ponto
-        point_layer_data.addAttributes(line_layer.fields().toList())
-        point_layer.updateFields()
+        return {self.OUTPUT_POINT_LAYER: dest_id, self.OUTPUT_VERTICES_LAYER: vertices_dest_id}
+
+    def postProcessAlgorithm(self, context, feedback):
+        if not getattr(self, 'vertices_info', None):
+            return {}
+        vertices_dest_id, line_layer_id, source, provider_type, name, id_field, join_attributes, tolerance, element_layer_id = self.vertices_info
+        vertices_layer = QgsProcessingUtils.mapLayerFromString(vertices_dest_id, context)
+        if vertices_layer is None:
+            raise QgsProcessingException("Não foi possível abrir a camada de vértices.")
+        if join_attributes:
+            line_layer = self.project_line_layer(line_layer_id, source, provider_type, name, feedback)
+        else:
+            line_layer = QgsProcessingUtils.mapLayerFromString(line_layer_id, context) or QgsVectorLayer(source, name, provider_type)
+
+        #Junção virtual: os atributos da linha são lidos da camada de origem sob demanda,
+        #sem copiá-los para cada vértice
+        if join_attributes:
+            join = QgsVectorLayerJoinInfo()
+            join.setJoinLayer(line_layer)
+            join.setJoinFieldName(id_field)
+            join.setTargetFieldName('id_linha')
+            join.setPrefix('linha_')
+            join.setUsingMemoryCache(False)
+            vertices_layer.addJoin(join)
 
-        point_layer.startEditing()
+        #Validar os pontos e plotar erros
+        element_layer = QgsProcessingUtils.mapLayerFromString(element_layer_id, context) if element_layer_id else None
+        if element_layer is None:
+            feedback.pushInfo("Camada de elementos viários não informada: a regra 5 não foi verificada.")
+            return {}
+        self.validate_points(line_layer, element_layer, context, feedback, tolerance)
+        return {}
+
+    def project_line_layer(self, line_layer_id, source, provider_type, name, feedback):
+        #A camada da junção precisa viver tanto quanto a de vértices: usa a do projeto e, se a entrada
+        #veio de um arquivo (camada temporária do contexto), abre a mesma fonte e a adiciona ao projeto
+        line_layer = QgsProject.instance().mapLayer(line_layer_id)
+        if line_layer is not None:
+            return line_layer
+        line_layer = QgsVectorLayer(source, name, provider_type)
+        if not line_layer.isValid():
+            raise QgsProcessingException(f"Não foi possível abrir a camada de linha '{name}' para a junção.")
+        QgsProject.instance().addMapLayer(line_layer)
+        feedback.pushInfo(f"A camada de linha '{name}' foi adicionada ao projeto para a junção com os vértices.")
+        return line_layer
+
+    def create_point_layer_from_line_layer(self, line_layer, vertices_sink, id_field=None, feedback=None):
+        #Explode os vértices: as coordenadas de cada feição saem do WKB como um array NumPy e os
+        #pontos levam só o id da linha de origem e a posição do vértice, gravados no sink em lotes
+        request = QgsFeatureRequest()
+        if id_field:
+            request.setSubsetOfAttributes([id_field], line_layer.fields())
+        else:
+            request.setNoAttributes()
 
-        #Percorre todos os recursos na camada de linha
-        for feature in line_layer.getFeatures():
+        batch = []
+        total = 0
+        for feature in line_layer.getFeatures(request):
+            if feedback is not None and feedback.isCanceled():
+                break
             geometry = feature.geometry()
-            if geometry is None:
+            if geometry.isNull():
                 continue
-
-            #Obtém os vértices da linha
-            for vertex in geometry.vertices():
-                point_feature = QgsFeature(point_layer.fields())
-                point_feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(vertex.x(), vertex.y())))
-                point_feature.setAttributes(feature.attributes())
-                point_layer.addFeature(point_feature)
-
-        point_layer.commitChanges()
-
-        #Adiciona a nova camada de ponto ao projeto QGIS
-        QgsProject.instance().addMapLayer(point_layer)
-        print(f"Camada de ponto '{output_point_layer.name()}' criada a partir da camada de linha '{line_layer.name()}'.")
-
-    def validate_points(self):
-        #Obter as camadas
-        infra_elemento_viario_p = QgsProject.instance().mapLayersByName("dados_projeto4_2024 — infra_elemento_viario_p")[0]
-        infra_via_deslocamento_p = QgsProject.instance().mapLayersByName("infra_via_deslocamento_p")[0]
-
-        #Filtrar pontos da camada infra_elemento_viario_p com tipo = 203
-        infra_elemento_viario_p_203 = {feat.id(): feat for feat in infra_elemento_viario_p.getFeatures() if feat["tipo"] == 203}
-
-        #Verificar pontos que satisfazem a regra 3
-        common_ids = set(infra_elemento_viario_p_203.keys()) & {feat.id() for feat in infra_via_deslocamento_p.getFeatures()}
-
-        #Verificar pontos que satisfazem a regra 4
-        via_deslocamento_layer = QgsProject.instance().mapLayersByName("dados_projeto4_2024 — infra_via_deslocamento_l")[0]
-        vertices_via_deslocamento = {QgsPointXY(vertex.x(), vertex.y()) for feature in via_deslocamento_layer.getFeatures() for vertex in feature.geometry().vertices()}
-
-        valid_points = {feat_id for feat_id in common_ids if QgsPointXY(infra_elemento_viario_p_203[feat_id].geometry().asPoint()) in vertices_via_deslocamento}
+            if QgsWkbTypes.isCurvedType(geometry.wkbType()):
+                geometry = QgsGeometry(geometry.constGet().segmentize())
+            parts = partes_wkb(geometry.asWkb())
+            if not parts:
+                continue
+            parent_id = feature[id_field] if id_field else feature.id()
+            for vertex, (x, y) in enumerate(np.vstack(parts).tolist()):
+                point_feature = QgsFeature()
+                point_feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+                point_feature.setAttributes([parent_id, vertex])
+                batch.append(point_feature)
+            if len(batch) >= VERTICES_POR_LOTE:
+                vertices_sink.addFeatures(batch, QgsFeatureSink.FastInsert)
+                total += len(batch)
+                batch = []
+        if batch:
+            vertices_sink.addFeatures(batch, QgsFeatureSink.FastInsert)
+            total += len(batch)
+        return total
+
+    def validate_points(self, line_layer, infra_elemento_viario_p, context, feedback, tolerance=0.0):
+        #Regra 5: o elemento 203 sobre um vértice de via repete pistas, faixas e situação da via;
+        #as duas camadas são lidas no SRC dos elementos, onde a camada de erros é criada
+        crs = infra_elemento_viario_p.crs()
+        campos = ["nr_pistas", "nr_faixas", "situacao_fisica"]
+        vias = ler_camada('vias', line_layer.name(), line_layer, campos, crs, context, feedback)
+        elementos = ler_camada('elementos', infra_elemento_viario_p.name(), infra_elemento_viario_p, ["tipo"] + campos,
+                               crs, context, feedback)
+
+        #Os vértices explodidos das vias ficam em um índice NumPy, cada um rotulado pela sua linha:
+        #uma consulta só, com tolerância, dá a linha do vértice coincidente com cada elemento 203
+        vertices_via_deslocamento = IndiceVertices.de_wkbs(vias.wkbs, tolerance)
+        candidatos = [i for i, tipo in enumerate(elementos.coluna("tipo")) if tipo == 203 and elementos.wkbs[i]]
+        pontos = np.array([elementos.ponto(i) for i in candidatos], dtype=float).reshape(-1, 2)
+        linhas = vertices_via_deslocamento.rotulos(pontos)
 
         #Verificar atributos nr_pistas, nr_faixas e situacao_fisica
-        error_layer = QgsVectorLayer("Point?crs=" + infra_via_deslocamento_p.crs().authid(), "Erro_Regra_5", "memory")
+        error_layer = QgsVectorLayer("Point?crs=" + crs.authid(), "Erro_Regra_5", "memory")
         error_provider = error_layer.dataProvider()
 
         error_provider.addAttributes([QgsField("ID", QVariant.Int), QgsField("Classificacao", QVariant.String)])
@@ -167,22 +301,19 @@ class ValidateAndCorrectFeaturesAlgorithm(QgsProcessingAlgorithm):
 
         error_layer.startEditing()
 
-        for feat_id in valid_points:
-            feat_elemento = infra_elemento_viario_p_203[feat_id]
-            feat_deslocamento = infra_via_deslocamento_p.getFeature(feat_id)
-
-            if (feat_elemento["nr_pistas"] != feat_deslocamento["nr_pistas"] or
-                    feat_elemento["nr_faixas"] != feat_deslocamento["nr_faixas"] or
-                    feat_elemento["situacao_fisica"] != feat_deslocamento["situacao_fisica"]):
+        for i, linha in zip(candidatos, linhas.tolist()):
+            if linha < 0:
+                continue
+            if any(elementos.coluna(campo)[i] != vias.coluna(campo)[linha] for campo in campos):
                 error_feature = QgsFeature(error_layer.fields())
-                error_feature.setGeometry(feat_elemento.geometry())
-                error_feature["ID"] = feat_id
+                error_feature.setGeometry(elementos.geometria(i))
+                error_feature["ID"] = int(elementos.fids[i])
                 error_feature["Classificacao"] = "Erro na Regra 5"
                 error_layer.addFeature(error_feature)
 
         error_layer.commitChanges()
         QgsProject.instance().addMapLayer(error_layer)
-        print("Camada de erro 'Erro_Regra_5' criada com sucesso.")
+        feedback.pushInfo("Camada de erro 'Erro_Regra_5' criada com sucesso.")
 
     def tr(self, string):
         return QgsProcessingAlgorithm.tr(string)
@@ -206,9 +337,6 @@ class ValidateAndCorrectFeaturesAlgorithm(QgsProcessingAlgorithm):
     def shortHelpString(self):
         return self.tr("This algorithm validates and corrects features based on specified rules.")
 
-#Registrar o algoritmo para que seja exibido na interface de processamento do QGIS
-processing.registry().addAlgorithm(ValidateAndCorrectFeaturesAlgorithm())
-
 '''
 Código sem processing separado por regras:
 Regra 1: Verificar os campos "nr_pistas" e "nr_faixas"
@@ -1,27 +1,42 @@
 from qgis.core import (
+    QgsProcessing,
     QgsProcessingAlgorithm,
     QgsProcessingParameterVectorLayer,
     QgsProcessingParameterFeatureSink,
     QgsProcessingParameterBoolean,
+    QgsProcessingParameterNumber,
     QgsField,
+    QgsFields,
     QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
     QgsGeometry,
     QgsSpatialIndex,
     QgsPointXY,
+    QgsWkbTypes,
     QgsProcessingContext,
     QgsProcessingFeedback,
     QgsProcessingException,
     QgsProcessingOutputVectorLayer,
     QgsProject,
+    QgsVectorDataProvider,
 )
 from PyQt5.QtCore import QVariant
-from qgis import processing
+
+from ..geometria import empilhar_segmentos, partes_wkb
+from .motor import ler_camada
+from .sobreposicao import BarragensPreparadas, sobreposicao_entre_linhas
+
 class ValidateAndCreatePointsAlgorithm1(QgsProcessingAlgorithm):
 
     INPUT_MASSA_DAGUA_LAYER = 'INPUT_MASSA_DAGUA_LAYER'
     INPUT_BARRAGEM_LAYER = 'INPUT_BARRAGEM_LAYER'
+    INPUT_VIA_DESLOCAMENTO_LAYER = 'INPUT_VIA_DESLOCAMENTO_LAYER'
     OUTPUT_POINT_LAYER = 'OUTPUT_POINT_LAYER'
     CLASSIFY_FEATURES = 'CLASSIFY_FEATURES'
+    TOLERANCE = 'TOLERANCE'
+    OUTPUT_CLASSIFICATION_LAYER = 'OUTPUT_CLASSIFICATION_LAYER'
+    WRITE_CLASSIFICATION = 'WRITE_CLASSIFICATION'
 
     def initAlgorithm(self, config=None):
         self.addParameter(
@@ -38,6 +53,13 @@ class ValidateAndCreatePointsAlgorithm1(QgsProcessingAlgorithm):
                 [QgsProcessing.TypeVectorLine]
             )
         )
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                self.INPUT_VIA_DESLOCAMENTO_LAYER,
+                'Via de Deslocamento Layer',
+                [QgsProcessing.TypeVectorLine]
+            )
+        )
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT_POINT_LAYER,
@@ -51,104 +73,145 @@ class ValidateAndCreatePointsAlgorithm1(QgsProcessingAlgorithm):
                 defaultValue=True
             )
         )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCE,
+                'Tolerância de sobreposição (unidades do SRC)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.000001,
+                minValue=0.0
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT_CLASSIFICATION_LAYER,
+                'Classificação das Massas d\'água',
+                QgsProcessing.TypeVectorPolygon,
+                optional=True,
+                createByDefault=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.WRITE_CLASSIFICATION,
+                'Gravar a classificação também na camada de massa d\'água',
+                defaultValue=False
+            )
+        )
 
     def processAlgorithm(self, parameters, context, feedback):
         #Obter os parâmetros
         massa_dagua_layer = self.parameterAsVectorLayer(parameters, self.INPUT_MASSA_DAGUA_LAYER, context)
         barragem_layer = self.parameterAsVectorLayer(parameters, self.INPUT_BARRAGEM_LAYER, context)
-        output_point_layer = self.parameterAsSink(parameters, self.OUTPUT_POINT_LAYER, context, QgsFields(), QgsWkbTypes.Point, massa_dagua_layer.crs())
+        via_deslocamento_layer = self.parameterAsVectorLayer(parameters, self.INPUT_VIA_DESLOCAMENTO_LAYER, context)
+        fields = QgsFields()
+        fields.append(QgsField('id', QVariant.Int))
+        fields.append(QgsField('Classificação', QVariant.String))
+        (output_point_layer, dest_id) = self.parameterAsSink(parameters, self.OUTPUT_POINT_LAYER, context, fields, QgsWkbTypes.Point, massa_dagua_layer.crs())
         classify_features = self.parameterAsBool(parameters, self.CLASSIFY_FEATURES, context)
+        tolerance = self.parameterAsDouble(parameters, self.TOLERANCE, context)
+        write_classification = self.parameterAsBool(parameters, self.WRITE_CLASSIFICATION, context)
+        if write_classification and massa_dagua_layer.isEditable():
+            raise QgsProcessingException(f"A camada '{massa_dagua_layer.name()}' está em edição; salve ou descarte as edições antes de gravar a classificação.")
+        classification_fields = QgsFields()
+        classification_fields.append(QgsField('id', QVariant.LongLong))
+        classification_fields.append(QgsField('Classificacao', QVariant.String))
+        (classification_sink, classification_dest_id) = self.parameterAsSink(
+            parameters, self.OUTPUT_CLASSIFICATION_LAYER, context, classification_fields,
+            massa_dagua_layer.wkbType(), massa_dagua_layer.crs())
 
         #Validar bordas de massa d'água
-        invalid_features = self.validate_borda_intersections(massa_dagua_layer, barragem_layer, feedback)
+        invalid_features = self.validate_borda_intersections(massa_dagua_layer, barragem_layer, context, feedback, tolerance,
+                                                             write_classification, classification_sink)
 
         #Criar pontos conforme condições da barragem
-        self.create_points_from_barragem(barragem_layer, output_point_layer, classify_features)
+        self.create_points_from_barragem(barragem_layer, via_deslocamento_layer, output_point_layer, classify_features,
+                                         massa_dagua_layer.crs(), context, feedback, tolerance)
 
         #Retorna resultados
-        return {self.OUTPUT_POINT_LAYER: output_point_layer}
-
-    def validate_borda_intersections(self, massa_dagua_layer, barragem_layer, feedback):
-        invalid_features = []
-
-        barragem_index = QgsSpatialIndex(barragem_layer.getFeatures())
-
-        massa_dagua_layer.startEditing()
-        classificacao_idx = massa_dagua_layer.fields().indexOf("Classificacao")
-
-        if classificacao_idx == -1:
-            new_field = QgsField("Classificacao", QVariant.String)
-            massa_dagua_layer.dataProvider().addAttributes([new_field])
-            massa_dagua_layer.updateFields()
-            classificacao_idx = massa_dagua_layer.fields().indexOf("Classificacao")
-
+        results = {self.OUTPUT_POINT_LAYER: dest_id}
+        if classification_sink is not None:
+            results[self.OUTPUT_CLASSIFICATION_LAYER] = classification_dest_id
+        return results
+
+    def validate_borda_intersections(self, massa_dagua_layer, barragem_layer, context, feedback, tolerance=0.0,
+                                     write_to_layer=False, classification_sink=None):
+        #As barragens são lidas uma única vez e ficam preparadas (segmentos em arrays com grade de consulta)
+        barragens = BarragensPreparadas(self.line_segments(barragem_layer, massa_dagua_layer.crs(), context, feedback)[0], tolerance)
+
+        #A classificação fica num mapa id -> valor e é gravada de uma vez no fim, sem buffer de edição
+        classificacao = {}
         total_count = massa_dagua_layer.featureCount()
-        step = total_count / 100 if total_count > 100 else 1
         current_count = 0
 
-        for massa_dagua_feature in massa_dagua_layer.getFeatures():
+        for massa_dagua_feature in massa_dagua_layer.getFeatures(QgsFeatureRequest().setNoAttributes()):
             if feedback.isCanceled():
                 break
 
+            #A borda é testada em blocos de segmentos e o teste para no primeiro trecho sobre uma barragem
             massa_dagua_geom = massa_dagua_feature.geometry()
-            vertices = massa_dagua_geom.vertices()
-
-            invalid = False
-            for vertex in vertices:
-                if feedback.isCanceled():
-                    break
-
-                point = QgsGeometry.fromPointXY(QgsPointXY(vertex))
-                ids = barragem_index.intersects(point.boundingBox())
-
-                if ids:
-                    for fid in ids:
-                        barragem_feature = barragem_layer.getFeature(fid)
-                        barragem_geom = barragem_feature.geometry()
-                        if point.within(barragem_geom):
-                            invalid = True
-                            break
-                if invalid:
-                    break
-
-            if invalid:
-                invalid_features.append(massa_dagua_feature)
-                massa_dagua_feature.setAttribute(classificacao_idx, "erro borda")
-                print(f"Erro de borda encontrado: Feature ID {massa_dagua_feature.id()}")
-            else:
-                massa_dagua_feature.setAttribute(classificacao_idx, "Correto")
-
-            massa_dagua_layer.updateFeature(massa_dagua_feature)
+            if QgsWkbTypes.isCurvedType(massa_dagua_geom.wkbType()):
+                massa_dagua_geom = QgsGeometry(massa_dagua_geom.constGet().segmentize())
+            partes = partes_wkb(massa_dagua_geom.asWkb()) if not massa_dagua_geom.isNull() else []
+            comprimento, _ = barragens.borda_sobreposta(partes)
+            classificacao[massa_dagua_feature.id()] = "erro borda" if comprimento > 0 else "Correto"
+
+            if classification_sink is not None:
+                classification_feature = QgsFeature()
+                classification_feature.setGeometry(massa_dagua_feature.geometry())
+                classification_feature.setAttributes([massa_dagua_feature.id(), classificacao[massa_dagua_feature.id()]])
+                classification_sink.addFeature(classification_feature, QgsFeatureSink.FastInsert)
 
             #Atualizar progresso a cada feição processada
             current_count += 1
-            feedback.setProgress(int(current_count / total_count * 100))
+            if total_count > 0:
+                feedback.setProgress(int(current_count / total_count * 100))
 
-        massa_dagua_layer.commitChanges()
+        if write_to_layer and not feedback.isCanceled():
+            self.write_classification(massa_dagua_layer, classificacao)
 
+        invalid_features = [fid for fid, valor in classificacao.items() if valor == "erro borda"]
         if invalid_features:
-            print(f"Foram encontradas {len(invalid_features)} bordas inválidas.")
+            feedback.pushInfo(f"Foram encontradas {len(invalid_features)} bordas inválidas.")
         else:
-            print("Não há bordas inválidas para atualizar.")
+            feedback.pushInfo("Não há bordas inválidas.")
 
         return invalid_features
 
-    def create_points_from_barragem(self, barragem_layer, output_point_layer, classify_features):
-        #Obter IDs sobrepostos
-        sobrepostos_ids = set()
-        via_deslocamento_layer = QgsProject.instance().mapLayersByName('dados_projeto4_2024 — infra_via_deslocamento_l')[0]
-        via_deslocamento_ids = set(feature.id() for feature in via_deslocamento_layer.getFeatures())
-
-        for feature in barragem_layer.getFeatures():
-            if feature.id() in via_deslocamento_ids:
-                sobrepostos_ids.add(feature.id())
-
-        #Criar pontos no output
-        fields = QgsFields()
-        fields.append(QgsField('id', QVariant.Int))
-        fields.append(QgsField('Classificação', QVariant.String))
-
-        for feature in barragem_layer.getFeatures():
+    def write_classification(self, layer, classificacao):
+        #Todas as classificações vão ao provedor numa única chamada a changeAttributeValues. Com a
+        #camada em edição o provedor ficaria fora do buffer, e feições novas ainda não têm id no provedor
+        if layer.isEditable():
+            raise QgsProcessingException(f"A camada '{layer.name()}' está em edição; salve ou descarte as edições antes de gravar a classificação.")
+        provider = layer.dataProvider()
+        if not provider.capabilities() & QgsVectorDataProvider.ChangeAttributeValues:
+            raise QgsProcessingException(f"A camada '{layer.name()}' não permite alterar atributos; use a saída de classificação.")
+        classificacao_idx = provider.fields().indexOf("Classificacao")
+        if classificacao_idx == -1:
+            provider.addAttributes([QgsField("Classificacao", QVariant.String)])
+            layer.updateFields()
+            classificacao_idx = provider.fields().indexOf("Classificacao")
+        if not provider.changeAttributeValues({fid: {classificacao_idx: valor} for fid, valor in classificacao.items()}):
+            raise QgsProcessingException(f"Não foi possível gravar a classificação na camada '{layer.name()}'.")
+
+    def line_segments(self, line_layer, crs, context, feedback):
+        #Segmentos (x1, y1, x2, y2) de todas as linhas da camada no SRC informado, o índice
+        #da feição de cada segmento e os ids das feições, com a mesma leitura do motor de regras
+        camada = ler_camada('linhas', line_layer.name(), line_layer, [], crs, context, feedback)
+        segmentos = empilhar_segmentos((i, parte) for i, partes in enumerate(camada.partes()) for parte in partes)
+        return segmentos.xy, segmentos.rotulo, camada.fids.tolist()
+
+    def create_points_from_barragem(self, barragem_layer, via_deslocamento_layer, output_point_layer, classify_features,
+                                    crs, context, feedback, tolerance=0.0):
+        #Obter as barragens sobrepostas a vias: junção linha sobre linha, com os segmentos das vias
+        #em uma árvore STR e o comprimento sobreposto calculado para todos os pares candidatos de uma vez
+        barragem_segments, barragem_labels, barragem_ids = self.line_segments(barragem_layer, crs, context, feedback)
+        via_segments, _, _ = self.line_segments(via_deslocamento_layer, crs, context, feedback)
+        comprimento = sobreposicao_entre_linhas(barragem_segments, barragem_labels, len(barragem_ids), via_segments, tolerance)
+        sobrepostos_ids = {fid for fid, sobreposto in zip(barragem_ids, comprimento) if sobreposto > 0}
+
+        request = QgsFeatureRequest().setDestinationCrs(crs, context.transformContext())
+        for feature in barragem_layer.getFeatures(request):
             #Adicionar pontos conforme condições
             if feature.id() in sobrepostos_ids and feature['sobreposto_transportes'] != 1:
                 self.add_point_feature(output_point_layer, feature, 'Erro 7')
@@ -192,9 +255,6 @@ class ValidateAndCreatePointsAlgorithm1(QgsProcessingAlgorithm):
     def shortHelpString(self):
         return self.tr("This algorithm validates borders and creates points based on specified conditions.")
 
-#Registrar o algoritmo para que seja exibido na interface de processamento do QGIS
-processing.registry().addAlgorithm(ValidateAndCreatePointsAlgorithm1())
-
 '''Código sem o uso de processing separado por regras
 Regra 6: Verificar se a borda da massa d'água está sobreposta a uma barragem
 
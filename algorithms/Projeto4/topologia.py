@@ -0,0 +1,99 @@
+#Grafo topológico de uma rede de linhas (vias, drenagem), com as adjacências em arrays CSR.
+import numpy as np
+
+from ..geometria import agrupar_pontos, componentes_conexos
+from .vertices import IndiceVertices
+
+
+class GrafoRede(object):
+    """Nós (k, 2) e arestas (origem -> destino, no sentido de digitalização) de
+    uma rede de linhas. rotulo é a feição de origem de cada aresta."""
+
+    def __init__(self, no_xy, origem, destino, rotulo, tolerancia=0.0):
+        self.no_xy = np.asarray(no_xy, dtype=float).reshape(-1, 2)
+        self.origem = np.asarray(origem, dtype=np.int64)
+        self.destino = np.asarray(destino, dtype=np.int64)
+        self.rotulo = np.asarray(rotulo, dtype=np.int64)
+        self.tolerancia = max(float(tolerancia), 0.0)
+        n = len(self.no_xy)
+        #cada aresta aparece nas listas das duas pontas (um laço aparece duas vezes no mesmo nó)
+        nos = np.concatenate((self.origem, self.destino))
+        outros = np.concatenate((self.destino, self.origem))
+        arestas = np.tile(np.arange(len(self.origem), dtype=np.int64), 2)
+        ordem = np.argsort(nos, kind='stable')
+        self.grau = np.bincount(nos, minlength=n).astype(np.int64)
+        self.inicio = np.r_[0, np.cumsum(self.grau)].astype(np.int64)
+        self.vizinhos = outros[ordem]
+        self.arestas_nos = arestas[ordem]
+        self._componentes = None
+        self._indice = None
+
+    @classmethod
+    def de_linhas(cls, linhas, tolerancia=0.0):
+        """Grafo a partir de um iterável de (rotulo, coords (n, 2)); linhas com
+        menos de dois vértices são ignoradas."""
+        pontas, rotulos = [], []
+        for rotulo, coords in linhas:
+            if len(coords) < 2:
+                continue
+            pontas.append((coords[0, 0], coords[0, 1], coords[-1, 0], coords[-1, 1]))
+            rotulos.append(rotulo)
+        pontas = np.asarray(pontas, dtype=float).reshape(-1, 4)
+        m = len(pontas)
+        xy = np.vstack((pontas[:, :2], pontas[:, 2:]))
+        no = agrupar_pontos(xy[:, 0], xy[:, 1], max(float(tolerancia), 0.0))
+        k = int(no.max()) + 1 if m else 0
+        #o nó fica na posição da primeira ponta do seu grupo
+        no_xy = np.empty((k, 2))
+        no_xy[no[::-1]] = xy[::-1]
+        return cls(no_xy, no[:m], no[m:], np.asarray(rotulos, dtype=np.int64), tolerancia)
+
+    def __len__(self):
+        return len(self.no_xy)
+
+    @property
+    def quantidade_arestas(self):
+        return len(self.origem)
+
+    def vizinhos_de(self, no):
+        """Nós ligados ao nó (com repetição se houver arestas paralelas)."""
+        return self.vizinhos[self.inicio[no]:self.inicio[no + 1]]
+
+    def arestas_de(self, no):
+        """Arestas que chegam ou saem do nó."""
+        return self.arestas_nos[self.inicio[no]:self.inicio[no + 1]]
+
+    def pontas_soltas(self):
+        """Nós de grau 1: fim de linha que não encosta em nenhuma outra."""
+        return np.flatnonzero(self.grau == 1)
+
+    def componentes(self):
+        """Componente conexo de cada nó, numerado de 0 a c - 1."""
+        if self._componentes is None:
+            rotulo = componentes_conexos(len(self), self.origem, self.destino)
+            self._componentes = np.unique(rotulo, return_inverse=True)[1].reshape(-1)
+        return self._componentes
+
+    def componente_aresta(self):
+        """Componente conexo de cada aresta."""
+        return self.componentes()[self.origem]
+
+    def tamanho_componentes(self):
+        """Número de arestas de cada componente."""
+        componentes = self.componentes()
+        return np.bincount(self.componente_aresta(), minlength=int(componentes.max()) + 1 if len(componentes) else 0)
+
+    def agrupar_arestas(self, arestas):
+        """Cadeia de cada aresta informada (ligadas por nós comuns) e o número de arestas de cada cadeia."""
+        arestas = np.asarray(arestas, dtype=np.int64)
+        if len(arestas) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        rotulo = componentes_conexos(len(self), self.origem[arestas], self.destino[arestas])
+        cadeia = np.unique(rotulo[self.origem[arestas]], return_inverse=True)[1].reshape(-1)
+        return cadeia, np.bincount(cadeia)
+
+    def localizar(self, pontos):
+        """Nó a até a tolerância de cada ponto (o mais próximo), ou -1."""
+        if self._indice is None:
+            self._indice = IndiceVertices(self.no_xy, tolerancia=self.tolerancia)
+        return self._indice.rotulos(pontos)
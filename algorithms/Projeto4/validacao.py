@@ -0,0 +1,130 @@
+from qgis.core import (
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterNumber,
+    QgsProcessingException,
+    QgsFeature,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from .motor import MotorRegras
+from .regras import REGRAS
+
+class ValidarFolha(QgsProcessingAlgorithm):
+
+    VIAS = 'VIAS'
+    ELEMENTOS = 'ELEMENTOS'
+    DRENAGEM = 'DRENAGEM'
+    BARRAGENS = 'BARRAGENS'
+    MASSAS_DAGUA = 'MASSAS_DAGUA'
+    TOLERANCIA = 'TOLERANCIA'
+    OUTPUT = 'OUTPUT'
+
+    #parâmetro de cada papel usado pelas regras
+    PAPEIS = {
+        'vias': VIAS,
+        'elementos': ELEMENTOS,
+        'drenagem': DRENAGEM,
+        'barragens': BARRAGENS,
+        'massas': MASSAS_DAGUA,
+    }
+
+    def initAlgorithm(self, config=None):
+        camadas = [
+            (self.VIAS, 'Via de Deslocamento (infra_via_deslocamento_l)', QgsProcessing.TypeVectorLine),
+            (self.ELEMENTOS, 'Elemento Viário (infra_elemento_viario_p)', QgsProcessing.TypeVectorPoint),
+            (self.DRENAGEM, 'Trecho de Drenagem (elemnat_trecho_drenagem_l)', QgsProcessing.TypeVectorLine),
+            (self.BARRAGENS, 'Barragem (infra_barragem_l)', QgsProcessing.TypeVectorLine),
+            (self.MASSAS_DAGUA, 'Massa d\'água (cobter_massa_dagua_a)', QgsProcessing.TypeVectorPolygon),
+        ]
+        for nome, descricao, tipo in camadas:
+            self.addParameter(
+                QgsProcessingParameterFeatureSource(
+                    nome,
+                    descricao,
+                    [tipo],
+                    optional=True
+                )
+            )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCIA,
+                'Tolerância de coincidência (unidades do SRC)',
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.000001,
+                minValue=0.0
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                'Erros de Validação',
+                QgsProcessing.TypeVectorPoint
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        #Camadas informadas, por papel; as regras que dependem de camadas ausentes são puladas
+        fontes = {}
+        for papel, parametro in self.PAPEIS.items():
+            fonte = self.parameterAsSource(parameters, parametro, context)
+            if fonte is not None:
+                fontes[papel] = (fonte.sourceName(), fonte)
+        if not fontes:
+            raise QgsProcessingException('Informe pelo menos uma camada para validar.')
+        tolerancia = self.parameterAsDouble(parameters, self.TOLERANCIA, context)
+        crs = next(iter(fontes.values()))[1].sourceCrs()
+
+        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT, context,
+                                               campos_erros(), QgsWkbTypes.Point, crs)
+
+        motor = MotorRegras(REGRAS)
+        quantidade = 0
+        for erro in motor.executar(fontes, crs, tolerancia, context, feedback):
+            error_feature = QgsFeature()
+            if erro.x is not None:
+                error_feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(erro.x, erro.y)))
+            error_feature.setAttributes([erro.regra, fontes[erro.papel][0], erro.fid, erro.descricao])
+            sink.addFeature(error_feature, QgsFeatureSink.FastInsert)
+            quantidade += 1
+        feedback.pushInfo(f'{quantidade} erros encontrados.')
+
+        return {self.OUTPUT: dest_id}
+
+    def tr(self, string):
+        return QgsProcessingAlgorithm.tr(string)
+
+    def createInstance(self):
+        return ValidarFolha()
+
+    def name(self):
+        return 'validar_folha'
+
+    def displayName(self):
+        return self.tr('Validar Folha')
+
+    def group(self):
+        return self.tr('Projeto 4')
+
+    def groupId(self):
+        return 'projeto4'
+
+    def shortHelpString(self):
+        return self.tr("Avalia as regras 1 a 7 lendo cada camada uma única vez e grava todos os erros em uma só camada de pontos.")
+
+#campos da camada de erros consolidada
+def campos_erros():
+    fields = QgsFields()
+    fields.append(QgsField('regra', QVariant.String))
+    fields.append(QgsField('camada', QVariant.String))
+    fields.append(QgsField('feicao', QVariant.LongLong))
+    fields.append(QgsField('erro', QVariant.String))
+    return fields
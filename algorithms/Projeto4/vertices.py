@@ -0,0 +1,102 @@
+#Índice de vértices em grade para testes de coincidência com tolerância.
+import numpy as np
+
+from ..geometria import CELULAS_POR_EIXO, partes_wkb
+
+#vizinhança 3 x 3 de uma célula
+VIZINHOS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+class IndiceVertices(object):
+    """Vértices (n, 2) com o rótulo da feição de origem de cada um."""
+
+    def __init__(self, xy, rotulo=None, tolerancia=0.0):
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        self.tolerancia = max(float(tolerancia), 0.0)
+        if rotulo is None:
+            rotulo = np.arange(len(xy), dtype=np.int64)
+        rotulo = np.asarray(rotulo, dtype=np.int64)
+        if len(xy):
+            self.origem = xy.min(axis=0)
+            extensao = float((xy.max(axis=0) - self.origem).max())
+        else:
+            self.origem = np.zeros(2)
+            extensao = 0.0
+        #com tolerância zero a célula só serve para separar os vértices; o teste é de igualdade
+        if self.tolerancia > 0:
+            self.lado = max(self.tolerancia, extensao / CELULAS_POR_EIXO)
+        else:
+            self.lado = extensao / max(np.sqrt(len(xy)), 1.0) or 1.0
+        ix, iy = self.celulas(xy)
+        #folga de uma célula em cada lado para as vizinhas nunca saírem da faixa
+        self.colunas = int(iy.max()) + 3 if len(xy) else 3
+        chave = self.chave(ix, iy)
+        ordem = np.argsort(chave, kind='stable')
+        self.chaves = chave[ordem]
+        self.xy = xy[ordem]
+        self.rotulo = rotulo[ordem]
+
+    @classmethod
+    def de_wkbs(cls, wkbs, tolerancia=0.0):
+        """Índice com todos os vértices de uma sequência de WKB; o rótulo é a
+        posição do WKB na sequência."""
+        blocos, rotulos = [], []
+        for i, wkb in enumerate(wkbs):
+            for parte in (partes_wkb(wkb) if wkb else []):
+                blocos.append(parte)
+                rotulos.append(np.full(len(parte), i, dtype=np.int64))
+        if not blocos:
+            return cls(np.empty((0, 2)), np.empty(0, dtype=np.int64), tolerancia)
+        return cls(np.vstack(blocos), np.concatenate(rotulos), tolerancia)
+
+    def __len__(self):
+        return len(self.xy)
+
+    def celulas(self, xy):
+        return (np.floor((xy[:, 0] - self.origem[0]) / self.lado).astype(np.int64) + 1,
+                np.floor((xy[:, 1] - self.origem[1]) / self.lado).astype(np.int64) + 1)
+
+    def chave(self, ix, iy):
+        return ix * self.colunas + iy
+
+    def mais_proximo(self, pontos):
+        """Índice (na ordem interna) e distância do vértice mais próximo de cada ponto, dentro da tolerância;
+        -1 e infinito quando não há."""
+        pontos = np.asarray(pontos, dtype=float).reshape(-1, 2)
+        n = len(pontos)
+        indice = np.full(n, -1, dtype=np.int64)
+        distancia = np.full(n, np.inf)
+        if n == 0 or len(self.xy) == 0:
+            return indice, distancia
+        ix, iy = self.celulas(pontos)
+        #pontos fora da faixa de colunas não têm vizinhos e não podem gerar chaves de outras colunas
+        dentro = (iy >= 0) & (iy < self.colunas)
+        for dx, dy in VIZINHOS:
+            chave = self.chave(ix + dx, iy + dy)
+            inicio = np.searchsorted(self.chaves, chave, side='left')
+            fim = np.searchsorted(self.chaves, chave, side='right')
+            quantidade = np.where(dentro & (iy + dy >= 0) & (iy + dy < self.colunas), fim - inicio, 0)
+            if not quantidade.any():
+                continue
+            #um par (ponto, vértice) para cada vértice das células consultadas
+            ponto = np.repeat(np.arange(n), quantidade)
+            deslocamento = np.arange(len(ponto)) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+            vertice = np.repeat(inicio, quantidade) + deslocamento
+            d = np.hypot(self.xy[vertice, 0] - pontos[ponto, 0], self.xy[vertice, 1] - pontos[ponto, 1])
+            melhor = np.full(n, np.inf)
+            np.minimum.at(melhor, ponto, d)
+            escolhido = (d == melhor[ponto]) & (d < distancia[ponto]) & (d <= self.tolerancia)
+            indice[ponto[escolhido]] = vertice[escolhido]
+            distancia[ponto[escolhido]] = d[escolhido]
+        return indice, distancia
+
+    def contem(self, pontos):
+        """Máscara dos pontos que têm algum vértice a até a tolerância."""
+        return self.mais_proximo(pontos)[0] >= 0
+
+    def rotulos(self, pontos):
+        """Rótulo do vértice mais próximo de cada ponto (dentro da tolerância), ou -1."""
+        indice, _ = self.mais_proximo(pontos)
+        if len(self.rotulo) == 0:
+            return indice
+        return np.where(indice >= 0, self.rotulo[np.maximum(indice, 0)], -1)
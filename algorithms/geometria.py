@@ -0,0 +1,483 @@
+#Rotinas vetorizadas (NumPy) de geometria compartilhadas pelos projetos, sobre WKB ou arrays de coordenadas.
+import struct
+
+import numpy as np
+
+
+#tipos WKB lineares suportados (código ISO sem a dimensão)
+WKB_PONTO = 1
+WKB_LINHA = 2
+WKB_POLIGONO = 3
+WKB_MULTIPONTO = 4
+WKB_MULTILINHA = 5
+WKB_MULTIPOLIGONO = 6
+WKB_COLECAO = 7
+
+
+def tipo_wkb(wkb):
+    """Retorna o código do tipo base (1 a 7) de um WKB, ignorando Z/M e SRID."""
+    buf = bytes(wkb)
+    ordem = '<' if buf[0] == 1 else '>'
+    tipo, = struct.unpack_from(ordem + 'I', buf, 1)
+    return (tipo & 0x0FFFFFFF) % 1000
+
+
+def partes_wkb(wkb):
+    """Lê um WKB (ISO ou EWKB) e retorna a lista de arrays (n, 2) com as
+    coordenadas XY de cada ponto, linha ou anel, na ordem em que aparecem."""
+    partes = []
+    buf = bytes(wkb)
+    if buf:
+        _ler_wkb(buf, 0, partes)
+    return partes
+
+
+def _ler_wkb(buf, pos, partes):
+    ordem = '<' if buf[pos] == 1 else '>'
+    tipo, = struct.unpack_from(ordem + 'I', buf, pos + 1)
+    pos += 5
+    if tipo & 0x20000000:
+        #EWKB com SRID embutido
+        pos += 4
+    base = tipo & 0x0FFFFFFF
+    dim = 2
+    if tipo & 0x80000000 or base // 1000 in (1, 3):
+        dim += 1
+    if tipo & 0x40000000 or base // 1000 in (2, 3):
+        dim += 1
+    base = base % 1000
+
+    if base == WKB_PONTO:
+        coords = np.frombuffer(buf, dtype=ordem + 'f8', count=dim, offset=pos)
+        if not np.isnan(coords[:2]).all():
+            partes.append(coords[:2].reshape(1, 2).astype(np.float64))
+        return pos + 8 * dim
+    if base == WKB_LINHA:
+        return _ler_sequencia(buf, pos, ordem, dim, partes)
+    if base == WKB_POLIGONO:
+        n_aneis, = struct.unpack_from(ordem + 'I', buf, pos)
+        pos += 4
+        for _ in range(n_aneis):
+            pos = _ler_sequencia(buf, pos, ordem, dim, partes)
+        return pos
+    if base in (WKB_MULTIPONTO, WKB_MULTILINHA, WKB_MULTIPOLIGONO, WKB_COLECAO):
+        n_geoms, = struct.unpack_from(ordem + 'I', buf, pos)
+        pos += 4
+        for _ in range(n_geoms):
+            pos = _ler_wkb(buf, pos, partes)
+        return pos
+    raise ValueError(f"Tipo WKB {base} não suportado (geometrias curvas devem ser segmentadas antes)")
+
+
+def _ler_sequencia(buf, pos, ordem, dim, partes):
+    n, = struct.unpack_from(ordem + 'I', buf, pos)
+    pos += 4
+    coords = np.frombuffer(buf, dtype=ordem + 'f8', count=n * dim, offset=pos)
+    partes.append(coords.reshape(n, dim)[:, :2].astype(np.float64))
+    return pos + 8 * n * dim
+
+
+def anel_fechado(coords):
+    return len(coords) >= 4 and coords[0, 0] == coords[-1, 0] and coords[0, 1] == coords[-1, 1]
+
+
+class Segmentos(object):
+    """Segmentos empilhados: xy (m, 4), rotulo (feição), parte (linha ou anel) e ordem dentro da parte."""
+
+    def __init__(self, xy, rotulo, parte, ordem, tamanho_parte, parte_fechada):
+        self.xy = xy
+        self.rotulo = rotulo
+        self.parte = parte
+        self.ordem = ordem
+        self.tamanho_parte = tamanho_parte
+        self.parte_fechada = parte_fechada
+
+    def __len__(self):
+        return len(self.xy)
+
+    def caixas(self):
+        xy = self.xy
+        return np.column_stack((np.minimum(xy[:, 0], xy[:, 2]), np.minimum(xy[:, 1], xy[:, 3]),
+                                np.maximum(xy[:, 0], xy[:, 2]), np.maximum(xy[:, 1], xy[:, 3])))
+
+    def adjacentes(self, i, j):
+        """Máscara dos pares (i, j) que são segmentos consecutivos da mesma parte
+        (e que portanto compartilham legitimamente um vértice)."""
+        mesma = self.parte[i] == self.parte[j]
+        delta = np.abs(self.ordem[i] - self.ordem[j])
+        n = self.tamanho_parte[self.parte[i]]
+        fechada = self.parte_fechada[self.parte[i]]
+        return mesma & ((delta == 1) | (fechada & (delta == n - 1)))
+
+
+def empilhar_segmentos(linhas):
+    """Monta um Segmentos a partir de um iterável de (rotulo, coords (n, 2))."""
+    blocos, rotulos, partes, ordens = [], [], [], []
+    tamanhos, fechadas = [], []
+    for rotulo, coords in linhas:
+        if len(coords) < 2:
+            continue
+        k = len(tamanhos)
+        n = len(coords) - 1
+        blocos.append(np.hstack((coords[:-1], coords[1:])))
+        rotulos.append(np.full(n, rotulo, dtype=np.int64))
+        partes.append(np.full(n, k, dtype=np.int64))
+        ordens.append(np.arange(n, dtype=np.int64))
+        tamanhos.append(n)
+        fechadas.append(anel_fechado(coords))
+    if not blocos:
+        vazio = np.empty(0, dtype=np.int64)
+        return Segmentos(np.empty((0, 4)), vazio, vazio, vazio, vazio, np.empty(0, dtype=bool))
+    return Segmentos(np.vstack(blocos), np.concatenate(rotulos), np.concatenate(partes),
+                     np.concatenate(ordens), np.asarray(tamanhos, dtype=np.int64),
+                     np.asarray(fechadas, dtype=bool))
+
+
+def tamanho_celula_padrao(caixas):
+    """Lado de célula da grade uniforme: a maior dimensão média das caixas, para
+    que cada caixa ocupe poucas células e cada célula tenha poucas caixas."""
+    if len(caixas) == 0:
+        return 1.0
+    lado = np.mean(np.maximum(caixas[:, 2] - caixas[:, 0], caixas[:, 3] - caixas[:, 1]))
+    if not np.isfinite(lado) or lado <= 0:
+        extensao = max(caixas[:, 2].max() - caixas[:, 0].min(), caixas[:, 3].max() - caixas[:, 1].min())
+        lado = extensao / max(np.sqrt(len(caixas)), 1.0)
+    return float(lado) if lado > 0 else 1.0
+
+
+def pares_candidatos(caixas, tamanho_celula=None, grupo=None):
+    """Pares (i, j), i < j, de caixas que se sobrepõem, pelo IndiceCaixas; com grupo, só entre grupos
+    diferentes."""
+    caixas = np.asarray(caixas, dtype=float).reshape(-1, 4)
+    i, j = IndiceCaixas(caixas, tamanho_celula).pares(caixas)
+    #a junção da camada com ela mesma devolve cada par nos dois sentidos e cada caixa com ela mesma
+    manter = i < j
+    if grupo is not None:
+        manter &= grupo[i] != grupo[j]
+    return i[manter], j[manter]
+
+
+#deslocamento e faixa das chaves absolutas de célula usadas por IndiceCaixas
+DESLOCAMENTO_CELULA = 2 ** 30
+FAIXA_CELULA = 2 ** 31
+
+
+#células que uma caixa pode ocupar na grade; as maiores vão para uma ArvoreSTR,
+#senão um segmento longo contra células pequenas gera milhões de pares
+MAXIMO_CELULAS_CAIXA = 64
+
+
+class IndiceCaixas(object):
+    """Grade uniforme fixa sobre um conjunto de caixas, para junções espaciais; caixas com mais de
+    MAXIMO_CELULAS_CAIXA células são resolvidas por ArvoreSTR."""
+
+    def __init__(self, caixas, tamanho_celula=None):
+        self.caixas = np.asarray(caixas, dtype=float).reshape(-1, 4)
+        self.tamanho_celula = tamanho_celula or tamanho_celula_padrao(self.caixas)
+        if len(self.caixas):
+            self.origem = (self.caixas[:, 0].min(), self.caixas[:, 1].min())
+        else:
+            self.origem = (0.0, 0.0)
+        grande = self.quantidade_celulas(self.caixas) > MAXIMO_CELULAS_CAIXA
+        self.grandes = np.flatnonzero(grande)
+        self.arvore_grandes = ArvoreSTR(self.caixas[self.grandes]) if len(self.grandes) else None
+        self.arvore = None
+        pequenas = np.flatnonzero(~grande)
+        chave, indice = self.celulas(self.caixas[pequenas])
+        ordem = np.argsort(chave, kind='stable')
+        self.chaves = chave[ordem]
+        self.indices = pequenas[indice[ordem]]
+
+    def __len__(self):
+        return len(self.caixas)
+
+    def _intervalos(self, caixas):
+        tamanho = self.tamanho_celula
+        ix0 = np.floor((caixas[:, 0] - self.origem[0]) / tamanho)
+        iy0 = np.floor((caixas[:, 1] - self.origem[1]) / tamanho)
+        ix1 = np.floor((caixas[:, 2] - self.origem[0]) / tamanho)
+        iy1 = np.floor((caixas[:, 3] - self.origem[1]) / tamanho)
+        return ix0, iy0, ix1, iy1
+
+    def quantidade_celulas(self, caixas):
+        """Células ocupadas por cada caixa, em float para não estourar com caixas enormes."""
+        ix0, iy0, ix1, iy1 = self._intervalos(caixas)
+        return (ix1 - ix0 + 1) * (iy1 - iy0 + 1)
+
+    def celulas(self, caixas):
+        """Pares (chave da célula, índice da caixa) de cada célula ocupada por cada caixa."""
+        if len(caixas) == 0:
+            vazio = np.empty(0, dtype=np.int64)
+            return vazio, vazio
+        ix0, iy0, ix1, iy1 = (valor.astype(np.int64) for valor in self._intervalos(caixas))
+        ny = iy1 - iy0 + 1
+        quantidade = (ix1 - ix0 + 1) * ny
+        indice = np.repeat(np.arange(len(caixas), dtype=np.int64), quantidade)
+        local = np.arange(len(indice), dtype=np.int64) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+        cx = ix0[indice] + local // ny[indice]
+        cy = iy0[indice] + local % ny[indice]
+        return (cx + DESLOCAMENTO_CELULA) * FAIXA_CELULA + (cy + DESLOCAMENTO_CELULA), indice
+
+    def pares(self, caixas):
+        """Pares (i, j) com a caixa i da consulta sobrepondo a caixa j do índice."""
+        caixas = np.asarray(caixas, dtype=float).reshape(-1, 4)
+        vazio = np.empty(0, dtype=np.int64)
+        if len(caixas) == 0 or len(self.caixas) == 0:
+            return vazio, vazio
+        grande = self.quantidade_celulas(caixas) > MAXIMO_CELULAS_CAIXA
+        pequenas = np.flatnonzero(~grande)
+        resultado_i, resultado_j = [], []
+        #as consultas grandes vão inteiras para a árvore de todas as caixas indexadas
+        if grande.any():
+            if self.arvore is None:
+                self.arvore = ArvoreSTR(self.caixas)
+            consultas = np.flatnonzero(grande)
+            i, j = self.arvore.pares(caixas[consultas])
+            resultado_i.append(consultas[i])
+            resultado_j.append(j)
+        #as pequenas cruzam as indexadas grandes pela árvore delas e as demais pela grade
+        if len(pequenas) and self.arvore_grandes is not None:
+            i, j = self.arvore_grandes.pares(caixas[pequenas])
+            resultado_i.append(pequenas[i])
+            resultado_j.append(self.grandes[j])
+        if len(pequenas):
+            i, j = self._pares_grade(caixas[pequenas])
+            resultado_i.append(pequenas[i])
+            resultado_j.append(j)
+        if not resultado_i:
+            return vazio, vazio
+        i, j = np.concatenate(resultado_i), np.concatenate(resultado_j)
+        ordem = np.lexsort((j, i))
+        return i[ordem], j[ordem]
+
+    def _pares_grade(self, caixas):
+        vazio = np.empty(0, dtype=np.int64)
+        chave, indice = self.celulas(caixas)
+        inicio = np.searchsorted(self.chaves, chave, side='left')
+        quantidade = np.searchsorted(self.chaves, chave, side='right') - inicio
+        if not quantidade.any():
+            return vazio, vazio
+        i = np.repeat(indice, quantidade)
+        local = np.arange(len(i), dtype=np.int64) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+        j = self.indices[np.repeat(inicio, quantidade) + local]
+        #um par que divide várias células aparece repetido
+        unico = np.unique(i * len(self.caixas) + j)
+        i, j = unico // len(self.caixas), unico % len(self.caixas)
+        b = self.caixas
+        sobrepoe = ((caixas[i, 0] <= b[j, 2]) & (b[j, 0] <= caixas[i, 2]) &
+                    (caixas[i, 1] <= b[j, 3]) & (b[j, 1] <= caixas[i, 3]))
+        return i[sobrepoe], j[sobrepoe]
+
+
+#caixas por nó da árvore STR
+CAPACIDADE_NO = 16
+
+
+class ArvoreSTR(object):
+    """R-tree empacotada pelo método Sort-Tile-Recursive, em arrays NumPy."""
+
+    def __init__(self, caixas, capacidade=CAPACIDADE_NO):
+        self.caixas = np.asarray(caixas, dtype=float).reshape(-1, 4)
+        self.capacidade = max(int(capacidade), 2)
+        ordem = self._ordem_str(self.caixas)
+        self.ordem = ordem
+        self.niveis = []
+        caixas_nivel = self.caixas[ordem]
+        while True:
+            inicio = np.arange(0, len(caixas_nivel), self.capacidade, dtype=np.int64)
+            fim = np.minimum(inicio + self.capacidade, len(caixas_nivel))
+            caixas_nos = self._envolver(caixas_nivel, inicio)
+            if len(caixas_nos) <= 1:
+                self.niveis.append((caixas_nos, inicio, fim))
+                break
+            #o nível de cima empacota os nós deste nível, que são reordenados junto
+            ordem_nos = self._ordem_str(caixas_nos)
+            self.niveis.append((caixas_nos[ordem_nos], inicio[ordem_nos], fim[ordem_nos]))
+            caixas_nivel = caixas_nos[ordem_nos]
+        self.niveis.reverse()
+
+    def __len__(self):
+        return len(self.caixas)
+
+    def _ordem_str(self, caixas):
+        n = len(caixas)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        folhas = -(-n // self.capacidade)
+        fatias = int(np.ceil(np.sqrt(folhas)))
+        #fatias verticais com um número inteiro de nós, ordenadas por y dentro de cada uma
+        tamanho_fatia = self.capacidade * (-(-folhas // fatias))
+        por_x = np.argsort(caixas[:, 0] + caixas[:, 2], kind='stable')
+        fatia = np.arange(n) // tamanho_fatia
+        centro_y = (caixas[por_x, 1] + caixas[por_x, 3])
+        return por_x[np.lexsort((centro_y, fatia))]
+
+    def _envolver(self, caixas, inicio):
+        if len(caixas) == 0:
+            return np.empty((0, 4))
+        return np.column_stack((np.minimum.reduceat(caixas[:, 0], inicio), np.minimum.reduceat(caixas[:, 1], inicio),
+                                np.maximum.reduceat(caixas[:, 2], inicio), np.maximum.reduceat(caixas[:, 3], inicio)))
+
+    def pares(self, caixas):
+        """Pares (i, j) com a caixa i da consulta sobrepondo a caixa j indexada."""
+        caixas = np.asarray(caixas, dtype=float).reshape(-1, 4)
+        vazio = np.empty(0, dtype=np.int64)
+        if len(caixas) == 0 or len(self.caixas) == 0:
+            return vazio, vazio
+        caixas_raiz = self.niveis[0][0]
+        i = np.repeat(np.arange(len(caixas), dtype=np.int64), len(caixas_raiz))
+        j = np.tile(np.arange(len(caixas_raiz), dtype=np.int64), len(caixas))
+        abaixo = [nivel[0] for nivel in self.niveis[1:]] + [self.caixas[self.ordem]]
+        for (caixas_nos, inicio, fim), caixas_filhos in zip(self.niveis, abaixo):
+            sobrepoe = self._sobrepoe(caixas[i], caixas_nos[j])
+            i, j = i[sobrepoe], j[sobrepoe]
+            quantidade = fim[j] - inicio[j]
+            local = np.arange(quantidade.sum(), dtype=np.int64) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+            i, j = np.repeat(i, quantidade), np.repeat(inicio[j], quantidade) + local
+        sobrepoe = self._sobrepoe(caixas[i], self.caixas[self.ordem[j]])
+        return i[sobrepoe], self.ordem[j[sobrepoe]]
+
+    @staticmethod
+    def _sobrepoe(a, b):
+        return (a[:, 0] <= b[:, 2]) & (b[:, 0] <= a[:, 2]) & (a[:, 1] <= b[:, 3]) & (b[:, 1] <= a[:, 3])
+
+
+def distancia_ponto_segmento(pontos, segmentos):
+    """Distância de cada ponto (n, 2) ao segmento (n, 4) correspondente; um único segmento (1, 4) vale para todos."""
+    ax, ay = segmentos[:, 0], segmentos[:, 1]
+    dx, dy = segmentos[:, 2] - ax, segmentos[:, 3] - ay
+    comprimento = dx * dx + dy * dy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = ((pontos[:, 0] - ax) * dx + (pontos[:, 1] - ay) * dy) / comprimento
+    t = np.clip(np.where(comprimento > 0, t, 0.0), 0.0, 1.0)
+    return np.hypot(pontos[:, 0] - (ax + t * dx), pontos[:, 1] - (ay + t * dy))
+
+
+def caixas_segmentos(xy, margem=0.0):
+    """Caixas (m, 4) dos segmentos (m, 4), expandidas pela margem."""
+    return np.column_stack((np.minimum(xy[:, 0], xy[:, 2]) - margem, np.minimum(xy[:, 1], xy[:, 3]) - margem,
+                            np.maximum(xy[:, 0], xy[:, 2]) + margem, np.maximum(xy[:, 1], xy[:, 3]) + margem))
+
+
+def intersecao_segmentos(a, b, eps=1e-12):
+    """Interseção dos segmentos a[k] x b[k]: (intersecta, x, y, propria), com propria para o cruzamento
+    no interior dos dois."""
+    px, py = a[:, 0], a[:, 1]
+    rx, ry = a[:, 2] - px, a[:, 3] - py
+    qx, qy = b[:, 0], b[:, 1]
+    sx, sy = b[:, 2] - qx, b[:, 3] - qy
+    wx, wy = qx - px, qy - py
+
+    denom = rx * sy - ry * sx
+    cruz_wr = wx * ry - wy * rx
+    escala = np.maximum(np.hypot(rx, ry) * np.hypot(sx, sy), eps)
+    paralelo = np.abs(denom) <= eps * escala
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(paralelo, 0.0, (wx * sy - wy * sx) / denom)
+        u = np.where(paralelo, 0.0, cruz_wr / denom)
+    dentro = (~paralelo) & (t >= -eps) & (t <= 1 + eps) & (u >= -eps) & (u <= 1 + eps)
+    propria = (~paralelo) & (t > eps) & (t < 1 - eps) & (u > eps) & (u < 1 - eps)
+    x = px + t * rx
+    y = py + t * ry
+
+    #sobreposição colinear: projeta b sobre a e verifica se os intervalos se tocam
+    colinear = paralelo & (np.abs(cruz_wr) <= eps * np.maximum(np.hypot(rx, ry) * np.hypot(wx, wy), eps))
+    if colinear.any():
+        rr = np.where(colinear, rx * rx + ry * ry, 1.0)
+        rr = np.where(rr == 0, 1.0, rr)
+        t0 = (wx * rx + wy * ry) / rr
+        t1 = t0 + (sx * rx + sy * ry) / rr
+        tmin = np.maximum(np.minimum(t0, t1), 0.0)
+        tmax = np.minimum(np.maximum(t0, t1), 1.0)
+        sobrepoe = colinear & (tmin <= tmax + eps)
+        x = np.where(sobrepoe, px + tmin * rx, x)
+        y = np.where(sobrepoe, py + tmin * ry, y)
+        dentro = dentro | sobrepoe
+    return dentro, x, y, propria
+
+
+def area_anel(coords):
+    x, y = coords[:, 0], coords[:, 1]
+    return 0.5 * abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+
+def ponto_no_anel(x, y, coords):
+    """Teste par-ímpar (ray casting) vetorizado sobre as arestas do anel."""
+    x1, y1 = coords[:-1, 0], coords[:-1, 1]
+    x2, y2 = coords[1:, 0], coords[1:, 1]
+    cruza = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xc = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return bool(np.count_nonzero(cruza & (x < xc)) % 2)
+
+
+def componentes_conexos(n, i, j):
+    """Rótulo (menor elemento) do componente conexo de cada um dos n elementos ligados por (i, j)."""
+    rotulo = np.arange(n, dtype=np.int64)
+    i = np.asarray(i, dtype=np.int64)
+    j = np.asarray(j, dtype=np.int64)
+    if n == 0 or len(i) == 0:
+        return rotulo
+    while True:
+        ri, rj = rotulo[i], rotulo[j]
+        diferentes = ri != rj
+        if not diferentes.any():
+            return rotulo
+        ri, rj = ri[diferentes], rj[diferentes]
+        menor = np.minimum(ri, rj)
+        np.minimum.at(rotulo, ri, menor)
+        np.minimum.at(rotulo, rj, menor)
+        while True:
+            proximo = rotulo[rotulo]
+            if np.array_equal(proximo, rotulo):
+                break
+            rotulo = proximo
+
+
+#limite de células por eixo nas grades de pontos, para a chave ix * colunas + iy caber em int64
+CELULAS_POR_EIXO = 2 ** 30
+
+#metade da vizinhança 3 x 3: cada par de células vizinhas é visitado uma só vez
+VIZINHOS_ADIANTE = [(0, 0), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def agrupar_pontos(x, y, tolerancia=0.0):
+    """Grupo (0 a k - 1) de cada ponto, encadeando pontos a até a tolerância; com zero, só coordenadas iguais."""
+    xy = np.column_stack((x, y)).astype(float)
+    n = len(xy)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    if tolerancia <= 0:
+        return np.unique(xy, axis=0, return_inverse=True)[1].reshape(-1)
+    #grade com lado igual à tolerância: os vizinhos de um ponto estão na sua célula ou nas oito em volta
+    #(células maiores que a tolerância continuam corretas e evitam estourar as chaves int64)
+    origem = xy.min(axis=0)
+    lado = max(tolerancia, float((xy.max(axis=0) - origem).max()) / CELULAS_POR_EIXO)
+    ix = np.floor((xy[:, 0] - origem[0]) / lado).astype(np.int64) + 1
+    iy = np.floor((xy[:, 1] - origem[1]) / lado).astype(np.int64) + 1
+    colunas = int(iy.max()) + 3
+    chave = ix * colunas + iy
+    ordem = np.argsort(chave, kind='stable')
+    chaves = chave[ordem]
+    #a chave de uma célula vizinha é a chave do ponto mais uma constante, então as
+    #consultas feitas na ordem das chaves também chegam ordenadas ao searchsorted
+    pares_i, pares_j = [], []
+    for dx, dy in VIZINHOS_ADIANTE:
+        alvo = chaves + (dx * colunas + dy)
+        inicio = np.searchsorted(chaves, alvo, side='left')
+        quantidade = np.searchsorted(chaves, alvo, side='right') - inicio
+        if not quantidade.any():
+            continue
+        i = np.repeat(np.arange(n, dtype=np.int64), quantidade)
+        local = np.arange(len(i), dtype=np.int64) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+        j = np.repeat(inicio, quantidade) + local
+        i, j = ordem[i], ordem[j]
+        manter = i < j if (dx, dy) == (0, 0) else np.ones(len(i), dtype=bool)
+        manter &= np.hypot(xy[i, 0] - xy[j, 0], xy[i, 1] - xy[j, 1]) <= tolerancia
+        pares_i.append(i[manter])
+        pares_j.append(j[manter])
+    if not pares_i:
+        return np.arange(n, dtype=np.int64)
+    grupo = componentes_conexos(n, np.concatenate(pares_i), np.concatenate(pares_j))
+    return np.unique(grupo, return_inverse=True)[1].reshape(-1)
@@ -34,9 +34,18 @@ from qgis.core import QgsProcessingProvider
 #from .programacao_aplicada_grupo_3_algorithm import ProgramacaoAplicadaGrupo3Algorithm
 from .algorithms.Projeto1.solucao import TrafegabilidadeAlgorithm
 from .algorithms.Projeto2.solucao import CriarCamadasCurvasNivelMod
+from .algorithms.Projeto2.validacao_topologia import ValidarTopologiaCurvasNivel
 from .algorithms.Projeto3.solucao import IdentificarMudancas
+from .algorithms.Projeto3.historico import HistoricoMudancas
+from .algorithms.Projeto3.lote import IdentificarMudancasLote
+from .algorithms.Projeto3.sincronizacao import AplicarDelta
+from .algorithms.Projeto3.trajeto import TrajetoriaTracker
 from .algorithms.Projeto4.solucao import ValidateAndCorrectFeaturesAlgorithm
 from .algorithms.Projeto4.solucao_complementar import ValidateAndCreatePointsAlgorithm1
+from .algorithms.Projeto4.validacao import ValidarFolha
+from .algorithms.Projeto4.elementos_varios import ValidacaoElementosVarios
+from .algorithms.Projeto4.drenagem import ValidarRedeDrenagem
+from .algorithms.Projeto4.sentido_drenagem import ValidarSentidoDrenagem
 
 
 class ProgramacaoAplicadaGrupo3Provider(QgsProcessingProvider):
@@ -61,9 +70,18 @@ class ProgramacaoAplicadaGrupo3Provider(QgsProcessingProvider):
         #self.addAlgorithm(ProgramacaoAplicadaGrupo3Algorithm())
         self.addAlgorithm(TrafegabilidadeAlgorithm())
         self.addAlgorithm(CriarCamadasCurvasNivelMod())
+        self.addAlgorithm(ValidarTopologiaCurvasNivel())
         self.addAlgorithm(IdentificarMudancas())
+        self.addAlgorithm(HistoricoMudancas())
+        self.addAlgorithm(IdentificarMudancasLote())
+        self.addAlgorithm(AplicarDelta())
+        self.addAlgorithm(TrajetoriaTracker())
         self.addAlgorithm(ValidateAndCorrectFeaturesAlgorithm())
         self.addAlgorithm(ValidateAndCreatePointsAlgorithm1())
+        self.addAlgorithm(ValidarFolha())
+        self.addAlgorithm(ValidacaoElementosVarios())
+        self.addAlgorithm(ValidarRedeDrenagem())
+        self.addAlgorithm(ValidarSentidoDrenagem())
 
     def id(self):
         """
@@ -0,0 +1,6 @@
+#os testes cobrem só os módulos que não usam o QGIS; a raiz do repositório entra no
+#caminho para que algorithms seja importado como pacote, sem passar pelo plugin
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,113 @@
+import io
+import struct
+
+import numpy as np
+import pytest
+
+from algorithms.Projeto3.delta import (ADICIONADA, INALTERADA, MODIFICADA, REMOVIDA, EscritorDelta, LeitorDelta,
+                                       codificar_valor, codificar_varint, desfazer_zigzag, ler_valor, ler_varint,
+                                       zigzag)
+from algorithms.Projeto3.trajetoria import RAIO_TERRA
+from algorithms.geometria import partes_wkb
+
+
+def linha(coords, z=False):
+    dims = 3 if z else 2
+    return struct.pack(f'<BII{len(coords) * dims}d', 1, 1002 if z else 2, len(coords),
+                       *[valor for coord in coords for valor in coord])
+
+
+def poligono(aneis):
+    saida = struct.pack('<BII', 1, 3, len(aneis))
+    for anel in aneis:
+        saida += struct.pack(f'<I{len(anel) * 2}d', len(anel), *[valor for coord in anel for valor in coord])
+    return saida
+
+
+def multi(tipo, partes):
+    return struct.pack('<BII', 1, tipo, len(partes)) + b''.join(partes)
+
+
+def test_varint_e_zigzag():
+    for n in [0, 1, -1, 63, -64, 64, 2 ** 31, -2 ** 31, 2 ** 62, -2 ** 62 - 7]:
+        assert desfazer_zigzag(zigzag(n)) == n
+        assert ler_varint(io.BytesIO(codificar_varint(zigzag(n)))) == zigzag(n)
+
+
+def test_valores_ida_e_volta():
+    valores = [None, True, False, 0, -5, 2 ** 70, 1.5, float('-inf'), '', 'texto \x00 com nul', b'\x00\x01',
+               (1, 'a', None, (2.5,))]
+    arquivo = io.BytesIO(b''.join(codificar_valor(valor) for valor in valores))
+    assert [ler_valor(arquivo) for _ in valores] == valores
+
+
+def test_delta_ida_e_volta(tmp_path):
+    rng = np.random.default_rng(50)
+    precisao = 1e-3
+    geometrias = [
+        struct.pack('<BI2d', 1, 1, 10.25, -3.5),
+        linha(rng.uniform(-1e5, 1e5, (50, 2)).tolist()),
+        linha(rng.uniform(-100, 100, (10, 3)).tolist(), z=True),
+        poligono([[(0, 0), (10, 0), (10, 10), (0, 0)], [(1, 1), (2, 1), (2, 2), (1, 1)]]),
+        multi(5, [linha([(0, 0), (1, 1)]), linha([(5, 5), (6, 7), (8, 8)])]),
+        #WKB big endian também é aceito
+        struct.pack('>BI2d', 0, 1, 1.0, 2.0),
+    ]
+    caminho = str(tmp_path / 'dia.delta')
+    escritor = EscritorDelta(caminho, ['id', 'nome', 'valor'], 'id', precisao)
+    esperado = []
+    for k, wkb in enumerate(geometrias):
+        valores = (k, f'feição {k}', k * 1.5)
+        escritor.adicionada(k, valores, wkb)
+        esperado.append((ADICIONADA, k, valores, wkb))
+    escritor.removida('chave removida')
+    esperado.append((REMOVIDA, 'chave removida', None, None))
+    escritor.modificada(3, [('valor', None)])
+    esperado.append((MODIFICADA, 3, [('valor', None)], INALTERADA))
+    escritor.modificada(4, [], geometrias[1])
+    esperado.append((MODIFICADA, 4, [], geometrias[1]))
+    escritor.adicionada(99, (99, None, None), b'')
+    esperado.append((ADICIONADA, 99, (99, None, None), None))
+    escritor.fechar()
+
+    leitor = LeitorDelta(caminho)
+    assert leitor.campos == ['id', 'nome', 'valor'] and leitor.chave_primaria == 'id'
+    lidas = list(leitor.operacoes())
+    leitor.fechar()
+    assert len(lidas) == len(esperado)
+    for (operacao, chave, dados, wkb), (operacao_e, chave_e, dados_e, wkb_e) in zip(lidas, esperado):
+        assert (operacao, chave, dados) == (operacao_e, chave_e, dados_e)
+        if wkb_e is None or wkb_e is INALTERADA:
+            assert wkb is wkb_e
+            continue
+        #as coordenadas voltam arredondadas para a precisão do delta
+        partes, partes_e = partes_wkb(wkb), partes_wkb(wkb_e)
+        assert len(partes) == len(partes_e)
+        for parte, parte_e in zip(partes, partes_e):
+            assert np.allclose(parte, parte_e, rtol=0, atol=precisao / 2 + 1e-9)
+
+
+def test_delta_ida_e_volta_em_graus(tmp_path):
+    #1 mm convertido para graus, como a solução faz em SRC geográfico
+    precisao = float(np.degrees(1e-3 / RAIO_TERRA))
+    wkb = linha([(-43.123456, -22.987654), (-43.123111, -22.987222)])
+    caminho = str(tmp_path / 'graus.delta')
+    escritor = EscritorDelta(caminho, ['id'], 'id', precisao)
+    escritor.adicionada(1, (1,), wkb)
+    escritor.fechar()
+
+    leitor = LeitorDelta(caminho)
+    assert leitor.precisao == precisao
+    (_, _, _, wkb_lido), = list(leitor.operacoes())
+    leitor.fechar()
+    erro = np.abs(partes_wkb(wkb_lido)[0] - partes_wkb(wkb)[0])
+    assert np.all(erro <= precisao / 2 + 1e-12)
+    #em metros, o erro fica abaixo do milímetro pedido
+    assert np.all(np.radians(erro) * RAIO_TERRA <= 1e-3)
+
+
+def test_arquivo_que_nao_e_delta(tmp_path):
+    caminho = tmp_path / 'outro.delta'
+    caminho.write_bytes(b'nada de delta aqui')
+    with pytest.raises(ValueError):
+        LeitorDelta(str(caminho))
@@ -0,0 +1,166 @@
+import numpy as np
+
+from algorithms.geometria import (MAXIMO_CELULAS_CAIXA, ArvoreSTR, IndiceCaixas, agrupar_pontos,
+                                  componentes_conexos, pares_candidatos)
+
+
+def caixas_aleatorias(rng, n, extensao=1000.0, lado=20.0):
+    x = rng.uniform(0, extensao, n)
+    y = rng.uniform(0, extensao, n)
+    largura = rng.exponential(lado, n)
+    altura = rng.exponential(lado, n)
+    return np.column_stack((x, y, x + largura, y + altura))
+
+
+def pares_forca_bruta(consulta, indexadas):
+    a, b = consulta[:, None, :], indexadas[None, :, :]
+    sobrepoe = ((a[..., 0] <= b[..., 2]) & (b[..., 0] <= a[..., 2]) &
+                (a[..., 1] <= b[..., 3]) & (b[..., 1] <= a[..., 3]))
+    return set(zip(*np.nonzero(sobrepoe)))
+
+
+def como_conjunto(i, j):
+    return set(zip(i.tolist(), j.tolist()))
+
+
+def test_indice_caixas_igual_forca_bruta():
+    rng = np.random.default_rng(1)
+    indexadas = caixas_aleatorias(rng, 400)
+    consulta = caixas_aleatorias(rng, 300)
+    indice = IndiceCaixas(indexadas)
+    i, j = indice.pares(consulta)
+    assert como_conjunto(i, j) == pares_forca_bruta(consulta, indexadas)
+    #sem pares repetidos e em ordem de (i, j)
+    assert len(set(zip(i, j))) == len(i)
+    assert np.all(np.diff(i * len(indexadas) + j) > 0)
+
+
+def test_indice_caixas_com_caixas_grandes():
+    rng = np.random.default_rng(2)
+    indexadas = caixas_aleatorias(rng, 300, lado=5.0)
+    consulta = caixas_aleatorias(rng, 200, lado=5.0)
+    #caixas que cobrem boa parte da área vão para a árvore, indexadas e consultadas
+    indexadas[:5, 2:] += 600.0
+    consulta[:5, 2:] += 600.0
+    indice = IndiceCaixas(indexadas, tamanho_celula=5.0)
+    assert len(indice.grandes) >= 5
+    assert np.all(indice.quantidade_celulas(consulta[:5]) > MAXIMO_CELULAS_CAIXA)
+    i, j = indice.pares(consulta)
+    assert como_conjunto(i, j) == pares_forca_bruta(consulta, indexadas)
+
+
+def test_indice_caixas_vazio():
+    indice = IndiceCaixas(np.empty((0, 4)))
+    i, j = indice.pares(np.array([[0.0, 0.0, 1.0, 1.0]]))
+    assert len(i) == len(j) == 0
+
+
+def test_arvore_str_igual_forca_bruta():
+    rng = np.random.default_rng(3)
+    indexadas = caixas_aleatorias(rng, 1000)
+    consulta = caixas_aleatorias(rng, 250, lado=60.0)
+    for capacidade in (2, 16, 64):
+        arvore = ArvoreSTR(indexadas, capacidade)
+        i, j = arvore.pares(consulta)
+        assert como_conjunto(i, j) == pares_forca_bruta(consulta, indexadas)
+        assert len(set(zip(i, j))) == len(i)
+
+
+def test_arvore_str_pequena():
+    arvore = ArvoreSTR(np.array([[0.0, 0.0, 1.0, 1.0]]))
+    i, j = arvore.pares(np.array([[0.5, 0.5, 2.0, 2.0], [3.0, 3.0, 4.0, 4.0]]))
+    assert como_conjunto(i, j) == {(0, 0)}
+
+
+def test_pares_candidatos_igual_forca_bruta():
+    rng = np.random.default_rng(7)
+    caixas = caixas_aleatorias(rng, 500, lado=5.0)
+    #uma caixa muito maior que as outras não pode se espalhar por milhares de células
+    caixas[0] = (0.0, 0.0, 1000.0, 1000.0)
+    grupo = rng.integers(0, 3, len(caixas))
+    esperado = {(a, b) for a, b in pares_forca_bruta(caixas, caixas) if a < b}
+    assert como_conjunto(*pares_candidatos(caixas)) == esperado
+    assert como_conjunto(*pares_candidatos(caixas, grupo=grupo)) == {(a, b) for a, b in esperado if grupo[a] != grupo[b]}
+
+
+def componentes_forca_bruta(n, i, j):
+    vizinhos = [[] for _ in range(n)]
+    for a, b in zip(i, j):
+        vizinhos[a].append(b)
+        vizinhos[b].append(a)
+    rotulo = [-1] * n
+    for inicio in range(n):
+        if rotulo[inicio] != -1:
+            continue
+        pilha, membros = [inicio], []
+        rotulo[inicio] = inicio
+        while pilha:
+            atual = pilha.pop()
+            membros.append(atual)
+            for vizinho in vizinhos[atual]:
+                if rotulo[vizinho] == -1:
+                    rotulo[vizinho] = inicio
+                    pilha.append(vizinho)
+        menor = min(membros)
+        for membro in membros:
+            rotulo[membro] = menor
+    return np.array(rotulo)
+
+
+def test_componentes_conexos_igual_forca_bruta():
+    rng = np.random.default_rng(4)
+    for n, m in ((1, 0), (50, 30), (500, 450), (500, 2000)):
+        i = rng.integers(0, n, m)
+        j = rng.integers(0, n, m)
+        assert np.array_equal(componentes_conexos(n, i, j), componentes_forca_bruta(n, i, j))
+
+
+def test_componentes_conexos_cadeia_longa():
+    #uma cadeia em ordem invertida exige várias rodadas de ligação
+    n = 1000
+    i = np.arange(n - 1)[::-1]
+    assert np.array_equal(componentes_conexos(n, i, i + 1), np.zeros(n, dtype=np.int64))
+
+
+def grupos_forca_bruta(x, y, tolerancia):
+    n = len(x)
+    distancia = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+    if tolerancia <= 0:
+        ligados = (x[:, None] == x[None, :]) & (y[:, None] == y[None, :])
+    else:
+        ligados = distancia <= tolerancia
+    i, j = np.nonzero(np.triu(ligados, 1))
+    return componentes_forca_bruta(n, i, j)
+
+
+def mesma_particao(a, b):
+    #dois rótulos descrevem os mesmos grupos quando a correspondência entre eles é uma bijeção
+    pares = set(zip(a.tolist(), b.tolist()))
+    return len(pares) == len(set(a.tolist())) == len(set(b.tolist()))
+
+
+def test_agrupar_pontos_igual_forca_bruta():
+    rng = np.random.default_rng(5)
+    x = rng.uniform(0, 100, 600)
+    y = rng.uniform(0, 100, 600)
+    for tolerancia in (0.5, 2.0, 7.0):
+        grupo = agrupar_pontos(x, y, tolerancia)
+        assert mesma_particao(grupo, grupos_forca_bruta(x, y, tolerancia))
+        assert set(grupo.tolist()) == set(range(grupo.max() + 1))
+
+
+def test_agrupar_pontos_tolerancia_zero():
+    rng = np.random.default_rng(6)
+    #coordenadas em uma grade pequena, para haver repetidas
+    x = rng.integers(0, 10, 300).astype(float)
+    y = rng.integers(0, 10, 300).astype(float)
+    grupo = agrupar_pontos(x, y)
+    assert mesma_particao(grupo, grupos_forca_bruta(x, y, 0.0))
+
+
+def test_agrupar_pontos_extensao_enorme():
+    #extensão muito maior que a tolerância não pode estourar as chaves da grade
+    x = np.array([0.0, 1e-3, 1e12, 1e12 + 1e-3])
+    y = np.zeros(4)
+    grupo = agrupar_pontos(x, y, 1e-2)
+    assert grupo[0] == grupo[1] and grupo[2] == grupo[3] and grupo[0] != grupo[2]
@@ -0,0 +1,39 @@
+import os
+import random
+
+from algorithms.Projeto3.ordenacao_externa import (REGISTROS_POR_BLOCO, OrdenadorExterno, chave_ordenacao,
+                                                   mesclar_ordenados)
+
+
+def test_ordenador_externo_igual_sorted(tmp_path):
+    gerador = random.Random(60)
+    chaves = [None, 'b', 'a', 3, 2.5, -1] + [gerador.randint(-10 ** 6, 10 ** 6) for _ in range(5500)]
+    registros = [(chave_ordenacao(chave), fid, chave) for fid, chave in enumerate(chaves)]
+    gerador.shuffle(registros)
+    ordenador = OrdenadorExterno(REGISTROS_POR_BLOCO, str(tmp_path))
+    for registro in registros:
+        ordenador.adicionar(registro)
+    assert ordenador.sequencias_em_disco == len(registros) // REGISTROS_POR_BLOCO
+    assert list(ordenador.registros()) == sorted(registros)
+    #os arquivos temporários são apagados ao fim da leitura
+    assert os.listdir(tmp_path) == []
+
+
+def test_ordenador_sem_descarregar(tmp_path):
+    ordenador = OrdenadorExterno(REGISTROS_POR_BLOCO, str(tmp_path))
+    for chave in [3, 1, 2]:
+        ordenador.adicionar((chave_ordenacao(chave), chave))
+    assert ordenador.sequencias_em_disco == 0
+    assert [registro[1] for registro in ordenador.registros()] == [1, 2, 3]
+
+
+def test_mesclar_ordenados_igual_forca_bruta():
+    gerador = random.Random(61)
+    dia_1 = sorted((chave_ordenacao(chave), fid) for fid, chave in enumerate(gerador.sample(range(300), 200)))
+    dia_2 = sorted((chave_ordenacao(chave), fid) for fid, chave in enumerate(gerador.sample(range(300), 200)))
+    chaves_1 = {registro[0] for registro in dia_1}
+    chaves_2 = {registro[0] for registro in dia_2}
+    resultado = list(mesclar_ordenados(dia_1, dia_2))
+    assert {r1[0] for tipo, r1, _ in resultado if tipo == 'Removida'} == chaves_1 - chaves_2
+    assert {r2[0] for tipo, _, r2 in resultado if tipo == 'Adicionada'} == chaves_2 - chaves_1
+    assert {r1[0] for tipo, r1, _ in resultado if tipo == 'Comum'} == chaves_1 & chaves_2
@@ -0,0 +1,56 @@
+import struct
+
+import numpy as np
+
+from algorithms.Projeto3.comparacao import hausdorff_limitada
+from algorithms.Projeto3.pareamento import componentes, parear
+from algorithms.geometria import distancia_ponto_segmento, partes_wkb
+
+
+def linha(coords):
+    return struct.pack(f'<BII{len(coords) * 2}d', 1, 2, len(coords), *[valor for coord in coords for valor in coord])
+
+
+def caixa(coords):
+    coords = np.asarray(coords, dtype=float)
+    return np.r_[coords.min(axis=0), coords.max(axis=0)]
+
+
+def hausdorff_forca_bruta(coords_1, coords_2):
+    def dirigida(vertices, coords):
+        segmentos = np.hstack((coords[:-1], coords[1:]))
+        return max(min(distancia_ponto_segmento(np.array([v]), segmentos[[k]])[0] for k in range(len(segmentos)))
+                   for v in vertices)
+    return max(dirigida(coords_1, coords_2), dirigida(coords_2, coords_1))
+
+
+def test_hausdorff_limitada_igual_forca_bruta():
+    rng = np.random.default_rng(5)
+    for _ in range(50):
+        coords_1 = rng.uniform(0, 10, (rng.integers(2, 8), 2))
+        coords_2 = coords_1[::-1] + rng.normal(0, 0.5, (len(coords_1), 2))
+        esperado = hausdorff_forca_bruta(coords_1, coords_2)
+        partes_1, partes_2 = partes_wkb(linha(coords_1)), partes_wkb(linha(coords_2))
+        assert np.isclose(hausdorff_limitada(partes_1, partes_2, esperado + 1e-9), esperado)
+        assert np.isinf(hausdorff_limitada(partes_1, partes_2, esperado * 0.99))
+
+
+def test_parear_prefere_a_geometria_mais_proxima():
+    #as duas candidatas do dia 2 têm a mesma caixa da feição do dia 1; só a forma decide
+    original = [(0, 0), (10, 0), (10, 10)]
+    parecida = [(0, 0), (10, 0.5), (10, 10)]
+    diferente = [(0, 0), (0, 10), (10, 10)]
+    caixas_1 = np.array([caixa(original)])
+    caixas_2 = np.array([caixa(diferente), caixa(parecida)])
+    hashes_1 = np.empty((1, 0), dtype=np.uint64)
+    hashes_2 = np.empty((2, 0), dtype=np.uint64)
+    pares_1, pares_2 = parear(caixas_1, caixas_2, [linha(original)], [linha(diferente), linha(parecida)],
+                              hashes_1, hashes_2, 1.0)
+    assert pares_1.tolist() == [0]
+    assert pares_2.tolist() == [1]
+
+
+def test_componentes_do_grafo_bipartido():
+    i = np.array([0, 1, 1, 3])
+    j = np.array([0, 0, 2, 1])
+    assert componentes(i, j, 4, 3).tolist() == [0, 0, 0, 3]
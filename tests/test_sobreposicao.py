@@ -0,0 +1,77 @@
+import numpy as np
+
+from algorithms.Projeto4.sobreposicao import comprimento_sobreposto, sobreposicao_entre_linhas
+
+
+def sobreposicao_amostrada(a, b, tolerancia, amostras=20001):
+    """Mede a sobreposição caminhando sobre a em passos pequenos: conta os trechos
+    que ficam a até a tolerância de b e cuja projeção cai dentro de b."""
+    t = np.linspace(0.0, 1.0, amostras)
+    px = a[0] + t * (a[2] - a[0])
+    py = a[1] + t * (a[3] - a[1])
+    dx, dy = b[2] - b[0], b[3] - b[1]
+    comprimento_b = np.hypot(dx, dy)
+    s = ((px - b[0]) * dx + (py - b[1]) * dy) / comprimento_b
+    afastamento = np.abs((py - b[1]) * dx - (px - b[0]) * dy) / comprimento_b
+    dentro = (s >= 0) & (s <= comprimento_b)
+    if np.any(afastamento[[0, -1]] > tolerancia):
+        return 0.0
+    passo = np.hypot(a[2] - a[0], a[3] - a[1]) / (amostras - 1)
+    #pares de amostras consecutivas dentro de b
+    return float(np.count_nonzero(dentro[:-1] & dentro[1:]) * passo)
+
+
+def test_comprimento_sobreposto_igual_amostragem():
+    rng = np.random.default_rng(20)
+    tolerancia = 0.5
+    a, b = [], []
+    for _ in range(200):
+        origem = rng.uniform(-100, 100, 2)
+        angulo = rng.uniform(0, 2 * np.pi)
+        direcao = np.array([np.cos(angulo), np.sin(angulo)])
+        normal = np.array([-direcao[1], direcao[0]])
+        comprimento = rng.uniform(1, 50)
+        b.append(np.r_[origem, origem + comprimento * direcao])
+        #a corre sobre a reta de b, deslocado na normal às vezes além da tolerância
+        s0, s1 = rng.uniform(-20, comprimento + 20, 2)
+        d = rng.uniform(0, 2 * tolerancia)
+        a.append(np.r_[origem + s0 * direcao + d * normal, origem + s1 * direcao + d * normal])
+    a, b = np.array(a), np.array(b)
+    comprimento, _ = comprimento_sobreposto(a, b, tolerancia)
+    esperado = np.array([sobreposicao_amostrada(a[k], b[k], tolerancia) for k in range(len(a))])
+    passo = np.hypot(a[:, 2] - a[:, 0], a[:, 3] - a[:, 1]) / 20000
+    assert np.all(np.abs(comprimento - esperado) <= 2 * passo + 1e-9)
+
+
+def test_segmentos_que_se_cruzam_nao_sobrepoem():
+    a = np.array([[0.0, -5.0, 0.0, 5.0]])
+    b = np.array([[-5.0, 0.0, 5.0, 0.0]])
+    comprimento, _ = comprimento_sobreposto(a, b, 0.1)
+    assert comprimento[0] == 0.0
+
+
+def test_ponto_inicial_da_sobreposicao():
+    a = np.array([[12.0, 0.0, 3.0, 0.0]])
+    b = np.array([[0.0, 0.0, 10.0, 0.0]])
+    comprimento, inicio = comprimento_sobreposto(a, b, 0.0)
+    assert comprimento[0] == 7.0
+    assert inicio[0].tolist() == [3.0, 0.0]
+
+
+def test_sobreposicao_entre_linhas_igual_forca_bruta():
+    rng = np.random.default_rng(21)
+    #linhas b em uma grade e segmentos a parte sobre elas, parte soltos
+    b = np.array([[x, 0.0, x, 100.0] for x in range(0, 100, 10)] + [[0.0, y, 100.0, y] for y in range(0, 100, 10)],
+                 dtype=float)
+    a = rng.uniform(0, 100, (300, 4))
+    sobre = rng.integers(0, len(b), 100)
+    inicio, fim = rng.uniform(0, 1, (2, 100))
+    a[:100, :2] = b[sobre, :2] + inicio[:, None] * (b[sobre, 2:] - b[sobre, :2])
+    a[:100, 2:] = b[sobre, :2] + fim[:, None] * (b[sobre, 2:] - b[sobre, :2])
+    rotulo = rng.integers(0, 40, len(a))
+    total = sobreposicao_entre_linhas(a, rotulo, 40, b, tolerancia=0.01)
+    esperado = np.zeros(40)
+    for k in range(len(a)):
+        comprimento, _ = comprimento_sobreposto(np.repeat(a[k:k + 1], len(b), axis=0), b, 0.01)
+        esperado[rotulo[k]] += comprimento.sum()
+    assert np.allclose(total, esperado)
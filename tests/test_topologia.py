@@ -0,0 +1,88 @@
+import numpy as np
+
+from algorithms.Projeto4.topologia import GrafoRede
+
+
+def linhas_aleatorias(rng, quantidade, lado=12):
+    #pontas em uma grade pequena, para que as linhas se encontrem com frequência
+    linhas = []
+    for rotulo in range(quantidade):
+        pontas = rng.integers(0, lado, (2, 2)).astype(float)
+        meio = pontas.mean(axis=0) + rng.normal(0, 0.3, 2)
+        linhas.append((rotulo, np.vstack((pontas[0], meio, pontas[1]))))
+    return linhas
+
+
+def grafo_forca_bruta(linhas):
+    nos, arestas = {}, []
+    for _, coords in linhas:
+        a = nos.setdefault(tuple(coords[0]), len(nos))
+        b = nos.setdefault(tuple(coords[-1]), len(nos))
+        arestas.append((a, b))
+    grau = [0] * len(nos)
+    vizinhos = [set() for _ in nos]
+    for a, b in arestas:
+        grau[a] += 1
+        grau[b] += 1
+        vizinhos[a].add(b)
+        vizinhos[b].add(a)
+    componente = [-1] * len(nos)
+    for inicio in range(len(nos)):
+        if componente[inicio] != -1:
+            continue
+        pilha = [inicio]
+        componente[inicio] = inicio
+        while pilha:
+            atual = pilha.pop()
+            for vizinho in vizinhos[atual]:
+                if componente[vizinho] == -1:
+                    componente[vizinho] = inicio
+                    pilha.append(vizinho)
+    return nos, arestas, grau, componente
+
+
+def test_grafo_igual_forca_bruta():
+    rng = np.random.default_rng(30)
+    linhas = linhas_aleatorias(rng, 150)
+    grafo = GrafoRede.de_linhas(linhas)
+    nos, arestas, grau, componente = grafo_forca_bruta(linhas)
+    assert len(grafo) == len(nos)
+    assert grafo.quantidade_arestas == len(arestas)
+    #mesmos nós, pela posição, com o mesmo grau
+    posicao = {tuple(xy): no for no, xy in enumerate(grafo.no_xy.tolist())}
+    assert set(posicao) == set(nos)
+    for xy, no in nos.items():
+        assert grafo.grau[posicao[xy]] == grau[no]
+    soltas = {tuple(grafo.no_xy[no]) for no in grafo.pontas_soltas()}
+    assert soltas == {xy for xy, no in nos.items() if grau[no] == 1}
+    #as arestas de cada componente batem com as do percurso em profundidade
+    por_componente = {}
+    for a, _ in arestas:
+        por_componente[componente[a]] = por_componente.get(componente[a], 0) + 1
+    assert sorted(grafo.tamanho_componentes().tolist()) == sorted(por_componente.values())
+    for aresta, (a, b) in enumerate(arestas):
+        assert grafo.origem[aresta] == posicao[list(nos)[a]]
+        assert grafo.destino[aresta] == posicao[list(nos)[b]]
+
+
+def test_vizinhos_e_arestas_de_cada_no():
+    rng = np.random.default_rng(31)
+    grafo = GrafoRede.de_linhas(linhas_aleatorias(rng, 80))
+    for no in range(len(grafo)):
+        esperadas = sorted(np.flatnonzero(grafo.origem == no).tolist() + np.flatnonzero(grafo.destino == no).tolist())
+        assert sorted(grafo.arestas_de(no).tolist()) == esperadas
+        outros = [int(grafo.destino[a]) if grafo.origem[a] == no else int(grafo.origem[a]) for a in esperadas]
+        assert sorted(grafo.vizinhos_de(no).tolist()) == sorted(outros)
+
+
+def test_pontas_proximas_viram_o_mesmo_no():
+    linhas = [(0, np.array([[0.0, 0.0], [1.0, 0.0]])),
+              (1, np.array([[1.05, 0.0], [2.0, 0.0]])),
+              (2, np.array([[5.0, 5.0], [6.0, 6.0]]))]
+    grafo = GrafoRede.de_linhas(linhas, tolerancia=0.1)
+    assert len(grafo) == 5
+    assert grafo.destino[0] == grafo.origem[1]
+    assert grafo.localizar(np.array([[1.02, 0.0], [3.0, 3.0]])).tolist() == [int(grafo.destino[0]), -1]
+    cadeia, tamanho = grafo.agrupar_arestas([0, 1, 2])
+    assert cadeia[0] == cadeia[1] != cadeia[2]
+    assert sorted(tamanho.tolist()) == [1, 2]
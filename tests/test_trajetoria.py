@@ -0,0 +1,113 @@
+import math
+
+import numpy as np
+
+from algorithms.Projeto3.trajetoria import (ANGULO_REVERSAO, PASSADAS_LIMPEZA, dividir_viagens, douglas_peucker,
+                                            limpar, pontos_espurios)
+
+
+def douglas_peucker_recursivo(pontos, tolerancia):
+    mantidos = {0, len(pontos) - 1}
+
+    def distancia(p, a, b):
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        comprimento = dx * dx + dy * dy
+        if comprimento == 0:
+            return math.hypot(p[0] - a[0], p[1] - a[1])
+        t = min(max(((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / comprimento, 0.0), 1.0)
+        return math.hypot(p[0] - (a[0] + t * dx), p[1] - (a[1] + t * dy))
+
+    def simplificar(inicio, fim):
+        if fim - inicio < 2:
+            return
+        d = [distancia(pontos[k], pontos[inicio], pontos[fim]) for k in range(inicio + 1, fim)]
+        maior = max(range(len(d)), key=d.__getitem__)
+        if d[maior] > tolerancia:
+            meio = inicio + 1 + maior
+            mantidos.add(meio)
+            simplificar(inicio, meio)
+            simplificar(meio, fim)
+
+    simplificar(0, len(pontos) - 1)
+    return sorted(mantidos)
+
+
+def test_douglas_peucker_igual_recursivo():
+    rng = np.random.default_rng(40)
+    for n in (2, 3, 50, 400):
+        x = np.cumsum(rng.normal(0, 1, n))
+        y = np.cumsum(rng.normal(0, 1, n))
+        for tolerancia in (0.0, 0.5, 3.0):
+            mascara = douglas_peucker(x, y, tolerancia)
+            assert np.flatnonzero(mascara).tolist() == douglas_peucker_recursivo(list(zip(x, y)), tolerancia)
+
+
+def espurios_ponto_a_ponto(x, y, tempo, velocidade_maxima):
+    n = len(x)
+    espurio = [False] * n
+
+    def velocidade(k):
+        distancia = math.hypot(x[k + 1] - x[k], y[k + 1] - y[k])
+        intervalo = tempo[k + 1] - tempo[k]
+        if distancia == 0:
+            return 0.0
+        return distancia / intervalo if intervalo > 0 else math.inf
+
+    def rumo(k):
+        return math.atan2(y[k + 1] - y[k], x[k + 1] - x[k])
+
+    for k in range(1, n):
+        espurio[k] = x[k] == x[k - 1] and y[k] == y[k - 1] and tempo[k] == tempo[k - 1]
+    if n < 3:
+        return espurio
+    for k in range(1, n - 1):
+        chegada, saida = velocidade(k - 1), velocidade(k)
+        giro = abs(math.remainder(rumo(k) - rumo(k - 1), 2 * math.pi))
+        if chegada > velocidade_maxima and saida > velocidade_maxima:
+            espurio[k] = True
+        if (giro > math.radians(ANGULO_REVERSAO) and chegada > velocidade_maxima / 2
+                and saida > velocidade_maxima / 2):
+            espurio[k] = True
+    if velocidade(0) > velocidade_maxima and velocidade(1) <= velocidade_maxima:
+        espurio[0] = True
+    if velocidade(n - 2) > velocidade_maxima and velocidade(n - 3) <= velocidade_maxima:
+        espurio[-1] = True
+    return espurio
+
+
+def trajetoria_com_saltos(rng, n):
+    tempo = np.cumsum(rng.uniform(0.5, 2.0, n))
+    x = np.cumsum(rng.normal(0, 5, n))
+    y = np.cumsum(rng.normal(0, 5, n))
+    saltos = rng.choice(np.arange(1, n - 1), n // 20, replace=False)
+    x[saltos] += rng.choice([-1, 1], len(saltos)) * rng.uniform(200, 2000, len(saltos))
+    repetidos = rng.choice(np.arange(1, n), n // 50, replace=False)
+    x[repetidos], y[repetidos], tempo[repetidos] = x[repetidos - 1], y[repetidos - 1], tempo[repetidos - 1]
+    ordem = np.argsort(tempo, kind='stable')
+    return x[ordem], y[ordem], tempo[ordem]
+
+
+def test_pontos_espurios_igual_ponto_a_ponto():
+    rng = np.random.default_rng(41)
+    for n in (2, 3, 10, 300):
+        x, y, tempo = trajetoria_com_saltos(rng, max(n, 3))
+        x, y, tempo = x[:n], y[:n], tempo[:n]
+        assert pontos_espurios(x, y, tempo, 30.0).tolist() == espurios_ponto_a_ponto(x, y, tempo, 30.0)
+
+
+def test_limpar_repete_as_passadas():
+    rng = np.random.default_rng(42)
+    x, y, tempo = trajetoria_com_saltos(rng, 500)
+    esperado = np.arange(len(x))
+    for _ in range(PASSADAS_LIMPEZA):
+        espurio = np.array(espurios_ponto_a_ponto(x[esperado], y[esperado], tempo[esperado], 30.0))
+        if not espurio.any():
+            break
+        esperado = esperado[~espurio]
+    assert np.flatnonzero(limpar(x, y, tempo, 30.0)).tolist() == esperado.tolist()
+
+
+def test_dividir_viagens():
+    tempo = np.array([0.0, 10.0, 20.0, 400.0, 410.0, 1000.0])
+    assert dividir_viagens(tempo, 300.0) == [(0, 3), (3, 5), (5, 6)]
+    assert dividir_viagens(np.empty(0), 300.0) == []
@@ -0,0 +1,48 @@
+import struct
+
+import numpy as np
+
+from algorithms.Projeto4.vertices import IndiceVertices
+
+
+def mais_proximo_forca_bruta(vertices, pontos, tolerancia):
+    distancia = np.hypot(pontos[:, None, 0] - vertices[None, :, 0], pontos[:, None, 1] - vertices[None, :, 1])
+    menor = distancia.min(axis=1)
+    return np.where(menor <= tolerancia, menor, np.inf)
+
+
+def test_mais_proximo_igual_forca_bruta():
+    rng = np.random.default_rng(10)
+    vertices = rng.uniform(0, 100, (800, 2))
+    pontos = np.vstack((rng.uniform(-5, 105, (400, 2)), vertices[:50] + rng.normal(0, 0.1, (50, 2))))
+    for tolerancia in (0.3, 1.5, 4.0):
+        indice = IndiceVertices(vertices, tolerancia=tolerancia)
+        escolhido, distancia = indice.mais_proximo(pontos)
+        esperado = mais_proximo_forca_bruta(vertices, pontos, tolerancia)
+        assert np.allclose(distancia, esperado)
+        assert np.array_equal(escolhido >= 0, np.isfinite(esperado))
+        #o índice devolvido aponta para um vértice a exatamente essa distância
+        achados = escolhido >= 0
+        d = np.hypot(*(indice.xy[escolhido[achados]] - pontos[achados]).T)
+        assert np.allclose(d, distancia[achados])
+
+
+def test_tolerancia_zero_exige_coordenadas_iguais():
+    vertices = np.array([[0.0, 0.0], [1.0, 1.0], [2.5, -3.0]])
+    indice = IndiceVertices(vertices, rotulo=[7, 8, 9])
+    pontos = np.array([[1.0, 1.0], [1.0, 1.0 + 1e-9], [2.5, -3.0], [5.0, 5.0]])
+    assert indice.contem(pontos).tolist() == [True, False, True, False]
+    assert indice.rotulos(pontos).tolist() == [8, -1, 9, -1]
+
+
+def test_de_wkbs_rotula_pela_posicao():
+    linha = struct.pack('<BII4d', 1, 2, 2, 0.0, 0.0, 10.0, 0.0)
+    ponto = struct.pack('<BI2d', 1, 1, 5.0, 5.0)
+    indice = IndiceVertices.de_wkbs([linha, b'', ponto], tolerancia=0.5)
+    assert len(indice) == 3
+    assert indice.rotulos(np.array([[10.2, 0.0], [5.0, 5.3], [50.0, 50.0]])).tolist() == [0, 2, -1]
+
+
+def test_indice_vazio():
+    indice = IndiceVertices(np.empty((0, 2)), tolerancia=1.0)
+    assert indice.rotulos(np.array([[0.0, 0.0]])).tolist() == [-1]